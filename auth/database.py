@@ -1,4 +1,3 @@
-from sqlmodel import SQLModel
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 import os
@@ -12,10 +11,11 @@ DATABASE_URL = os.getenv("AUTH_DB_URL", "sqlite+aiosqlite:///auth.db")
 # El Motor
 engine = create_async_engine(DATABASE_URL, future=True)
 
-# Función para inicializar la DB (Crear tablas)
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+# Arranque: el esquema se gestiona con migraciones versionadas (auth/migraciones.py).
+# En producción se ejecutan fuera de banda (python -m auth.migraciones) y se desactiva esta opción
+MIGRAR_AL_INICIAR = os.getenv("AUTH_MIGRAR_AL_INICIAR", "true").lower() == "true"
+# Conexiones del pool que se abren al arrancar, antes de declararse listo
+DB_PREWARM = int(os.getenv("AUTH_DB_PREWARM", "5"))
 
 # Dependencia para obtener la sesión
 async def get_session():
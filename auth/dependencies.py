@@ -0,0 +1,48 @@
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from dotenv import load_dotenv
+import jwt
+import os
+
+from auth.security import SECRET_KEY, ALGORITHM
+
+load_dotenv()
+
+security = HTTPBearer()
+
+# Subjects autorizados para las operaciones administrativas (alta masiva), separados por comas
+ADMIN_SUBS = {sub.strip() for sub in os.getenv("AUTH_ADMIN_SUBS", "sistema-admin").split(",") if sub.strip()}
+
+
+async def validar_token(credenciales: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Dependencia de seguridad.
+    Decodifica y valida el token JWT.
+    """
+    token_recibido = credenciales.credentials
+    exception_auth = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Credenciales inválidas. Token no válido.",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    try:
+        payload = jwt.decode(token_recibido, SECRET_KEY, algorithms=[ALGORITHM])
+        username: str = payload.get("sub")
+        if username is None:
+            raise exception_auth
+    except jwt.InvalidTokenError:
+        raise exception_auth
+
+    return token_recibido
+
+
+async def validar_administrador(token: str = Depends(validar_token)):
+    """
+    Dependencia de seguridad para operaciones administrativas.
+    Además de un token válido, exige que su subject esté en AUTH_ADMIN_SUBS.
+    """
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if payload.get("sub") not in ADMIN_SUBS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Operación reservada a administradores")
+    return token
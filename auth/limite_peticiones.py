@@ -0,0 +1,78 @@
+import hmac
+import math
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+
+load_dotenv()
+
+# --- CONFIGURACIÓN ---
+# Ráfaga máxima permitida por clave y recarga sostenida (peticiones por minuto)
+CAPACIDAD = float(os.getenv("AUTH_RATE_LIMIT_CAPACIDAD", "5"))
+POR_MINUTO = float(os.getenv("AUTH_RATE_LIMIT_POR_MINUTO", "10"))
+# Claves activas máximas en memoria; las más inactivas se descartan (LRU)
+MAX_CLAVES = int(os.getenv("AUTH_RATE_LIMIT_MAX_CLAVES", "100000"))
+# Secreto compartido con el gateway: solo entonces se confía en la IP que reenvía en X-Forwarded-For
+GATEWAY_SECRET = os.getenv("GATEWAY_SECRET")
+
+
+def ip_cliente(request: Request) -> str:
+    """
+    IP del cliente final. Detrás del gateway todas las peticiones llegan desde su dirección,
+    así que se usa la que reenvía en X-Forwarded-For, pero solo si la petición trae su secreto
+    (un cliente directo podría falsear la cabecera). Si no, la dirección del par TCP.
+    """
+    secreto_gateway = request.headers.get("x-gateway-secret")
+    reenviada = request.headers.get("x-forwarded-for")
+    # En bytes: compare_digest rechaza (TypeError) un str con caracteres no ASCII
+    if reenviada and GATEWAY_SECRET and secreto_gateway and hmac.compare_digest(secreto_gateway.encode("latin-1"), GATEWAY_SECRET.encode()):
+        # El gateway añade la IP que vio al final de la lista
+        return reenviada.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "desconocida"
+
+
+class LimitadorTokenBucket:
+    """
+    Token bucket en memoria por clave (usuario o IP).
+    Cada clave ocupa O(1) memoria: [tokens, último instante de recarga].
+    """
+
+    def __init__(self, capacidad: float = CAPACIDAD, por_minuto: float = POR_MINUTO, max_claves: int = MAX_CLAVES):
+        self.capacidad = capacidad
+        self.recarga_por_segundo = por_minuto / 60
+        self.max_claves = max_claves
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    def consumir(self, clave: str) -> float:
+        """ Consume un token. Devuelve 0 si se permite o los segundos hasta el próximo token """
+        ahora = time.monotonic()
+        bucket = self._buckets.get(clave)
+        if bucket is None:
+            bucket = self._buckets[clave] = [self.capacidad, ahora]
+            if len(self._buckets) > self.max_claves:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(clave)
+            bucket[0] = min(self.capacidad, bucket[0] + (ahora - bucket[1]) * self.recarga_por_segundo)
+            bucket[1] = ahora
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / self.recarga_por_segundo
+
+    def verificar(self, request: Request, username: str):
+        """ Rechaza con 429 antes de tocar la DB o calcular ningún hash """
+        espera = self.consumir(f"ip:{ip_cliente(request)}") or self.consumir(f"usuario:{username}")
+        if espera:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiados intentos. Intente más tarde.",
+                headers={"Retry-After": str(math.ceil(espera))},
+            )
+
+
+limitador_login = LimitadorTokenBucket()
+limitador_registro = LimitadorTokenBucket()
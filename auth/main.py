@@ -1,27 +1,70 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from contextlib import asynccontextmanager
 from sqlmodel import select
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
+from datetime import datetime, timedelta
+import os
+import uuid
 
-from auth.database import init_db, get_session, engine
-from auth.models import Usuario
-from auth.schemas import UsuarioCreate, UsuarioLogin, Token
-from auth.security import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth.database import get_session, engine, MIGRAR_AL_INICIAR, DB_PREWARM
+from auth.migraciones import aplicar_migraciones, migraciones_pendientes
+from auth.salud import VerificadorSalud
+from auth.perfilador import PerfiladorConsultas
+from auth.logger_config import configurar_logger
+from auth.models import Usuario, RefreshToken
+from auth.schemas import UsuarioCreate, UsuarioBulkCreate, ResultadoRegistro, UsuarioLogin, Token, RefreshTokenRequest
+from auth.security import (
+    get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS, generar_refresh_token, hash_refresh_token,
+    get_password_hashes_en_paralelo, cerrar_pool_hashing,
+)
+from auth.dependencies import validar_token, validar_administrador
+from auth.limitador import LimitadorAdaptativo
+from auth.compresion import CompresionRespuestas
+from auth.limite_peticiones import limitador_login, limitador_registro
+from auth.responses import RespuestaRapida
+
+# Serializadores precompilados (se mantiene response_model para la documentación OpenAPI)
+USUARIO_JSON = RespuestaRapida(Usuario)
+TOKEN_JSON = RespuestaRapida(Token)
+LISTA_RESULTADOS_JSON = RespuestaRapida(list[ResultadoRegistro])
+
+# Alta masiva: tamaño máximo de la petición, de cada consulta IN y de cada transacción
+BULK_MAX_USUARIOS = int(os.getenv("AUTH_BULK_MAX_USUARIOS", "10000"))
+BULK_TAMANO_LOTE = int(os.getenv("AUTH_BULK_TAMANO_LOTE", "500"))
+
+logger = configurar_logger("AUTH-MAIN")
+salud = VerificadorSalud(engine)
+perfilador = PerfiladorConsultas(engine)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Inicializando base de datos de autenticacion")
-    await init_db()
+    logger.info("Inicializando base de datos de autenticacion")
+    if MIGRAR_AL_INICIAR:
+        await aplicar_migraciones()
+    pendientes = await migraciones_pendientes()
+    if pendientes:
+        logger.error(f"Esquema desactualizado, migraciones pendientes: {pendientes}. Ejecute: python -m auth.migraciones")
+    arranque_ms = await salud.precalentar(DB_PREWARM, esquema_al_dia=not pendientes)
+    logger.info(f"Servicio listo en {arranque_ms:.0f} ms")
     yield
-    print("Cerrando base de datos de autenticacion")
+    logger.info("Cerrando base de datos de autenticacion")
+    cerrar_pool_hashing()
     await engine.dispose()
 
 app = FastAPI(title="Auth Service", lifespan=lifespan)
+salud.registrar(app)
+app.add_middleware(LimitadorAdaptativo, router=app.router)
+app.add_middleware(CompresionRespuestas)
+perfilador.registrar(app, dependencies=[Depends(validar_token)])
 
 @app.post("/register", response_model=Usuario)
-async def register(usuario: UsuarioCreate, session: AsyncSession = Depends(get_session)):
+async def register(usuario: UsuarioCreate, request: Request, session: AsyncSession = Depends(get_session)):
+    limitador_registro.verificar(request, usuario.username)
+
     # Validar si existe
     statement = select(Usuario).where(Usuario.username == usuario.username)
     resultado = await session.execute(statement)
@@ -34,10 +77,87 @@ async def register(usuario: UsuarioCreate, session: AsyncSession = Depends(get_s
     session.add(nuevo_usuario)
     await session.commit()
     await session.refresh(nuevo_usuario)
-    return nuevo_usuario
+    return USUARIO_JSON(nuevo_usuario)
+
+@app.post("/register/bulk", response_model=list[ResultadoRegistro], dependencies=[Depends(validar_administrador)])
+async def register_bulk(datos: UsuarioBulkCreate, session: AsyncSession = Depends(get_session)):
+    """ Alta masiva de usuarios: hashing en paralelo y unicidad e inserción por lotes """
+    if len(datos.usuarios) > BULK_MAX_USUARIOS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_USUARIOS} usuarios por petición")
+    logger.info(f"Alta masiva de {len(datos.usuarios)} usuarios")
+
+    resultados: list[ResultadoRegistro | None] = [None] * len(datos.usuarios)
+
+    # 1. Duplicados dentro de la propia petición
+    vistos_username, vistos_email, candidatos = set(), set(), []
+    for i, usuario in enumerate(datos.usuarios):
+        if usuario.username in vistos_username or usuario.email in vistos_email:
+            resultados[i] = ResultadoRegistro(username=usuario.username, creado=False, detalle="Duplicado en la petición")
+            continue
+        vistos_username.add(usuario.username)
+        vistos_email.add(usuario.email)
+        candidatos.append(i)
+
+    # 2. Unicidad contra la DB con una consulta por conjunto (por lotes de IN)
+    existentes_username, existentes_email = set(), set()
+    for inicio in range(0, len(candidatos), BULK_TAMANO_LOTE):
+        lote = [datos.usuarios[i] for i in candidatos[inicio:inicio + BULK_TAMANO_LOTE]]
+        statement = select(Usuario.username, Usuario.email).where(or_(
+            Usuario.username.in_([u.username for u in lote]),
+            Usuario.email.in_([u.email for u in lote]),
+        ))
+        for username, email in (await session.execute(statement)).all():
+            existentes_username.add(username)
+            existentes_email.add(email)
+
+    nuevos = []
+    for i in candidatos:
+        usuario = datos.usuarios[i]
+        if usuario.username in existentes_username:
+            resultados[i] = ResultadoRegistro(username=usuario.username, creado=False, detalle="El nombre de usuario ya existe")
+        elif usuario.email in existentes_email:
+            resultados[i] = ResultadoRegistro(username=usuario.username, creado=False, detalle="El email ya existe")
+        else:
+            nuevos.append(i)
+
+    # 3. Hashing bcrypt en un pool de procesos
+    hashes = await get_password_hashes_en_paralelo([datos.usuarios[i].password for i in nuevos])
+
+    # 4. Inserción por lotes, una transacción por lote
+    for inicio in range(0, len(nuevos), BULK_TAMANO_LOTE):
+        indices = nuevos[inicio:inicio + BULK_TAMANO_LOTE]
+        filas = [
+            {"username": datos.usuarios[i].username, "email": datos.usuarios[i].email, "hashed_password": hashes[inicio + j]}
+            for j, i in enumerate(indices)
+        ]
+        try:
+            insertados = await session.execute(insert(Usuario).returning(Usuario.id, Usuario.username), filas)
+            ids = {username: id_ for id_, username in insertados.all()}
+            await session.commit()
+        except IntegrityError:
+            # Un alta concurrente violó la unicidad: se reintenta fila a fila para informar solo los conflictivos
+            await session.rollback()
+            logger.warning(f"Conflicto de unicidad en un lote de {len(indices)} usuarios. Se reintenta fila a fila")
+            for i, fila in zip(indices, filas):
+                resultados[i] = await _insertar_usuario(session, fila)
+            continue
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Error al insertar lote de alta masiva: {str(e)}")
+            for i in indices:
+                resultados[i] = ResultadoRegistro(username=datos.usuarios[i].username, creado=False, detalle="Error al insertar el lote")
+            continue
+        for i in indices:
+            username = datos.usuarios[i].username
+            resultados[i] = ResultadoRegistro(username=username, creado=True, id=ids.get(username))
+
+    logger.info(f"Alta masiva completada. Creados: {sum(r.creado for r in resultados)}/{len(resultados)}")
+    return LISTA_RESULTADOS_JSON(resultados)
 
 @app.post("/login", response_model=Token)
-async def login(form_data: UsuarioLogin, session: AsyncSession = Depends(get_session)):
+async def login(form_data: UsuarioLogin, request: Request, session: AsyncSession = Depends(get_session)):
+    limitador_login.verificar(request, form_data.username)
+
     # Buscar usuario
     statement = select(Usuario).where(Usuario.username == form_data.username)
     resultado = await session.execute(statement)
@@ -50,9 +170,91 @@ async def login(form_data: UsuarioLogin, session: AsyncSession = Depends(get_ses
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Generar token
+    # Generar tokens (inicia una nueva familia de refresh tokens)
+    token = await _emitir_tokens(session, usuario_db, familia=uuid.uuid4().hex)
+    return TOKEN_JSON(token)
+
+@app.post("/token/refresh", response_model=Token)
+async def refresh(datos: RefreshTokenRequest, session: AsyncSession = Depends(get_session)):
+    """ Rota el refresh token y emite un access token nuevo sin volver a verificar la contraseña """
+    refresh_db = await _obtener_refresh_token(session, datos.refresh_token)
+
+    # Marcar como usado de forma atómica: si otra petición ya lo consumió, es una reutilización
+    statement = (
+        update(RefreshToken)
+        .where(RefreshToken.id == refresh_db.id, RefreshToken.usado == False, RefreshToken.revocado == False)  # noqa: E712
+        .values(usado=True)
+    )
+    resultado = await session.execute(statement)
+    if resultado.rowcount != 1:
+        logger.warning(f"Reutilización de refresh token detectada. Usuario: {refresh_db.usuario_id}. Se revoca la familia")
+        await _revocar_familia(session, refresh_db.familia)
+        raise _error_refresh()
+
+    usuario_db = await session.get(Usuario, refresh_db.usuario_id)
+    if not usuario_db:
+        await session.rollback()
+        raise _error_refresh()
+    token = await _emitir_tokens(session, usuario_db, familia=refresh_db.familia)
+    return TOKEN_JSON(token)
+
+@app.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revocar(datos: RefreshTokenRequest, session: AsyncSession = Depends(get_session)):
+    """ Revoca el refresh token y toda su cadena de rotación (logout) """
+    refresh_db = await _obtener_refresh_token(session, datos.refresh_token, validar=False)
+    await _revocar_familia(session, refresh_db.familia)
+
+async def _insertar_usuario(session: AsyncSession, fila: dict) -> ResultadoRegistro:
+    """ Inserta un usuario del alta masiva en su propia transacción """
+    try:
+        insertado = await session.execute(insert(Usuario).returning(Usuario.id), fila)
+        id_ = insertado.scalar_one()
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        existe = await session.execute(select(Usuario.id).where(Usuario.username == fila["username"]))
+        detalle = "El nombre de usuario ya existe" if existe.first() else "El email ya existe"
+        return ResultadoRegistro(username=fila["username"], creado=False, detalle=detalle)
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Error al insertar usuario {fila['username']} de alta masiva: {str(e)}")
+        return ResultadoRegistro(username=fila["username"], creado=False, detalle="Error al insertar el usuario")
+    return ResultadoRegistro(username=fila["username"], creado=True, id=id_)
+
+def _error_refresh() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido o expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def _emitir_tokens(session: AsyncSession, usuario_db: Usuario, familia: str) -> Token:
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": usuario_db.username}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = generar_refresh_token()
+    session.add(RefreshToken(
+        usuario_id=usuario_db.id,
+        token_hash=hash_refresh_token(refresh_token),
+        familia=familia,
+        expira_en=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    await session.commit()
+    return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
+
+async def _obtener_refresh_token(session: AsyncSession, refresh_token: str, validar: bool = True) -> RefreshToken:
+    statement = select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(refresh_token))
+    resultado = await session.execute(statement)
+    refresh_db = resultado.scalar_one_or_none()
+    if not refresh_db:
+        raise _error_refresh()
+    if validar and (refresh_db.revocado or refresh_db.expira_en < datetime.utcnow()):
+        raise _error_refresh()
+    return refresh_db
+
+async def _revocar_familia(session: AsyncSession, familia: str):
+    await session.execute(
+        update(RefreshToken).where(RefreshToken.familia == familia).values(revocado=True)
+    )
+    await session.commit()
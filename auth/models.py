@@ -1,8 +1,21 @@
 from sqlmodel import SQLModel, Field
 from typing import Optional
+from datetime import datetime
 
 class Usuario(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(index=True, unique=True)
     email: str = Field(index=True, unique=True)
     hashed_password: str
+
+class RefreshToken(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    usuario_id: int = Field(index=True)
+    # SHA-256 del token: búsqueda O(1) por índice único, nunca se guarda el token en claro
+    token_hash: str = Field(index=True, unique=True)
+    # Todos los tokens de una misma cadena de rotación comparten familia
+    familia: str = Field(index=True)
+    expira_en: datetime
+    usado: bool = False
+    revocado: bool = False
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,21 @@
+from typing import Any
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+class RespuestaRapida:
+    """
+    Serializador JSON precompilado para un tipo de respuesta.
+    Usa pydantic-core directamente (TypeAdapter.dump_json) sobre los objetos
+    ya cargados, sin la revalidación que FastAPI aplica con `response_model`.
+    """
+
+    def __init__(self, tipo: Any):
+        self.adapter = TypeAdapter(tipo)
+
+    def __call__(self, contenido: Any, status_code: int = 200) -> Response:
+        return Response(
+            content=self.adapter.dump_json(contenido),
+            status_code=status_code,
+            media_type="application/json",
+        )
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+import httpx
+from dotenv import load_dotenv
+from sqlalchemy import text
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+load_dotenv()
+
+# Instante de carga del módulo: referencia para medir el arranque en frío
+INICIO_PROCESO = time.perf_counter()
+
+# Las comprobaciones se cachean para que los probes sean baratos
+CACHE_SEGUNDOS = float(os.getenv("SALUD_CACHE_SEGUNDOS", "2"))
+TIMEOUT_DEPENDENCIAS = float(os.getenv("SALUD_TIMEOUT_DEPENDENCIAS", "1"))
+
+
+class VerificadorSalud:
+    """
+    Expone /healthz (el proceso está vivo) y /readyz (DB y dependencias).
+    El servicio solo se declara listo tras precalentar el pool de conexiones.
+    """
+
+    def __init__(self, engine, dependencias: dict[str, str] | None = None):
+        self.engine = engine
+        self.dependencias = dependencias or {}  # nombre -> URL de /healthz
+        self.listo = False
+        self.arranque_ms: float | None = None
+        self._cache: dict | None = None
+        self._cache_expira = 0.0
+        self._lock = asyncio.Lock()
+
+    async def precalentar(self, conexiones: int, esquema_al_dia: bool = True) -> float:
+        """ Abre `conexiones` del pool en paralelo y comprueba las dependencias """
+        async def abrir_conexion():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        await asyncio.gather(*(abrir_conexion() for _ in range(max(conexiones, 1))))
+        await self.estado(forzar=True)
+
+        self.listo = esquema_al_dia
+        self.arranque_ms = (time.perf_counter() - INICIO_PROCESO) * 1000
+        return self.arranque_ms
+
+    async def estado(self, forzar: bool = False) -> dict:
+        if not forzar and self._cache is not None and time.monotonic() < self._cache_expira:
+            return self._cache
+
+        async with self._lock:
+            # Otra corrutina pudo refrescar la caché mientras esperábamos
+            if not forzar and self._cache is not None and time.monotonic() < self._cache_expira:
+                return self._cache
+
+            async with httpx.AsyncClient(timeout=TIMEOUT_DEPENDENCIAS) as client:
+                nombres = list(self.dependencias)
+                resultados = await asyncio.gather(
+                    self._verificar_db(),
+                    *(self._verificar_dependencia(client, self.dependencias[n]) for n in nombres),
+                )
+            self._cache = {
+                "db": resultados[0],
+                "dependencias": dict(zip(nombres, resultados[1:])),
+            }
+            self._cache_expira = time.monotonic() + CACHE_SEGUNDOS
+            return self._cache
+
+    async def _verificar_db(self) -> bool:
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    async def _verificar_dependencia(self, client: httpx.AsyncClient, url: str) -> bool:
+        try:
+            resp = await client.get(url)
+            return resp.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    # --- ENDPOINTS (rutas Starlette: no pasan por la validación de token) ---
+    async def healthz(self, request: Request) -> JSONResponse:
+        return JSONResponse({"estado": "ok"})
+
+    async def readyz(self, request: Request) -> JSONResponse:
+        estado = await self.estado()
+        listo = self.listo and estado["db"]
+        return JSONResponse(
+            {"listo": listo, "arranque_ms": self.arranque_ms, **estado},
+            status_code=200 if listo else 503,
+        )
+
+    def registrar(self, app):
+        app.router.add_route("/healthz", self.healthz, methods=["GET"], include_in_schema=False)
+        app.router.add_route("/readyz", self.readyz, methods=["GET"], include_in_schema=False)
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class UsuarioBase(BaseModel):
@@ -7,6 +8,15 @@ class UsuarioBase(BaseModel):
 class UsuarioCreate(UsuarioBase):
     password: str
 
+class UsuarioBulkCreate(BaseModel):
+    usuarios: list[UsuarioCreate]
+
+class ResultadoRegistro(BaseModel):
+    username: str
+    creado: bool
+    id: Optional[int] = None
+    detalle: Optional[str] = None
+
 class UsuarioLogin(BaseModel):
     username: str
     password: str
@@ -14,3 +24,7 @@ class UsuarioLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
@@ -1,7 +1,11 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+import asyncio
 import jwt
 import bcrypt
+import hashlib
 import os
+import secrets
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,6 +14,11 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "secreto_super_seguro") # Fallback inseguro si no hay env
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# Procesos para el hashing en paralelo (por defecto, todos los núcleos)
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+_pool_hashing: ProcessPoolExecutor | None = None
 
 def verify_password(plain_password, hashed_password):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -23,3 +32,33 @@ def create_access_token(data: dict, expires_delta: timedelta):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def generar_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+def hash_refresh_token(refresh_token: str) -> str:
+    # El token es aleatorio de 256 bits: un hash rápido basta (bcrypt sería CPU desperdiciada)
+    return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
+
+def _hash_lote(passwords: list[str]) -> list[str]:
+    return [get_password_hash(password) for password in passwords]
+
+async def get_password_hashes_en_paralelo(passwords: list[str]) -> list[str]:
+    """ Calcula los hashes bcrypt repartidos en un pool de procesos (fuera del event loop) """
+    global _pool_hashing
+    if _pool_hashing is None:
+        _pool_hashing = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+
+    tamano_lote = max(1, -(-len(passwords) // (HASH_WORKERS * 4)))
+    lotes = [passwords[i:i + tamano_lote] for i in range(0, len(passwords), tamano_lote)]
+    loop = asyncio.get_running_loop()
+    resultados = await asyncio.gather(*(loop.run_in_executor(_pool_hashing, _hash_lote, lote) for lote in lotes))
+    return [hashed for lote in resultados for hashed in lote]
+
+def cerrar_pool_hashing():
+    global _pool_hashing
+    if _pool_hashing is not None:
+        _pool_hashing.shutdown(cancel_futures=True)
+        _pool_hashing = None
@@ -0,0 +1,63 @@
+"""
+Benchmark: tiempo de arranque en frío hasta /readyz = 200 de cada servicio.
+Lanza cada servicio con uvicorn sobre una base SQLite temporal y sondea /readyz.
+
+Uso:
+    python -m benchmarks.bench_arranque
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+SERVICIOS = {
+    "auth": 8100,
+    "productos": 8101,
+    "inventario": 8102,
+    "pedidos": 8103,
+}
+TIMEOUT_SEGUNDOS = 30
+
+
+def medir_arranque(servicio: str, puerto: int, directorio: str) -> tuple[float, dict]:
+    env = {
+        **os.environ,
+        "SECRET_KEY": os.getenv("SECRET_KEY", "benchmark"),
+        f"{servicio.upper()}_DB_URL": f"sqlite+aiosqlite:///{directorio}/{servicio}.db",
+    }
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{servicio}.main:app", "--port", str(puerto), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < TIMEOUT_SEGUNDOS:
+            try:
+                resp = httpx.get(f"http://127.0.0.1:{puerto}/readyz", timeout=0.5)
+                if resp.status_code == 200:
+                    return (time.perf_counter() - inicio) * 1000, resp.json()
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"{servicio} no estuvo listo en {TIMEOUT_SEGUNDOS}s")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        for ronda in ("primer arranque (migra)", "segundo arranque (esquema al día)"):
+            print(f"== {ronda}")
+            for servicio, puerto in SERVICIOS.items():
+                total_ms, estado = medir_arranque(servicio, puerto, directorio)
+                print(f"  {servicio:<11} listo en {total_ms:7.0f} ms (in-process: {estado['arranque_ms']:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: latencia de POST /pedidos (pedidos -> productos + inventario) y de
+GET /productos/{id} en el despliegue multiproceso (un uvicorn por servicio,
+llamadas por HTTP loopback) frente al lanzador de proceso único (combinado.main).
+
+Uso:
+    python -m benchmarks.bench_combinado
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import jwt
+
+PETICIONES = 300
+CONCURRENCIA = 10
+TIMEOUT_SEGUNDOS = 30
+SECRET_KEY = os.getenv("SECRET_KEY", "benchmark")
+
+MULTIPROCESO = {"productos": 8111, "inventario": 8112, "pedidos": 8113}
+PUERTO_COMBINADO = 8110
+
+
+def lanzar(modulo: str, puerto: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{modulo}:app", "--port", str(puerto), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def esperar_listo(puerto: int):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < TIMEOUT_SEGUNDOS:
+        try:
+            if httpx.get(f"http://127.0.0.1:{puerto}/readyz", timeout=0.5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"El puerto {puerto} no estuvo listo en {TIMEOUT_SEGUNDOS}s")
+
+
+def entorno(directorio: str) -> dict:
+    return {
+        **os.environ,
+        "SECRET_KEY": SECRET_KEY,
+        "AUTH_DB_URL": f"sqlite+aiosqlite:///{directorio}/auth.db",
+        "PRODUCTOS_DB_URL": f"sqlite+aiosqlite:///{directorio}/productos.db",
+        "INVENTARIO_DB_URL": f"sqlite+aiosqlite:///{directorio}/inventario.db",
+        "PEDIDOS_DB_URL": f"sqlite+aiosqlite:///{directorio}/pedidos.db",
+        "PRODUCTOS_SERVICE_URL": f"http://127.0.0.1:{MULTIPROCESO['productos']}",
+        "INVENTARIO_SERVICE_URL": f"http://127.0.0.1:{MULTIPROCESO['inventario']}",
+        "INVENTARIO_COMPACTACION_INTERVALO": "0",
+        # Se mide el transporte entre servicios, no el load shedding
+        "LIMITE_ACTIVADO": "false",
+    }
+
+
+async def medir(client: httpx.AsyncClient, metodo: str, url: str, **kwargs) -> dict:
+    latencias = []
+    semaforo = asyncio.Semaphore(CONCURRENCIA)
+
+    async def una():
+        async with semaforo:
+            inicio = time.perf_counter()
+            resp = await client.request(metodo, url, **kwargs)
+            resp.raise_for_status()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    await una()  # calentamiento
+    latencias.clear()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una() for _ in range(PETICIONES)))
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "p50": statistics.median(latencias),
+        "p95": latencias[int(len(latencias) * 0.95) - 1],
+        "rps": PETICIONES / total,
+    }
+
+
+async def escenario(urls: dict[str, str]) -> dict:
+    token = jwt.encode({"sub": "benchmark"}, SECRET_KEY, algorithm="HS256")
+    async with httpx.AsyncClient(headers={"Authorization": f"Bearer {token}"}, timeout=30) as client:
+        producto = (await client.post(f"{urls['productos']}/productos", json={"nombre": "Bench", "descripcion": "x", "precio": 1.0})).json()
+        resp = await client.post(f"{urls['inventario']}/inventario", json={"producto_id": producto["id"], "cantidad": 1_000_000})
+        resp.raise_for_status()
+        return {
+            "GET /productos/{id}": await medir(client, "GET", f"{urls['productos']}/productos/{producto['id']}"),
+            "POST /pedidos": await medir(client, "POST", f"{urls['pedidos']}/pedidos", json={"producto_id": producto["id"], "cantidad": 1}),
+        }
+
+
+def multiproceso(directorio: str) -> dict:
+    env = entorno(directorio)
+    procesos = [lanzar(f"{servicio}.main", puerto, env) for servicio, puerto in MULTIPROCESO.items()]
+    try:
+        for puerto in MULTIPROCESO.values():
+            esperar_listo(puerto)
+        return asyncio.run(escenario({s: f"http://127.0.0.1:{p}" for s, p in MULTIPROCESO.items()}))
+    finally:
+        for proceso in procesos:
+            proceso.terminate()
+            proceso.wait()
+
+
+def combinado(directorio: str) -> dict:
+    proceso = lanzar("combinado.main", PUERTO_COMBINADO, entorno(directorio))
+    try:
+        esperar_listo(PUERTO_COMBINADO)
+        url = f"http://127.0.0.1:{PUERTO_COMBINADO}"
+        return asyncio.run(escenario({s: url for s in MULTIPROCESO}))
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def main():
+    resultados = {}
+    for nombre, funcion in (("multiproceso", multiproceso), ("proceso único", combinado)):
+        with tempfile.TemporaryDirectory() as directorio:
+            resultados[nombre] = funcion(directorio)
+
+    print(f"{PETICIONES} peticiones, concurrencia {CONCURRENCIA}")
+    for ruta in resultados["multiproceso"]:
+        print(f"== {ruta}")
+        for nombre, por_ruta in resultados.items():
+            r = por_ruta[ruta]
+            print(f"  {nombre:<13} p50 {r['p50']:6.1f} ms   p95 {r['p95']:6.1f} ms   {r['rps']:7.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
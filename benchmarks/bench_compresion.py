@@ -0,0 +1,84 @@
+"""
+Benchmark: tamaño y coste de GET /productos (100 productos con descripciones largas)
+con respuesta completa, con ?fields= y con compresión negociada (gzip, y br/zstd si están instalados).
+Usa la app real de Productos en proceso, sobre una base SQLite temporal.
+
+Uso:
+    python -m benchmarks.bench_compresion
+"""
+import asyncio
+import os
+import random
+import string
+import tempfile
+import time
+
+import httpx
+import jwt
+
+PRODUCTOS = 100
+LONGITUD_DESCRIPCION = 2000
+PETICIONES = 200
+ENLACES_MBIT = (10, 100)  # velocidades de red para estimar el tiempo de transferencia
+
+directorio = tempfile.mkdtemp()
+os.environ["PRODUCTOS_DB_URL"] = f"sqlite+aiosqlite:///{directorio}/productos.db"
+os.environ["SECRET_KEY"] = os.getenv("SECRET_KEY", "benchmark")
+os.environ["LIMITE_ACTIVADO"] = "false"
+
+from productos.main import app  # noqa: E402
+from productos.compresion import COMPRESORES  # noqa: E402
+from productos.models import Producto  # noqa: E402
+from productos.database import engine  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+
+async def sembrar():
+    random.seed(1)
+    palabras = ["".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9))) for _ in range(400)]
+    async with AsyncSession(engine) as session:
+        for i in range(PRODUCTOS):
+            descripcion = ""
+            while len(descripcion) < LONGITUD_DESCRIPCION:
+                descripcion += random.choice(palabras) + " "
+            session.add(Producto(nombre=f"Producto {i}", descripcion=descripcion, precio=i * 1.5))
+        await session.commit()
+
+
+async def medir(client: httpx.AsyncClient, params: dict, codificacion: str) -> tuple[int, float]:
+    cabeceras = {"Accept-Encoding": codificacion}
+    resp = await client.get("/productos", params=params, headers=cabeceras)
+    resp.raise_for_status()
+    tamano = len(resp.content) if codificacion == "identity" else int(resp.headers["content-length"])
+    inicio = time.perf_counter()
+    for _ in range(PETICIONES):
+        await client.get("/productos", params=params, headers=cabeceras)
+    return tamano, (time.perf_counter() - inicio) / PETICIONES * 1000
+
+
+async def main():
+    async with app.router.lifespan_context(app):
+        await sembrar()
+        token = jwt.encode({"sub": "benchmark"}, os.environ["SECRET_KEY"], algorithm="HS256")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", headers={"Authorization": f"Bearer {token}"}
+        ) as client:
+            escenarios = [("completa", {}, "identity"), ("?fields=id,nombre,precio", {"fields": "id,nombre,precio"}, "identity")]
+            escenarios += [(f"completa + {c}", {}, c) for c in ("gzip", "br", "zstd") if c in COMPRESORES]
+            escenarios += [("?fields + gzip", {"fields": "id,nombre,precio"}, "gzip")]
+
+            print(f"GET /productos: {PRODUCTOS} productos, descripción de ~{LONGITUD_DESCRIPCION} caracteres, {PETICIONES} peticiones")
+            cabecera_red = "".join(f"  red {m:>3} Mbit/s" for m in ENLACES_MBIT)
+            print(f"  {'respuesta':<26}{'bytes':>10}  {'servidor':>10}{cabecera_red}")
+            base = None
+            for nombre, params, codificacion in escenarios:
+                tamano, ms_servidor = await medir(client, params, codificacion)
+                base = base or tamano
+                red = "".join(f"  {ms_servidor + tamano * 8 / (m * 1000):10.1f} ms" for m in ENLACES_MBIT)
+                print(f"  {nombre:<26}{tamano:>10}  {ms_servidor:7.2f} ms{red}   ({tamano / base:.0%})")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
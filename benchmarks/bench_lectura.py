@@ -0,0 +1,117 @@
+"""
+Benchmark: ruta de lectura de GET /pedidos.
+Compara el camino ORM (select(Pedido): entidades con estado de instancia y mapa de identidad)
+con la ruta sin ORM (tuplas de columnas a registros PedidoFila con __slots__).
+Mide la memoria pico para 100k filas y las req/s de un listado sobre una base SQLite temporal.
+
+Uso:
+    python -m benchmarks.bench_lectura
+"""
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel, select
+
+directorio = tempfile.mkdtemp()
+os.environ["PEDIDOS_DB_URL"] = f"sqlite+aiosqlite:///{directorio}/pedidos.db"
+
+from pedidos.database import engine, get_session  # noqa: E402
+from pedidos.lectura import columnas, leer_filas  # noqa: E402
+from pedidos.models import Pedido, PedidoFila  # noqa: E402
+from pedidos.responses import RespuestaRapida  # noqa: E402
+
+FILAS_MEMORIA = 100_000
+FILAS_LISTADO = 1_000
+PETICIONES = 200
+
+LISTA_ORM_JSON = RespuestaRapida(list[Pedido])
+LISTA_LIGERA_JSON = RespuestaRapida(list[PedidoFila])
+
+
+async def leer_orm(session: AsyncSession) -> list[Pedido]:
+    return (await session.execute(select(Pedido))).scalars().all()
+
+
+async def leer_ligera(session: AsyncSession) -> list[PedidoFila]:
+    return await leer_filas(session, select(*columnas(PedidoFila, Pedido)), PedidoFila)
+
+
+app = FastAPI()
+
+
+@app.get("/orm", response_model=list[Pedido])
+async def listado_orm(session: AsyncSession = Depends(get_session)):
+    return LISTA_ORM_JSON(await leer_orm(session))
+
+
+@app.get("/ligera", response_model=list[Pedido])
+async def listado_ligero(session: AsyncSession = Depends(get_session)):
+    return LISTA_LIGERA_JSON(await leer_ligera(session))
+
+
+async def sembrar(filas: int):
+    async with engine.begin() as conn:
+        await conn.execute(delete(Pedido))
+        ahora = datetime.utcnow()
+        await conn.execute(insert(Pedido), [
+            {"producto_id": i % 50 + 1, "cantidad": i % 5 + 1, "estado": "PENDIENTE", "created_at": ahora}
+            for i in range(filas)
+        ])
+
+
+async def medir_memoria(leer, serializador) -> tuple[float, float]:
+    """ Memoria pico (MB) y tiempo (ms) de leer y serializar todas las filas """
+    async with AsyncSession(engine) as session:
+        inicio = time.perf_counter()
+        serializador(await leer(session))
+        ms = (time.perf_counter() - inicio) * 1000
+    async with AsyncSession(engine) as session:
+        tracemalloc.start()
+        filas = await leer(session)
+        serializador(filas)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return pico / 1024 / 1024, ms
+
+
+async def medir_peticiones(client: httpx.AsyncClient, ruta: str) -> float:
+    (await client.get(ruta)).raise_for_status()  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(PETICIONES):
+        resp = await client.get(ruta)
+        resp.raise_for_status()
+    return PETICIONES / (time.perf_counter() - inicio)
+
+
+async def main():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    await sembrar(FILAS_MEMORIA)
+    print(f"Memoria pico leyendo y serializando {FILAS_MEMORIA} pedidos")
+    orm_mb, orm_ms = await medir_memoria(leer_orm, LISTA_ORM_JSON)
+    ligera_mb, ligera_ms = await medir_memoria(leer_ligera, LISTA_LIGERA_JSON)
+    print(f"  ORM (select(Pedido))  : {orm_mb:7.1f} MB  {orm_ms:7.0f} ms")
+    print(f"  sin ORM (PedidoFila)  : {ligera_mb:7.1f} MB  {ligera_ms:7.0f} ms  (memoria x{orm_mb / ligera_mb:.1f} menor)")
+
+    await sembrar(FILAS_LISTADO)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        antes = await medir_peticiones(client, "/orm")
+        despues = await medir_peticiones(client, "/ligera")
+    print(f"GET de {FILAS_LISTADO} pedidos ({PETICIONES} peticiones)")
+    print(f"  ORM (select(Pedido))  : {antes:8.1f} req/s")
+    print(f"  sin ORM (PedidoFila)  : {despues:8.1f} req/s  (x{despues / antes:.1f})")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
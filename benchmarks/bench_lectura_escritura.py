@@ -0,0 +1,113 @@
+"""
+Benchmark: latencia de escritura en pedidos mientras se sirven listados grandes (GET /pedidos).
+Compara el engine único (diario rollback de SQLite: las lecturas largas retienen el bloqueo
+compartido y el commit espera) con el motor de lectura separado (PEDIDOS_DB_SOLO_LECTURA=true:
+pool en modo ro sobre la base en WAL).
+Un proceso aparte inserta pedidos y mide cada commit; el proceso principal lee sin parar.
+
+Uso:
+    python -m benchmarks.bench_lectura_escritura
+"""
+import asyncio
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+FILAS = 100_000
+LECTORES = 4
+SEGUNDOS = 5
+
+
+def escritor(ruta: str, segundos: float):
+    """ Inserta un pedido por commit durante `segundos` e imprime la latencia de cada uno (ms) """
+    conn = sqlite3.connect(ruta, timeout=30)
+    fin = time.monotonic() + segundos
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        conn.execute(
+            "INSERT INTO pedido (producto_id, cantidad, estado, created_at) VALUES (1, 1, 'PENDIENTE', datetime('now'))"
+        )
+        conn.commit()
+        print(f"{(time.perf_counter() - inicio) * 1000:.3f}", flush=True)
+        time.sleep(0.005)
+    conn.close()
+
+
+async def escenario(ruta: str):
+    """ Sirve GET /pedidos en bucle con la app real mientras el escritor mide sus commits """
+    import httpx
+    import jwt
+    from sqlalchemy import insert
+    from sqlmodel import SQLModel
+    from pedidos.database import engine, read_engine
+    from pedidos.main import app
+    from pedidos.models import Pedido
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(insert(Pedido), [
+            {"producto_id": i % 50 + 1, "cantidad": 1, "estado": "PENDIENTE"} for i in range(FILAS)
+        ])
+
+    proceso = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "benchmarks.bench_lectura_escritura", "--escritor", ruta,
+        stdout=subprocess.PIPE,
+    )
+    lecturas = 0
+    fin = time.monotonic() + SEGUNDOS
+
+    async def leer(client: httpx.AsyncClient):
+        nonlocal lecturas
+        while time.monotonic() < fin:
+            (await client.get("/pedidos")).raise_for_status()
+            lecturas += 1
+
+    token = jwt.encode({"sub": "benchmark"}, os.environ["SECRET_KEY"], algorithm="HS256")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None, headers={"Authorization": f"Bearer {token}"}
+    ) as client:
+        await asyncio.gather(*(leer(client) for _ in range(LECTORES)))
+    salida, _ = await proceso.communicate()
+    latencias = sorted(float(linea) for linea in salida.split())
+
+    separado = read_engine is not engine
+    await engine.dispose()
+    if separado:
+        await read_engine.dispose()
+    p99 = latencias[int(len(latencias) * 0.99) - 1]
+    print(
+        f"  {'motor de lectura (ro + WAL)' if separado else 'engine único':<28}"
+        f"{lecturas:>6} lecturas  {len(latencias):>6} commits  "
+        f"p50 {statistics.median(latencias):7.1f} ms  p99 {p99:7.1f} ms  máx {latencias[-1]:7.1f} ms"
+    )
+
+
+def main():
+    print(f"Commits de pedidos durante {SEGUNDOS} s con {LECTORES} lectores de GET /pedidos ({FILAS} filas)")
+    for solo_lectura in ("false", "true"):
+        ruta = os.path.join(tempfile.mkdtemp(), "pedidos.db")
+        entorno = {
+            **os.environ,
+            "PEDIDOS_DB_URL": f"sqlite+aiosqlite:///{ruta}",
+            "PEDIDOS_DB_SOLO_LECTURA": solo_lectura,
+            "SECRET_KEY": os.getenv("SECRET_KEY", "benchmark"),
+            "GATEWAY_SECRET": "",
+            "LIMITE_ACTIVADO": "false",
+            "COMPRESION_ACTIVADA": "false",
+        }
+        # Cada escenario en su propio proceso: la configuración de los engines se lee al importar
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_lectura_escritura", "--escenario", ruta], env=entorno, check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--escritor":
+        escritor(sys.argv[2], SEGUNDOS)
+    elif len(sys.argv) == 3 and sys.argv[1] == "--escenario":
+        asyncio.run(escenario(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: movimientos de stock individuales (un PATCH y un commit por movimiento)
+frente a la agrupación en lotes de pedidos.clients (un POST y un commit por lote).
+Lanza Inventario con uvicorn sobre una base SQLite temporal y dispara SALIDAs concurrentes.
+
+Uso:
+    python -m benchmarks.bench_lotes
+"""
+import asyncio
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PUERTO = 8121
+MOVIMIENTOS = 1000
+CONCURRENCIA = 100
+PRODUCTOS = 10
+TIMEOUT_SEGUNDOS = 30
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["INVENTARIO_SERVICE_URL"] = f"http://127.0.0.1:{PUERTO}"
+
+from pedidos.clients import InventarioClient, agrupador_movimientos  # noqa: E402
+
+
+def lanzar_inventario(directorio: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "INVENTARIO_DB_URL": f"sqlite+aiosqlite:///{directorio}/inventario.db",
+        "INVENTARIO_COMPACTACION_INTERVALO": "0",
+        "LIMITE_ACTIVADO": "false",
+    }
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "inventario.main:app", "--port", str(PUERTO), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < TIMEOUT_SEGUNDOS:
+        try:
+            if httpx.get(f"http://127.0.0.1:{PUERTO}/readyz", timeout=0.5).status_code == 200:
+                return proceso
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    proceso.terminate()
+    raise TimeoutError(f"Inventario no estuvo listo en {TIMEOUT_SEGUNDOS}s")
+
+
+def sembrar(directorio: str, stock: int):
+    # Inserción directa: evita depender del servicio de Productos para crear inventario
+    with sqlite3.connect(f"{directorio}/inventario.db") as conn:
+        conn.execute("DELETE FROM movimientostock")
+        conn.execute("DELETE FROM inventario")
+        conn.executemany(
+            "INSERT INTO inventario (producto_id, cantidad) VALUES (?, ?)",
+            [(producto_id, stock) for producto_id in range(1, PRODUCTOS + 1)],
+        )
+
+
+async def ejecutar(con_lotes: bool) -> dict:
+    agrupador_movimientos.activo = con_lotes
+    cliente = InventarioClient()
+    semaforo = asyncio.Semaphore(CONCURRENCIA)
+    latencias, rechazos = [], 0
+
+    async def una(i: int):
+        nonlocal rechazos
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                await cliente.actualizar_stock(i % PRODUCTOS + 1, 1, "SALIDA", i)
+            except Exception:
+                rechazos += 1
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(i) for i in range(MOVIMIENTOS)))
+    total = time.perf_counter() - inicio
+    await agrupador_movimientos.cerrar()
+    latencias.sort()
+    return {
+        "rps": MOVIMIENTOS / total,
+        "p50": statistics.median(latencias),
+        "p95": latencias[int(len(latencias) * 0.95) - 1],
+        "rechazos": rechazos,
+        **({"por_lote": agrupador_movimientos.metricas()["movimientos_por_lote"]} if con_lotes else {}),
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        proceso = lanzar_inventario(directorio)
+        try:
+            print(f"{MOVIMIENTOS} SALIDAs, concurrencia {CONCURRENCIA}, {PRODUCTOS} productos")
+            for nombre, con_lotes in (("individual", False), ("en lotes", True)):
+                sembrar(directorio, stock=MOVIMIENTOS)
+                r = asyncio.run(ejecutar(con_lotes))
+                extra = f"   {r['por_lote']:.1f} mov/lote" if con_lotes else ""
+                print(f"  {nombre:<11} {r['rps']:7.1f} mov/s   p50 {r['p50']:6.1f} ms   p95 {r['p95']:6.1f} ms   rechazos {r['rechazos']}{extra}")
+
+            # Stock insuficiente: 5 unidades y 10 SALIDAs concurrentes en el mismo lote
+            sembrar(directorio, stock=5)
+            agrupador_movimientos.activo = True
+
+            async def agotar():
+                resultados = await asyncio.gather(
+                    *(InventarioClient().actualizar_stock(1, 1, "SALIDA") for _ in range(10)), return_exceptions=True
+                )
+                return sum(not isinstance(r, Exception) for r in resultados)
+
+            aceptadas = asyncio.run(agotar())
+            print(f"  stock 5, 10 SALIDAs en lote: {aceptadas} aceptadas, {10 - aceptadas} 'Stock insuficiente'")
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: serialización de un listado de 10k filas.
+Compara el camino por defecto de FastAPI (response_model + validación)
+con RespuestaRapida (TypeAdapter precompilado, sin revalidar).
+
+Uso:
+    python -m benchmarks.bench_serializacion
+"""
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from productos.models import Producto
+from productos.responses import RespuestaRapida
+
+FILAS = 10_000
+PETICIONES = 50
+
+productos = [
+    Producto(id=i, nombre=f"Producto {i}", descripcion="Descripción de prueba " * 5, precio=i * 1.5)
+    for i in range(FILAS)
+]
+LISTA_PRODUCTOS_JSON = RespuestaRapida(list[Producto])
+
+app = FastAPI()
+
+
+@app.get("/orm", response_model=list[Producto])
+async def listado_response_model():
+    return productos
+
+
+@app.get("/rapido", response_model=list[Producto])
+async def listado_rapido():
+    return LISTA_PRODUCTOS_JSON(productos)
+
+
+async def medir(client: httpx.AsyncClient, ruta: str) -> float:
+    await client.get(ruta)  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(PETICIONES):
+        resp = await client.get(ruta)
+        resp.raise_for_status()
+    return PETICIONES / (time.perf_counter() - inicio)
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        antes = await medir(client, "/orm")
+        despues = await medir(client, "/rapido")
+    print(f"Listado de {FILAS} filas ({PETICIONES} peticiones)")
+    print(f"  response_model : {antes:8.1f} req/s")
+    print(f"  RespuestaRapida: {despues:8.1f} req/s  (x{despues / antes:.1f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
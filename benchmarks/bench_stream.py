@@ -0,0 +1,77 @@
+"""
+Benchmark: difusión del stream de stock (inventario.notificador) en un worker.
+Simula N conexiones SSE suscritas a varios productos, publica cambios y mide
+el tiempo hasta que todas las conexiones reciben su evento y la memoria por suscripción.
+
+Uso:
+    python -m benchmarks.bench_stream
+"""
+import asyncio
+import random
+import time
+import tracemalloc
+
+import inventario.notificador as notificador_mod
+from inventario.notificador import NotificadorStock
+
+CONEXIONES = 20_000
+PRODUCTOS = 1_000
+PRODUCTOS_POR_CONEXION = 5
+RAFAGAS = 20
+notificador_mod.INTERVALO_MIN_SEGUNDOS = 0  # se mide la difusión, no el límite de envío
+
+
+async def main():
+    notificador = NotificadorStock()
+    recibidos = 0
+    listos = asyncio.Event()
+    esperados = 0
+
+    async def stock_inicial(productos):
+        return {}
+
+    async def conexion(productos):
+        # Consumidor de un stream SSE: lee eventos hasta que se cancela
+        nonlocal recibidos
+        async for bloque in notificador.eventos(productos, stock_inicial):
+            recibidos += bloque.count("event: stock")
+            if esperados and recibidos >= esperados:
+                listos.set()
+
+    random.seed(1)
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    tareas = [
+        asyncio.create_task(conexion(set(random.sample(range(PRODUCTOS), PRODUCTOS_POR_CONEXION))))
+        for _ in range(CONEXIONES)
+    ]
+    await asyncio.sleep(0.1)
+    memoria = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+
+    # Cada ráfaga cambia el stock de 10 productos al azar
+    latencias = []
+    for rafaga in range(RAFAGAS):
+        productos = random.sample(range(PRODUCTOS), 10)
+        interesados = sum(len(notificador._por_producto.get(p, ())) for p in productos)
+        recibidos, esperados = 0, interesados
+        listos.clear()
+        inicio = time.perf_counter()
+        for producto_id in productos:
+            notificador.publicar(producto_id, rafaga)
+        await asyncio.wait_for(listos.wait(), 30)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    for tarea in tareas:
+        tarea.cancel()
+    await asyncio.gather(*tareas, return_exceptions=True)
+
+    latencias.sort()
+    print(f"{CONEXIONES} conexiones, {PRODUCTOS_POR_CONEXION} productos cada una, {RAFAGAS} ráfagas de 10 cambios")
+    print(f"  memoria por suscripción (incluye la tarea del consumidor): {memoria / CONEXIONES / 1024:.1f} KiB")
+    print(f"  entregas por ráfaga: ~{esperados}   difusión p50 {latencias[len(latencias) // 2]:.1f} ms   máx {latencias[-1]:.1f} ms")
+    print(f"  suscripciones activas tras cerrar: {notificador.suscripciones}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Lanzador de proceso único: auth, productos, inventario y pedidos en la misma app ASGI.
+Pensado para entornos pequeños y CI. Las llamadas entre servicios usan
+httpx.ASGITransport en lugar de HTTP por loopback.
+
+Uso:
+    uvicorn combinado.main:app --port 8000
+
+Rutas: /auth/... (Auth), /productos..., /inventario..., /pedidos... (sin cambios),
+más /healthz, /readyz y /metricas/clientes agregados.
+"""
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import HTTPException
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+import auth.main as auth_main
+import productos.main as productos_main
+import inventario.main as inventario_main
+import pedidos.main as pedidos_main
+from inventario.clients import balanceador_productos as inventario_a_productos
+from pedidos.clients import (
+    balanceador_productos as pedidos_a_productos, balanceador_inventario as pedidos_a_inventario, agrupador_movimientos,
+)
+from pedidos.dependencies import security, validar_token
+from combinado.logger_config import configurar_logger
+
+logger = configurar_logger("COMBINADO-MAIN")
+
+# Orden de arranque: los servicios de los que dependen otros van primero (el cierre es inverso)
+SERVICIOS = {
+    "auth": auth_main,
+    "productos": productos_main,
+    "inventario": inventario_main,
+    "pedidos": pedidos_main,
+}
+
+# Los clientes llaman directamente a la app del servicio destino (sin red)
+inventario_a_productos.usar_app_local(productos_main.app)
+pedidos_a_productos.usar_app_local(productos_main.app)
+pedidos_a_inventario.usar_app_local(inventario_main.app)
+# Las dependencias están en el mismo proceso: /readyz de cada servicio solo comprueba su DB
+inventario_main.salud.dependencias = {}
+pedidos_main.salud.dependencias = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    async with AsyncExitStack() as pila:
+        for nombre, modulo in SERVICIOS.items():
+            await pila.enter_async_context(modulo.app.router.lifespan_context(modulo.app))
+        logger.info(f"Servicios iniciados en un único proceso: {list(SERVICIOS)}")
+        yield
+        logger.info("Deteniendo servicios")
+
+
+async def healthz(request):
+    return JSONResponse({"estado": "ok"})
+
+
+async def readyz(request):
+    servicios = {}
+    for nombre, modulo in SERVICIOS.items():
+        estado = await modulo.salud.estado()
+        servicios[nombre] = {"listo": modulo.salud.listo and estado["db"], "arranque_ms": modulo.salud.arranque_ms}
+    listo = all(s["listo"] for s in servicios.values())
+    return JSONResponse({"listo": listo, "servicios": servicios}, status_code=200 if listo else 503)
+
+
+async def metricas_clientes(request):
+    # Misma autenticación que en cada servicio: token JWT o secreto del gateway
+    try:
+        await validar_token(request, await security(request))
+    except HTTPException as e:
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+    return JSONResponse({
+        "inventario": {"productos": inventario_a_productos.metricas()},
+        "pedidos": {
+            "productos": pedidos_a_productos.metricas(),
+            "inventario": pedidos_a_inventario.metricas(),
+            "lotes_inventario": agrupador_movimientos.metricas(),
+        },
+    })
+
+
+base = Starlette(
+    routes=[
+        Route("/healthz", healthz),
+        Route("/readyz", readyz),
+        Route("/metricas/clientes", metricas_clientes),
+        Mount("/auth", app=auth_main.app),
+    ],
+    lifespan=lifespan,
+)
+
+
+class Despachador:
+    """ Envía cada petición a la app del servicio según el prefijo, sin reescribir la ruta """
+
+    def __init__(self, base, apps: dict):
+        self.base = base
+        self.apps = apps
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            ruta = scope["path"]
+            for prefijo, destino in self.apps.items():
+                if ruta == prefijo or ruta.startswith(prefijo + "/"):
+                    return await destino(scope, receive, send)
+        # Lifespan, Auth y las rutas agregadas
+        await self.base(scope, receive, send)
+
+
+app = Despachador(base, {
+    "/productos": productos_main.app,
+    "/inventario": inventario_main.app,
+    "/pedidos": pedidos_main.app,
+})
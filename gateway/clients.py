@@ -0,0 +1,116 @@
+import os
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, Response, status
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+from gateway.logger_config import configurar_logger
+
+load_dotenv()
+
+logger = configurar_logger("GATEWAY-CLIENTS")
+
+# Secreto compartido: los servicios confían en el token que el gateway ya validó
+GATEWAY_SECRET = os.getenv("GATEWAY_SECRET")
+
+SERVICIOS = {
+    "auth": os.getenv("AUTH_SERVICE_URL", "http://127.0.0.1:8000"),
+    "productos": os.getenv("PRODUCTOS_SERVICE_URL", "http://127.0.0.1:8001"),
+    "inventario": os.getenv("INVENTARIO_SERVICE_URL", "http://127.0.0.1:8002"),
+    "pedidos": os.getenv("PEDIDOS_SERVICE_URL", "http://127.0.0.1:8003"),
+}
+
+# Conexiones keep-alive por servicio
+LIMITES = httpx.Limits(
+    max_connections=int(os.getenv("GATEWAY_MAX_CONEXIONES", "100")),
+    max_keepalive_connections=int(os.getenv("GATEWAY_MAX_KEEPALIVE", "20")),
+)
+
+# Cabeceras que se reenvían en cada sentido
+CABECERAS_PETICION = {"authorization", "content-type", "accept"}
+CABECERAS_RESPUESTA = {"content-type", "retry-after", "www-authenticate"}
+
+
+class ServicioClient:
+    """ Cliente con pool de conexiones keep-alive hacia un servicio interno """
+
+    def __init__(self, nombre: str, base_url: str):
+        self.nombre = nombre
+        self.client = httpx.AsyncClient(base_url=base_url, limits=LIMITES)
+        # Streams (SSE): sin timeout de lectura y fuera del pool, para no agotar las conexiones de las peticiones normales
+        self.client_stream = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(5.0, read=None),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=0),
+        )
+
+    def _cabeceras(self, request: Request) -> dict:
+        reenviadas = {k: v for k, v in request.headers.items() if k.lower() in CABECERAS_PETICION}
+        # IP del cliente final para los límites por IP de los servicios (sin ella verían siempre la del gateway).
+        # Se sobrescribe la X-Forwarded-For del cliente para que no pueda falsearla
+        if request.client:
+            reenviadas["X-Forwarded-For"] = request.client.host
+        # Los servicios responden sin comprimir al gateway; la compresión se negocia solo con el cliente final
+        reenviadas["Accept-Encoding"] = "identity"
+        if GATEWAY_SECRET:
+            reenviadas["X-Gateway-Secret"] = GATEWAY_SECRET
+        return reenviadas
+
+    async def reenviar(self, request: Request, ruta: str) -> Response:
+        """ Reenvía la petición tal cual y devuelve la respuesta del servicio """
+        try:
+            resp = await self.client.request(
+                request.method,
+                ruta,
+                params=request.query_params,
+                content=await request.body(),
+                headers=self._cabeceras(request),
+            )
+        except httpx.RequestError as e:
+            logger.error(f"Error de conexión con {self.nombre}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"El servicio de {self.nombre} no está disponible.",
+            )
+        cabeceras = {k: v for k, v in resp.headers.items() if k.lower() in CABECERAS_RESPUESTA}
+        return Response(content=resp.content, status_code=resp.status_code, headers=cabeceras)
+
+    async def reenviar_stream(self, request: Request, ruta: str) -> Response:
+        """ Reenvía una respuesta en streaming (p. ej. Server-Sent Events) sin acumularla """
+        peticion = self.client_stream.build_request(
+            "GET", ruta, params=request.query_params, headers=self._cabeceras(request)
+        )
+        try:
+            resp = await self.client_stream.send(peticion, stream=True)
+        except httpx.RequestError as e:
+            logger.error(f"Error de conexión con {self.nombre}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"El servicio de {self.nombre} no está disponible.",
+            )
+        cabeceras = {k: v for k, v in resp.headers.items() if k.lower() in CABECERAS_RESPUESTA | {"cache-control"}}
+        if resp.status_code != 200:
+            contenido = await resp.aread()
+            await resp.aclose()
+            return Response(content=contenido, status_code=resp.status_code, headers=cabeceras)
+        return StreamingResponse(
+            resp.aiter_raw(), status_code=resp.status_code, headers=cabeceras, background=BackgroundTask(resp.aclose)
+        )
+
+    async def obtener_json(self, ruta: str, request: Request) -> dict:
+        """ GET interno para las vistas compuestas; los errores se propagan como HTTPException """
+        try:
+            resp = await self.client.get(ruta, headers=self._cabeceras(request))
+        except httpx.RequestError as e:
+            logger.error(f"Error de conexión con {self.nombre}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"El servicio de {self.nombre} no está disponible.",
+            )
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail=resp.json().get("detail"))
+        return resp.json()
+
+    async def cerrar(self):
+        await self.client.aclose()
+        await self.client_stream.aclose()
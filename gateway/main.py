@@ -0,0 +1,92 @@
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request
+from starlette.responses import JSONResponse
+
+from gateway.clients import ServicioClient, SERVICIOS
+from gateway.dependencies import validar_token
+from gateway.logger_config import configurar_logger
+from gateway.compresion import CompresionRespuestas
+
+logger = configurar_logger("GATEWAY-MAIN")
+
+clientes: dict[str, ServicioClient] = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Iniciando gateway. Servicios: {SERVICIOS}")
+    for nombre, url in SERVICIOS.items():
+        clientes[nombre] = ServicioClient(nombre, url)
+    yield
+    logger.info("Cerrando conexiones del gateway")
+    for cliente in clientes.values():
+        await cliente.cerrar()
+    clientes.clear()
+
+app = FastAPI(title="API Gateway", lifespan=lifespan)
+app.add_middleware(CompresionRespuestas)
+
+async def healthz(request):
+    return JSONResponse({"estado": "ok"})
+
+app.router.add_route("/healthz", healthz, methods=["GET"], include_in_schema=False)
+
+METODOS = ["GET", "POST", "PATCH", "PUT", "DELETE"]
+
+# --- AUTH (sin token: login, registro y refresh) ---
+@app.api_route("/auth/{ruta:path}", methods=METODOS)
+async def proxy_auth(ruta: str, request: Request):
+    return await clientes["auth"].reenviar(request, f"/{ruta}")
+
+# --- SERVICIOS PROTEGIDOS (el token se valida aquí una sola vez) ---
+@app.api_route("/productos", methods=METODOS, dependencies=[Depends(validar_token)])
+@app.api_route("/productos/{ruta:path}", methods=METODOS, dependencies=[Depends(validar_token)])
+async def proxy_productos(request: Request):
+    return await clientes["productos"].reenviar(request, request.url.path)
+
+@app.get("/inventario/stream", dependencies=[Depends(validar_token)])
+async def proxy_stream_inventario(request: Request):
+    """ Stream de stock (SSE): se reenvía sin acumular la respuesta """
+    return await clientes["inventario"].reenviar_stream(request, "/inventario/stream")
+
+@app.api_route("/inventario", methods=METODOS, dependencies=[Depends(validar_token)])
+@app.api_route("/inventario/{ruta:path}", methods=METODOS, dependencies=[Depends(validar_token)])
+async def proxy_inventario(request: Request):
+    return await clientes["inventario"].reenviar(request, request.url.path)
+
+@app.api_route("/pedidos", methods=METODOS, dependencies=[Depends(validar_token)])
+@app.api_route("/pedidos/{ruta:path}", methods=METODOS, dependencies=[Depends(validar_token)])
+async def proxy_pedidos(request: Request):
+    return await clientes["pedidos"].reenviar(request, request.url.path)
+
+# --- VISTAS COMPUESTAS ---
+async def _detalle_producto(producto_id: int, request: Request) -> dict:
+    """ Producto y stock en paralelo. Si uno falla, se devuelve null y el error """
+    producto, inventario = await asyncio.gather(
+        clientes["productos"].obtener_json(f"/productos/{producto_id}", request),
+        clientes["inventario"].obtener_json(f"/inventario/{producto_id}", request),
+        return_exceptions=True,
+    )
+    vista, errores = {}, {}
+    for nombre, resultado in (("producto", producto), ("inventario", inventario)):
+        if isinstance(resultado, HTTPException):
+            vista[nombre] = None
+            errores[nombre] = resultado.detail
+        elif isinstance(resultado, BaseException):
+            raise resultado
+        else:
+            vista[nombre] = resultado
+    if errores:
+        vista["errores"] = errores
+    return vista
+
+@app.get("/vistas/pedidos/{pedido_id}", dependencies=[Depends(validar_token)])
+async def vista_pedido(pedido_id: int, request: Request):
+    """ Pedido con el detalle del producto y su stock actual, en una sola llamada """
+    pedido = await clientes["pedidos"].obtener_json(f"/pedidos/{pedido_id}", request)
+    return {"pedido": pedido, **await _detalle_producto(pedido["producto_id"], request)}
+
+@app.get("/vistas/productos/{producto_id}", dependencies=[Depends(validar_token)])
+async def vista_producto(producto_id: int, request: Request):
+    """ Producto con su stock actual """
+    return await _detalle_producto(producto_id, request)
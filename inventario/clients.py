@@ -1,22 +1,28 @@
 import os
 import httpx
 import jwt
-import aiobreaker
 from datetime import timedelta
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
 from fastapi import HTTPException
 from inventario.logger_config import configurar_logger
+from inventario.balanceador import BalanceadorReplicas
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 logger = configurar_logger("INVENTARIO-CLIENTS")
 
 # --- CONFIGURACIÓN DE RESILIENCIA ---
-# El breaker excluye HTTPException porque son errores de negocio (404, 400, etc.)
-# Solo los errores de conexión (httpx.RequestError) deberían abrir el circuito
-breaker_productos = aiobreaker.CircuitBreaker(
+# Cada réplica tiene su propio circuit breaker. Solo envuelve la llamada HTTP,
+# así que únicamente los errores de conexión (httpx.RequestError) abren el circuito;
+# los errores de negocio (404, 400, etc.) se resuelven después en el cliente.
+# Con BREAKER_DIRECTORIO_COMPARTIDO, el estado del breaker es común a todos los workers del host
+CONFIG_BREAKER = dict(
     fail_max=5, 
     timeout_duration=timedelta(seconds=60),
-    exclude=[HTTPException]  # No contar errores de negocio como fallos
+)
+
+# Réplicas: PRODUCTOS_REPLICAS (lista separada por comas) o PRODUCTOS_REPLICAS_ARCHIVO
+balanceador_productos = BalanceadorReplicas(
+    "inventario-productos", "PRODUCTOS", "http://127.0.0.1:8001", **CONFIG_BREAKER
 )
 
 RETRY_POLICY = retry(
@@ -34,21 +40,21 @@ class BaseClient:
 
 
 class ProductoClient(BaseClient):
-    BASE_URL = "http://127.0.0.1:8001/productos"
+    balanceador = balanceador_productos
 
-    @breaker_productos
     @RETRY_POLICY
     async def check_producto_exists(self, producto_id: int):
         """
         Verifica si un producto existe en el servicio de Productos.
         Los errores se propagan al servicio para manejo centralizado.
         """
-        logger.info(f"Verificando existencia en Productos -> GET {self.BASE_URL}/{producto_id}")
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{self.BASE_URL}/{producto_id}",
-                headers=self.headers
-            )
+        logger.info(f"Verificando existencia en Productos -> GET /productos/{producto_id}")
+        resp = await self.balanceador.enviar(
+            "GET",
+            f"/productos/{producto_id}",
+            idempotente=True,  # con PRODUCTOS_HEDGING=true se cubre si tarda más que el p95
+            headers=self.headers
+        )
         
         if resp.status_code == 404:
             raise HTTPException(
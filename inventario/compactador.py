@@ -0,0 +1,39 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from inventario.database import engine
+from inventario.services import InventarioService
+from inventario.logger_config import configurar_logger
+
+load_dotenv()
+
+logger = configurar_logger("INVENTARIO-COMPACTADOR")
+
+# --- CONFIGURACIÓN DE COMPACTACIÓN ---
+# Cada cuántos segundos se pliegan los movimientos en snapshots (0 = desactivado)
+INTERVALO_SEGUNDOS = int(os.getenv("INVENTARIO_COMPACTACION_INTERVALO", "300"))
+# Antigüedad mínima de un movimiento para poder plegarlo (los recientes siguen visibles uno a uno;
+# la seguridad frente a transacciones sin confirmar la da la marca de compactar_movimientos)
+GRACIA_SEGUNDOS = int(os.getenv("INVENTARIO_COMPACTACION_GRACIA", "30"))
+# Movimientos pendientes mínimos por producto para generar un nuevo snapshot
+MIN_MOVIMIENTOS = int(os.getenv("INVENTARIO_COMPACTACION_MIN_MOVIMIENTOS", "50"))
+
+
+async def compactar_una_vez() -> int:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        servicio = InventarioService(session)
+        return await servicio.compactar_movimientos(GRACIA_SEGUNDOS, MIN_MOVIMIENTOS)
+
+
+async def ejecutar_compactador():
+    """ Tarea en segundo plano que compacta el libro de movimientos periódicamente """
+    logger.info(f"Compactador de stock iniciado (intervalo: {INTERVALO_SEGUNDOS}s)")
+    while True:
+        await asyncio.sleep(INTERVALO_SEGUNDOS)
+        try:
+            await compactar_una_vez()
+        except Exception as e:
+            # Un fallo puntual no debe detener el compactador
+            logger.error(f"Fallo en la compactación de stock: {str(e)}")
@@ -0,0 +1,122 @@
+import gzip
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Códecs opcionales: se ofrecen solo si el paquete está instalado (pip install brotli zstandard)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# --- CONFIGURACIÓN ---
+ACTIVADA = os.getenv("COMPRESION_ACTIVADA", "true").lower() == "true"
+# Por debajo de este tamaño la compresión no compensa su coste
+MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", "1024"))
+# Niveles moderados: se prioriza la latencia sobre el último byte
+NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "5"))
+NIVEL_BROTLI = int(os.getenv("COMPRESION_NIVEL_BROTLI", "4"))
+NIVEL_ZSTD = int(os.getenv("COMPRESION_NIVEL_ZSTD", "3"))
+
+# Los streams (SSE) no se comprimen: se acumularían en lugar de enviarse al momento
+TIPOS_EXCLUIDOS = ("text/event-stream",)
+
+COMPRESORES = {"gzip": lambda datos: gzip.compress(datos, compresslevel=NIVEL_GZIP, mtime=0)}
+if brotli is not None:
+    COMPRESORES["br"] = lambda datos: brotli.compress(datos, quality=NIVEL_BROTLI)
+if zstandard is not None:
+    _zstd = zstandard.ZstdCompressor(level=NIVEL_ZSTD)
+    COMPRESORES["zstd"] = _zstd.compress
+# Preferencia del servidor cuando el cliente acepta varios con la misma prioridad
+PREFERENCIA = ["zstd", "br", "gzip"]
+
+
+def elegir_codificacion(accept_encoding: str) -> str | None:
+    """ Negocia la codificación según Accept-Encoding (con valores q) y los códecs disponibles """
+    aceptadas = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                continue
+        aceptadas[nombre.strip().lower()] = calidad
+    comodin = aceptadas.get("*", 0.0)
+    candidatas = [
+        (aceptadas.get(nombre, comodin), -PREFERENCIA.index(nombre), nombre)
+        for nombre in PREFERENCIA if nombre in COMPRESORES
+    ]
+    calidad, _, nombre = max(candidatas)
+    return nombre if calidad > 0 else None
+
+
+class CompresionRespuestas:
+    """
+    Middleware ASGI de compresión negociada (zstd, br o gzip).
+    Solo comprime respuestas completas mayores que COMPRESION_MIN_BYTES;
+    las respuestas en streaming pasan sin cambios.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ACTIVADA or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cabeceras = dict(scope["headers"])
+        codificacion = elegir_codificacion(cabeceras.get(b"accept-encoding", b"").decode("latin-1"))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        cuerpo = []
+        en_paso = False  # streaming o no comprimible: se reenvía tal cual
+
+        async def enviar(mensaje):
+            nonlocal inicio, en_paso
+            if en_paso:
+                await send(mensaje)
+                return
+            if mensaje["type"] == "http.response.start":
+                inicio = mensaje
+                cabeceras_resp = dict(mensaje.get("headers", []))
+                tipo = cabeceras_resp.get(b"content-type", b"").decode("latin-1")
+                sin_cuerpo = mensaje["status"] in (204, 304)
+                if sin_cuerpo or b"content-encoding" in cabeceras_resp or tipo.startswith(TIPOS_EXCLUIDOS):
+                    en_paso = True
+                    await send(mensaje)
+                return
+            if mensaje["type"] != "http.response.body":
+                await send(mensaje)
+                return
+
+            cuerpo.append(mensaje.get("body", b""))
+            if mensaje.get("more_body", False):
+                if len(cuerpo) == 1:
+                    # Respuesta en streaming: no se acumula
+                    en_paso = True
+                    await send(inicio)
+                    await send(mensaje)
+                    cuerpo.clear()
+                return
+
+            datos = b"".join(cuerpo)
+            cabeceras_resp = [(k, v) for k, v in inicio.get("headers", []) if k.lower() != b"content-length"]
+            cabeceras_resp.append((b"vary", b"Accept-Encoding"))
+            if len(datos) >= MIN_BYTES:
+                datos = COMPRESORES[codificacion](datos)
+                cabeceras_resp.append((b"content-encoding", codificacion.encode()))
+            cabeceras_resp.append((b"content-length", str(len(datos)).encode()))
+            await send({**inicio, "headers": cabeceras_resp})
+            await send({"type": "http.response.body", "body": datos})
+
+        await self.app(scope, receive, enviar)
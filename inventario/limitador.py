@@ -0,0 +1,152 @@
+import hmac
+import json
+import math
+import os
+import time
+import jwt
+from dotenv import load_dotenv
+from starlette.routing import Match
+
+load_dotenv()
+
+# --- CONFIGURACIÓN DEL LIMITADOR ---
+ACTIVADO = os.getenv("LIMITE_ACTIVADO", "true").lower() == "true"
+LIMITE_INICIAL = float(os.getenv("LIMITE_CONCURRENCIA_INICIAL", "20"))
+LIMITE_MIN = float(os.getenv("LIMITE_CONCURRENCIA_MIN", "2"))
+LIMITE_MAX = float(os.getenv("LIMITE_CONCURRENCIA_MAX", "200"))
+# Latencia reciente por encima de (latencia base x tolerancia) se considera congestión
+TOLERANCIA_LATENCIA = float(os.getenv("LIMITE_TOLERANCIA_LATENCIA", "2.0"))
+# Fracción del límite disponible para tráfico externo; el resto queda reservado a llamadas internas
+FRACCION_EXTERNA = float(os.getenv("LIMITE_FRACCION_EXTERNA", "0.8"))
+# Lo que llega con el secreto del gateway es tráfico de clientes finales (el gateway ya validó el token)
+GATEWAY_SECRET = os.getenv("GATEWAY_SECRET")
+
+# Tokens de sistema: son los últimos en descartarse
+SUBS_INTERNOS = {"sistema-pedidos", "sistema-inventario"}
+# El stream de stock mantiene conexiones abiertas: no debe contar como concurrencia ni latencia
+RUTAS_EXCLUIDAS = {"/healthz", "/readyz", "/inventario/stream"}
+# Las peticiones que no coinciden con ninguna ruta (404, escaneos) comparten un único límite
+RUTA_DESCONOCIDA = "<desconocida>"
+
+
+class LimiteRuta:
+    """
+    Límite de concurrencia AIMD de una ruta.
+    Crece de forma aditiva mientras la latencia se mantiene cerca de la base
+    y se reduce de forma multiplicativa (como mucho una vez por latencia)
+    cuando aumenta o la ruta devuelve errores 5xx.
+    """
+
+    def __init__(self):
+        self.limite = LIMITE_INICIAL
+        self.en_curso = 0
+        self.latencia_base: float | None = None
+        self.latencia_reciente: float | None = None
+        self._ultima_reduccion = 0.0
+
+    def admitir(self, interno: bool) -> bool:
+        capacidad = self.limite if interno else max(self.limite * FRACCION_EXTERNA, 1)
+        return self.en_curso < capacidad
+
+    def registrar(self, latencia: float, error: bool):
+        if self.latencia_base is None:
+            self.latencia_base = self.latencia_reciente = latencia
+        # La base sigue al mínimo observado pero puede subir lentamente si cambia la carga real
+        self.latencia_base = min(latencia, self.latencia_base * 1.0005)
+        self.latencia_reciente = 0.9 * self.latencia_reciente + 0.1 * latencia
+
+        ahora = time.monotonic()
+        if error or self.latencia_reciente > self.latencia_base * TOLERANCIA_LATENCIA:
+            if ahora - self._ultima_reduccion > self.latencia_reciente:
+                self.limite = max(LIMITE_MIN, self.limite * 0.9)
+                self._ultima_reduccion = ahora
+        elif self.en_curso >= self.limite / 2:
+            # Solo crece cuando el límite se está usando de verdad
+            self.limite = min(LIMITE_MAX, self.limite + 1 / self.limite)
+
+    def reintentar_en(self) -> int:
+        return max(1, math.ceil(self.latencia_reciente or 1))
+
+
+class LimitadorAdaptativo:
+    """
+    Middleware ASGI de descarte de carga (load shedding) por ruta.
+    Las peticiones que exceden el límite se rechazan al instante con
+    503 + Retry-After en lugar de encolarse en uvicorn.
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+        self.limites: dict[str, LimiteRuta] = {}
+
+    async def __call__(self, scope, receive, send):
+        if not ACTIVADO or scope["type"] != "http" or scope["path"] in RUTAS_EXCLUIDAS:
+            await self.app(scope, receive, send)
+            return
+
+        clave = f"{scope['method']} {self._plantilla(scope)}"
+        limite = self.limites.get(clave)
+        if limite is None:
+            limite = self.limites[clave] = LimiteRuta()
+
+        if not limite.admitir(self._es_interno(scope)):
+            await self._rechazar(send, limite.reintentar_en())
+            return
+
+        estado = 500
+        async def send_con_estado(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        limite.en_curso += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_con_estado)
+        finally:
+            limite.en_curso -= 1
+            limite.registrar(time.perf_counter() - inicio, error=estado >= 500)
+
+    def _plantilla(self, scope) -> str:
+        """ Plantilla de la ruta (/productos/{producto_id}): el número de límites queda acotado por las rutas """
+        for ruta in self.router.routes:
+            coincidencia, _ = ruta.matches(scope)
+            if coincidencia != Match.NONE:
+                return ruta.path
+        return RUTA_DESCONOCIDA
+
+    def _es_interno(self, scope) -> bool:
+        """
+        Solo clasifica la petición para el reparto del límite: lee el `sub` del token sin verificar
+        la firma (la verifica validar_token en el endpoint). Así no se paga dos veces el JWT justo
+        cuando el servicio está sobrecargado; un `sub` falsificado no pasa de validar_token.
+        """
+        cabeceras = dict(scope["headers"])
+        secreto = cabeceras.get(b"x-gateway-secret")
+        # Lo que llega del gateway es tráfico externo: las llamadas entre servicios no pasan por él
+        if GATEWAY_SECRET and secreto and hmac.compare_digest(secreto, GATEWAY_SECRET.encode()):
+            return False
+        autorizacion = cabeceras.get(b"authorization")
+        if autorizacion:
+            _, _, token = autorizacion.decode("latin-1").partition(" ")
+            try:
+                payload = jwt.decode(token, options={"verify_signature": False})
+            except jwt.InvalidTokenError:
+                return False
+            return payload.get("sub") in SUBS_INTERNOS
+        return False
+
+    async def _rechazar(self, send, reintentar_en: int):
+        cuerpo = json.dumps({"detail": "Servicio sobrecargado. Intente más tarde."}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(cuerpo)).encode("latin-1")),
+                (b"retry-after", str(reintentar_en).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": cuerpo})
@@ -1,31 +1,98 @@
+import asyncio
 import os
+from datetime import datetime, timezone
+from typing import Any, Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI, Depends
-from contextlib import asynccontextmanager
-from sqlmodel import select
+from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager, suppress
+from starlette.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Importación de modelos y la conexion
-from inventario.database import init_db, get_session, engine
-from inventario.models import Inventario, InventarioCreate, InventarioUpdate
+from inventario.database import get_session, get_read_session, engine, read_engine, MIGRAR_AL_INICIAR, DB_PREWARM
+from inventario.migraciones import aplicar_migraciones, migraciones_pendientes
+from inventario.salud import VerificadorSalud
+from inventario.perfilador import PerfiladorConsultas
+from inventario.logger_config import configurar_logger
+from inventario.models import (
+    Inventario, InventarioCreate, InventarioUpdate, InventarioFila, MovimientoLote, ResultadoMovimiento, MovimientoStock,
+)
 from inventario.dependencies import validar_token
+from inventario.limitador import LimitadorAdaptativo
+from inventario.compresion import CompresionRespuestas
 from inventario.services import InventarioService
+from inventario.clients import balanceador_productos
+from inventario.compactador import ejecutar_compactador, INTERVALO_SEGUNDOS
+from inventario.notificador import notificador_stock, seguir_movimientos, MAX_SUSCRIPCIONES, MAX_PRODUCTOS, SONDEO_SEGUNDOS
+from inventario.responses import RespuestaRapida, campos_solicitados
 
 load_dotenv()
 
+# Movimientos máximos por lote en POST /inventario/movimientos/lote
+LOTE_MAX_MOVIMIENTOS = int(os.getenv("INVENTARIO_LOTE_MAX_MOVIMIENTOS", "1000"))
+
+# Serializadores precompilados (se mantiene response_model para la documentación OpenAPI)
+INVENTARIO_JSON = RespuestaRapida(Inventario)
+# Lecturas: registros ligeros (InventarioFila) serializados directamente, con la misma forma que Inventario
+FILA_INVENTARIO_JSON = RespuestaRapida(InventarioFila)
+LISTA_INVENTARIO_JSON = RespuestaRapida(list[InventarioFila])
+LISTA_PARCIAL_JSON = RespuestaRapida(list[dict[str, Any]])
+LISTA_MOVIMIENTOS_JSON = RespuestaRapida(list[MovimientoStock])
+LISTA_RESULTADOS_JSON = RespuestaRapida(list[ResultadoMovimiento])
+
+logger = configurar_logger("INVENTARIO-MAIN")
+salud = VerificadorSalud(engine, dependencias={
+    f"productos {url}": f"{url}/healthz" for url in balanceador_productos.urls
+})
+perfilador = PerfiladorConsultas(engine, read_engine)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Inicializando la base de datos Inventario")
-    await init_db()
+    logger.info("Inicializando la base de datos Inventario")
+    if MIGRAR_AL_INICIAR:
+        await aplicar_migraciones()
+    pendientes = await migraciones_pendientes()
+    if pendientes:
+        logger.error(f"Esquema desactualizado, migraciones pendientes: {pendientes}. Ejecute: python -m inventario.migraciones")
+    arranque_ms = await salud.precalentar(DB_PREWARM, esquema_al_dia=not pendientes)
+    logger.info(f"Servicio listo en {arranque_ms:.0f} ms")
+    tareas = []
+    if INTERVALO_SEGUNDOS > 0:
+        tareas.append(asyncio.create_task(ejecutar_compactador()))
+    if SONDEO_SEGUNDOS > 0:
+        tareas.append(asyncio.create_task(seguir_movimientos(engine)))
     yield
-    print("Cerrando la base de datos Inventario")
+    for tarea in tareas:
+        tarea.cancel()
+        with suppress(asyncio.CancelledError):
+            await tarea
+    logger.info("Cerrando la base de datos Inventario")
+    await balanceador_productos.cerrar()
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 app = FastAPI(
     title="Inventario Service",
     dependencies=[Depends(validar_token)], 
     lifespan=lifespan
 )
+salud.registrar(app)
+
+# Métricas internas: pasan por validar_token como el resto de endpoints
+@app.get("/metricas/clientes", include_in_schema=False)
+async def metricas_clientes():
+    """ Métricas de los clientes HTTP: tasa de hedging, coberturas ganadoras y estado de réplicas """
+    return JSONResponse({"productos": balanceador_productos.metricas()})
+
+@app.get("/metricas/stream", include_in_schema=False)
+async def metricas_stream():
+    """ Suscripciones activas al stream de stock y eventos publicados/entregados """
+    return JSONResponse(notificador_stock.metricas())
+
+app.add_middleware(LimitadorAdaptativo, router=app.router)
+app.add_middleware(CompresionRespuestas)
+perfilador.registrar(app)
 
 # --- ENDPOINTS ---
 
@@ -36,27 +103,75 @@ async def crear_inventario(
     session: AsyncSession = Depends(get_session)
 ):
     servicio = InventarioService(session)
-    return await servicio.crear_inventario(inventario_data)
+    return INVENTARIO_JSON(await servicio.crear_inventario(inventario_data))
 
-# 2. Listar (GET /inventario)
+# 2. Listar (GET /inventario). Con ?fields= solo se calculan y envían esas columnas
 @app.get("/inventario", response_model=list[Inventario])
-async def listar_inventario(session: AsyncSession = Depends(get_session)):
-    statement = select(Inventario)
-    resultado = await session.execute(statement)
+async def listar_inventario(fields: Optional[str] = None, session: AsyncSession = Depends(get_read_session)):
+    campos = campos_solicitados(fields, Inventario)
+    servicio = InventarioService(session)
+    if campos:
+        return LISTA_PARCIAL_JSON(await servicio.listar_inventario(campos))
+    return LISTA_INVENTARIO_JSON(await servicio.listar_inventario())
 
-    return resultado.scalars().all()
+async def _stock_actual(productos_ids: set[int]) -> dict[int, int]:
+    # Sesión propia y breve: la conexión a la DB no queda retenida mientras dura el stream
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        stock = await InventarioService(session).stock_de_productos(productos_ids)
+    return {producto_id: inventario.cantidad for producto_id, inventario in stock.items()}
 
-# 3. Leer Uno (GET /inventario/{id})
+# 2.1 Stream de stock (GET /inventario/stream?productos=1,2,3). Server-Sent Events:
+# una foto inicial y después cada cambio de stock de esos productos.
+# Se declara antes de /inventario/{producto_id} para que "stream" no se tome como ID
+@app.get("/inventario/stream")
+async def stream_stock(productos: str):
+    try:
+        productos_ids = {int(p) for p in productos.split(",") if p.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="'productos' debe ser una lista de IDs separados por comas")
+    if not productos_ids or len(productos_ids) > MAX_PRODUCTOS:
+        raise HTTPException(status_code=400, detail=f"Indique entre 1 y {MAX_PRODUCTOS} productos")
+    if notificador_stock.suscripciones >= MAX_SUSCRIPCIONES:
+        raise HTTPException(status_code=503, detail="Demasiadas suscripciones activas. Intente más tarde.", headers={"Retry-After": "5"})
+
+    return StreamingResponse(
+        notificador_stock.eventos(productos_ids, _stock_actual),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# 3. Leer Uno (GET /inventario/{id}). Con ?fecha= devuelve el stock en ese instante
 @app.get("/inventario/{producto_id}", response_model=Inventario)
-async def verificar_stock(producto_id: int, session: AsyncSession = Depends(get_session)):
+async def verificar_stock(
+    producto_id: int,
+    fecha: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    if fecha and fecha.tzinfo:
+        # Los movimientos se guardan en UTC sin zona horaria
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
     servicio = InventarioService(session)
-    return await servicio.verificar_stock(producto_id)
+    return FILA_INVENTARIO_JSON(await servicio.verificar_stock(producto_id, fecha))
 
-# 4. Actualizar (PATCH /inventario/{id})
-@app.patch("/inventario/{producto_id}")
+# 3.1 Historial de movimientos (GET /inventario/{id}/movimientos)
+@app.get("/inventario/{producto_id}/movimientos", response_model=list[MovimientoStock])
+async def listar_movimientos(producto_id: int, session: AsyncSession = Depends(get_read_session)):
+    servicio = InventarioService(session)
+    return LISTA_MOVIMIENTOS_JSON(await servicio.listar_movimientos(producto_id))
+
+# 4. Actualizar (PATCH /inventario/{id}). Registra un movimiento en el libro de stock
+@app.patch("/inventario/{producto_id}", response_model=Inventario)
 async def actualizar_stock(producto_id: int, 
     update_data: InventarioUpdate,
     session: AsyncSession = Depends(get_session)
 ):
     servicio = InventarioService(session)
-    return await servicio.actualizar_stock(producto_id, update_data)
+    return FILA_INVENTARIO_JSON(await servicio.actualizar_stock(producto_id, update_data))
+
+# 5. Lote de movimientos (POST /inventario/movimientos/lote). Un solo commit para todos
+@app.post("/inventario/movimientos/lote", response_model=list[ResultadoMovimiento])
+async def aplicar_lote(movimientos: list[MovimientoLote], session: AsyncSession = Depends(get_session)):
+    if len(movimientos) > LOTE_MAX_MOVIMIENTOS:
+        raise HTTPException(status_code=413, detail=f"Máximo {LOTE_MAX_MOVIMIENTOS} movimientos por lote")
+    servicio = InventarioService(session)
+    return LISTA_RESULTADOS_JSON(await servicio.aplicar_lote(movimientos))
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, inspect, select, text
+from sqlmodel import SQLModel
+
+from inventario.database import engine
+from inventario.models import Inventario, MovimientoStock, SnapshotStock
+from inventario.logger_config import configurar_logger
+
+logger = configurar_logger("INVENTARIO-MIGRACIONES")
+
+# Tabla de control con las versiones de esquema aplicadas
+version_esquema = Table(
+    "version_esquema",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("descripcion", String, nullable=False),
+    Column("aplicada_en", DateTime, nullable=False),
+)
+
+
+# --- MIGRACIONES (versión, descripción, función síncrona que recibe la conexión) ---
+def _v1(conn):
+    SQLModel.metadata.create_all(conn, tables=[Inventario.__table__])
+
+
+def _v2(conn):
+    SQLModel.metadata.create_all(conn, tables=[MovimientoStock.__table__, SnapshotStock.__table__])
+
+
+def _v3(conn):
+    # En bases nuevas la v2 ya crea la columna con el modelo actual
+    columnas = {columna["name"] for columna in inspect(conn).get_columns("movimientostock")}
+    if "referencia" not in columnas:
+        conn.execute(text("ALTER TABLE movimientostock ADD COLUMN referencia VARCHAR"))
+    indices = {indice["name"] for indice in inspect(conn).get_indexes("movimientostock")}
+    if "ix_movimientostock_referencia" not in indices:
+        conn.execute(text("CREATE UNIQUE INDEX ix_movimientostock_referencia ON movimientostock (referencia)"))
+
+
+MIGRACIONES = [
+    (1, "Esquema inicial: inventario", _v1),
+    (2, "Libro de movimientos y snapshots de stock", _v2),
+    (3, "Referencia de idempotencia en movimientos", _v3),
+]
+
+
+def _version_actual(conn) -> int:
+    # Solo lectura: sin tabla de control, ninguna migración aplicada (no se ejecuta DDL al comprobar)
+    if not inspect(conn).has_table("version_esquema"):
+        return 0
+    return conn.execute(select(func.max(version_esquema.c.version))).scalar() or 0
+
+
+def _aplicar(conn) -> list[int]:
+    version_esquema.create(conn, checkfirst=True)
+    actual = _version_actual(conn)
+    aplicadas = []
+    for version, descripcion, migracion in MIGRACIONES:
+        if version <= actual:
+            continue
+        logger.info(f"Aplicando migración {version}: {descripcion}")
+        migracion(conn)
+        conn.execute(insert(version_esquema).values(
+            version=version, descripcion=descripcion, aplicada_en=datetime.utcnow()
+        ))
+        aplicadas.append(version)
+    return aplicadas
+
+
+async def aplicar_migraciones() -> list[int]:
+    async with engine.begin() as conn:
+        return await conn.run_sync(_aplicar)
+
+
+async def migraciones_pendientes() -> list[int]:
+    async with engine.connect() as conn:
+        actual = await conn.run_sync(_version_actual)
+    return [version for version, _, _ in MIGRACIONES if version > actual]
+
+
+if __name__ == "__main__":
+    # Ejecución fuera de banda: python -m inventario.migraciones
+    aplicadas = asyncio.run(aplicar_migraciones())
+    logger.info(f"Migraciones aplicadas: {aplicadas or 'ninguna, el esquema está al día'}")
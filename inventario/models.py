@@ -1,4 +1,7 @@
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from pydantic import BaseModel
 
@@ -7,8 +10,18 @@ class InventarioBase(SQLModel):
     producto_id: int = Field(unique=True)
 
 class Inventario(InventarioBase, table=True):
+    # `cantidad` es el stock base (inicial) del producto. El stock actual se
+    # calcula como snapshot + movimientos posteriores, nunca se sobrescribe aquí.
     id: Optional[int] = Field(default=None, primary_key=True)
 
+# Registro de solo lectura con el stock calculado: mismos campos y orden que Inventario,
+# sin estado ORM ni validación (ver inventario/lectura.py)
+@dataclass(slots=True)
+class InventarioFila:
+    cantidad: int
+    producto_id: int
+    id: int
+
 class InventarioCreate(InventarioBase):
     pass
 
@@ -16,3 +29,45 @@ class InventarioCreate(InventarioBase):
 class InventarioUpdate(BaseModel):
     cantidad: int = Field(gt=0)
     tipo_movimiento: str
+    pedido_id: Optional[int] = None
+
+# Movimiento dentro de un lote (POST /inventario/movimientos/lote)
+class MovimientoLote(InventarioUpdate):
+    producto_id: int
+    # Clave de idempotencia: un movimiento con una referencia ya registrada no se vuelve a aplicar
+    referencia: Optional[str] = None
+
+# Resultado individual de cada movimiento del lote, en el mismo orden
+class ResultadoMovimiento(BaseModel):
+    producto_id: int
+    status_code: int
+    detail: Optional[str] = None
+    inventario: Optional[Inventario] = None  # stock tras aplicar el lote completo
+
+# --- LIBRO DE MOVIMIENTOS (append-only) ---
+class MovimientoStock(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    producto_id: int
+    tipo_movimiento: str  # ENTRADA / SALIDA
+    cantidad: int
+    pedido_id: Optional[int] = None
+    referencia: Optional[str] = Field(default=None, unique=True)  # idempotencia de los lotes
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    # Índice cubriente: el cálculo de stock (producto + id > snapshot) se resuelve sin leer la tabla
+    __table_args__ = (
+        Index("ix_movimientostock_producto_stock", "producto_id", "id", "tipo_movimiento", "cantidad", "created_at"),
+    )
+
+# Foto periódica del stock que condensa los movimientos hasta `ultimo_movimiento_id`
+class SnapshotStock(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    producto_id: int
+    cantidad: int
+    ultimo_movimiento_id: int
+    hasta: datetime  # created_at del último movimiento incluido
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_snapshotstock_producto_ultimo", "producto_id", "ultimo_movimiento_id", "cantidad", "hasta"),
+    )
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from inventario.logger_config import configurar_logger
+
+load_dotenv()
+
+logger = configurar_logger("INVENTARIO-NOTIFICADOR")
+
+# --- CONFIGURACIÓN ---
+# Límites por worker: conexiones simultáneas y productos por suscripción
+MAX_SUSCRIPCIONES = int(os.getenv("INVENTARIO_STREAM_MAX_SUSCRIPCIONES", "50000"))
+MAX_PRODUCTOS = int(os.getenv("INVENTARIO_STREAM_MAX_PRODUCTOS", "500"))
+# Comentario keep-alive para que proxies y clientes no cierren la conexión inactiva
+HEARTBEAT_SEGUNDOS = float(os.getenv("INVENTARIO_STREAM_HEARTBEAT", "15"))
+# Pausa mínima entre envíos a una misma conexión; los cambios intermedios se condensan
+INTERVALO_MIN_SEGUNDOS = float(os.getenv("INVENTARIO_STREAM_INTERVALO_MS", "100")) / 1000
+# Con varios workers, cada uno sigue el libro de movimientos para notificar
+# también los cambios aplicados por los demás (0 = solo cambios de este worker)
+SONDEO_SEGUNDOS = float(os.getenv("INVENTARIO_STREAM_SONDEO_MS", "0")) / 1000
+
+
+class Suscripcion:
+    """ Conexión suscrita a un conjunto de productos. Guarda solo el último stock pendiente de cada uno """
+
+    __slots__ = ("productos", "pendientes", "evento")
+
+    def __init__(self, productos: set[int]):
+        self.productos = productos
+        self.pendientes: dict[int, int] = {}
+        self.evento = asyncio.Event()
+
+
+class NotificadorStock:
+    """
+    Pub/sub en proceso de cambios de stock.
+    El índice producto -> suscripciones hace que publicar cueste lo mismo que
+    el número de conexiones interesadas en ese producto, no el total.
+    Backpressure: un consumidor lento no acumula eventos, solo el último valor por producto.
+    """
+
+    def __init__(self):
+        self._por_producto: dict[int, set[Suscripcion]] = {}
+        self._ultimo_valor: dict[int, int] = {}
+        self._todas: set[Suscripcion] = set()
+        self._heartbeat: asyncio.Task | None = None
+        self.estadisticas = {"publicados": 0, "entregas": 0}
+
+    def suscribir(self, productos: set[int]) -> Suscripcion:
+        suscripcion = Suscripcion(productos)
+        for producto_id in productos:
+            self._por_producto.setdefault(producto_id, set()).add(suscripcion)
+        self._todas.add(suscripcion)
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._latir())
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion):
+        for producto_id in suscripcion.productos:
+            interesados = self._por_producto.get(producto_id)
+            if interesados is None:
+                continue
+            interesados.discard(suscripcion)
+            if not interesados:
+                del self._por_producto[producto_id]
+                self._ultimo_valor.pop(producto_id, None)
+        self._todas.discard(suscripcion)
+
+    @property
+    def suscripciones(self) -> int:
+        return len(self._todas)
+
+    async def _latir(self):
+        """
+        Un único temporizador para todas las conexiones (en lugar de uno por conexión):
+        despierta a las inactivas para que envíen el heartbeat. Termina cuando no queda ninguna
+        """
+        while self._todas:
+            await asyncio.sleep(HEARTBEAT_SEGUNDOS)
+            for suscripcion in self._todas:
+                suscripcion.evento.set()
+
+    def hay_interesados(self, producto_id: int) -> bool:
+        return producto_id in self._por_producto
+
+    def publicar(self, producto_id: int, cantidad: int):
+        interesados = self._por_producto.get(producto_id)
+        # Sin suscriptores o sin cambio real (p. ej. ya notificado por el seguimiento del libro)
+        if not interesados or self._ultimo_valor.get(producto_id) == cantidad:
+            return
+        self._ultimo_valor[producto_id] = cantidad
+        self.estadisticas["publicados"] += 1
+        for suscripcion in interesados:
+            suscripcion.pendientes[producto_id] = cantidad
+            suscripcion.evento.set()
+
+    async def eventos(self, productos: set[int], cargar_stock):
+        """
+        Generador SSE: foto inicial, luego cambios condensados y heartbeats.
+        Se suscribe antes de leer la foto inicial para no perder cambios intermedios.
+        """
+        suscripcion = self.suscribir(productos)
+        try:
+            yield self._formatear(await cargar_stock(productos))
+            while True:
+                await suscripcion.evento.wait()
+                suscripcion.evento.clear()
+                if not suscripcion.pendientes:
+                    yield ": ping\n\n"
+                    continue
+                cambios, suscripcion.pendientes = suscripcion.pendientes, {}
+                self.estadisticas["entregas"] += len(cambios)
+                # El envío espera a que el cliente lea: mientras tanto los cambios se condensan
+                yield self._formatear(cambios)
+                if INTERVALO_MIN_SEGUNDOS:
+                    await asyncio.sleep(INTERVALO_MIN_SEGUNDOS)
+        finally:
+            self.cancelar(suscripcion)
+
+    @staticmethod
+    def _formatear(cambios: dict[int, int]) -> str:
+        return "".join(
+            f"event: stock\ndata: {json.dumps({'producto_id': producto_id, 'cantidad': cantidad})}\n\n"
+            for producto_id, cantidad in cambios.items()
+        )
+
+    def metricas(self) -> dict:
+        return {
+            "suscripciones": self.suscripciones,
+            "productos_observados": len(self._por_producto),
+            **self.estadisticas,
+        }
+
+
+notificador_stock = NotificadorStock()
+
+
+async def seguir_movimientos(engine):
+    """
+    Tarea en segundo plano (opcional): publica el stock de los productos con
+    suscriptores que recibieron movimientos desde la última revisión, aunque
+    los haya aplicado otro worker.
+    """
+    # Importación diferida: services importa este módulo
+    from inventario.models import MovimientoStock
+    from inventario.services import InventarioService
+
+    async with AsyncSession(engine) as session:
+        ultimo_id = (await session.execute(select(func.max(MovimientoStock.id)))).scalar() or 0
+    logger.info(f"Seguimiento del libro de movimientos iniciado (cada {SONDEO_SEGUNDOS * 1000:.0f} ms)")
+
+    while True:
+        await asyncio.sleep(SONDEO_SEGUNDOS)
+        try:
+            async with AsyncSession(engine) as session:
+                filas = (await session.execute(
+                    select(MovimientoStock.producto_id, func.max(MovimientoStock.id))
+                    .where(MovimientoStock.id > ultimo_id)
+                    .group_by(MovimientoStock.producto_id)
+                )).all()
+                if not filas:
+                    continue
+                ultimo_id = max(ultimo for _, ultimo in filas)
+                interesados = {producto_id for producto_id, _ in filas if notificador_stock.hay_interesados(producto_id)}
+                if interesados:
+                    stock = await InventarioService(session).stock_de_productos(interesados)
+                    for producto_id, inventario in stock.items():
+                        notificador_stock.publicar(producto_id, inventario.cantidad)
+        except Exception as e:
+            logger.error(f"Fallo al seguir el libro de movimientos: {str(e)}")
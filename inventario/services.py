@@ -1,16 +1,62 @@
+from datetime import datetime, timedelta
+from typing import Optional
 from fastapi import HTTPException, status
+from sqlalchemy import DateTime, Integer, String, case, func, insert, literal, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 import aiobreaker
 import httpx
 
-from inventario.models import Inventario, InventarioCreate, InventarioUpdate
+from inventario.models import (
+    Inventario, InventarioCreate, InventarioUpdate, InventarioFila, MovimientoLote, ResultadoMovimiento, MovimientoStock,
+    SnapshotStock,
+)
+from inventario.lectura import leer_filas
 from inventario.clients import ProductoClient
+from inventario.notificador import notificador_stock
 from inventario.logger_config import configurar_logger
 
 # Configuración del logger
 logger = configurar_logger("INVENTARIO-SERVICE")
 
+
+def expresion_stock(fecha: Optional[datetime] = None, hasta_movimiento_id: Optional[int] = None):
+    """
+    Expresión SQL del stock de cada fila de Inventario:
+    último snapshot (o stock base) + movimientos posteriores al snapshot.
+    Con `fecha` calcula el stock en ese instante (consulta histórica).
+    """
+    filtro_snapshot = [SnapshotStock.producto_id == Inventario.producto_id]
+    filtro_movimientos = [MovimientoStock.producto_id == Inventario.producto_id]
+    if fecha is not None:
+        filtro_snapshot.append(SnapshotStock.hasta <= fecha)
+        filtro_movimientos.append(MovimientoStock.created_at <= fecha)
+    if hasta_movimiento_id is not None:
+        filtro_snapshot.append(SnapshotStock.ultimo_movimiento_id <= hasta_movimiento_id)
+        filtro_movimientos.append(MovimientoStock.id <= hasta_movimiento_id)
+
+    ultimo_snapshot = (
+        select(func.max(SnapshotStock.ultimo_movimiento_id))
+        .where(*filtro_snapshot)
+        .correlate(Inventario)
+        .scalar_subquery()
+    )
+    cantidad_snapshot = (
+        select(SnapshotStock.cantidad)
+        .where(SnapshotStock.producto_id == Inventario.producto_id, SnapshotStock.ultimo_movimiento_id == ultimo_snapshot)
+        .correlate(Inventario)
+        .limit(1)
+        .scalar_subquery()
+    )
+    delta = case((MovimientoStock.tipo_movimiento == "SALIDA", -MovimientoStock.cantidad), else_=MovimientoStock.cantidad)
+    deltas = (
+        select(func.coalesce(func.sum(delta), 0))
+        .where(*filtro_movimientos, MovimientoStock.id > func.coalesce(ultimo_snapshot, 0))
+        .correlate(Inventario)
+        .scalar_subquery()
+    )
+    return func.coalesce(cantidad_snapshot, Inventario.cantidad) + deltas
+
 class InventarioService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -47,42 +93,282 @@ class InventarioService:
             await self.db.rollback()
             raise HTTPException(status_code=400, detail="Ya existe un inventario para este producto ID")
 
-    async def actualizar_stock(self, producto_id: int, update_data: InventarioUpdate) -> Inventario:
+    async def actualizar_stock(self, producto_id: int, update_data: InventarioUpdate) -> InventarioFila:
         logger.info(f"Actualizando stock. Producto: {producto_id}, Tipo: {update_data.tipo_movimiento}, Cantidad: {update_data.cantidad}")
-        # 1. Buscar inventario
-        inventario = await self._obtener_inventario(producto_id)
-        
-        # 2. Lógica de negocio entradas/salidas
-        if update_data.tipo_movimiento == "SALIDA":
-            if inventario.cantidad < update_data.cantidad:
-                raise HTTPException(status_code=400, detail="Stock insuficiente")
-            inventario.cantidad -= update_data.cantidad
-
-        elif update_data.tipo_movimiento == "ENTRADA":
-            inventario.cantidad += update_data.cantidad
-        else:
+        if update_data.tipo_movimiento not in ("SALIDA", "ENTRADA"):
             raise HTTPException(status_code=400, detail="Tipo de movimiento no válido")
 
-        # 3. Guardar
         try:
-            self.db.add(inventario)
+            if update_data.tipo_movimiento == "SALIDA":
+                # Solo las SALIDAs se serializan por producto: comprueban el stock antes de insertar
+                if producto_id not in await self._bloquear_productos({producto_id}):
+                    await self.db.rollback()
+                    raise HTTPException(status_code=404, detail="Inventario no encontrado para este producto")
+                if not await self._registrar_salida(producto_id, update_data):
+                    await self.db.rollback()
+                    raise HTTPException(status_code=400, detail="Stock insuficiente")
+            # Una ENTRADA es un INSERT sin bloqueo; el INSERT ... SELECT no inserta nada si el inventario no existe
+            elif not await self._registrar_entrada(producto_id, update_data):
+                await self.db.rollback()
+                raise HTTPException(status_code=404, detail="Inventario no encontrado para este producto")
             await self.db.commit()
-            await self.db.refresh(inventario)
-            logger.info(f"Stock actualizado correctamente. Nuevo total: {inventario.cantidad}")
-            return inventario
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error crítico DB al actualizar stock del producto {producto_id}: {str(e)}")
             await self.db.rollback()
             raise HTTPException(status_code=500, detail="Error interno al actualizar stock")
 
-    async def verificar_stock(self, producto_id: int) -> Inventario:
-        return await self._obtener_inventario(producto_id)
+        # Stock tras el commit (incluye los movimientos que otras peticiones confirmaron a la vez)
+        inventario = await self._obtener_inventario(producto_id)
+        logger.info(f"Stock actualizado correctamente. Nuevo total: {inventario.cantidad}")
+        notificador_stock.publicar(producto_id, inventario.cantidad)
+        return inventario
+
+    async def aplicar_lote(self, movimientos: list[MovimientoLote]) -> list[ResultadoMovimiento]:
+        """
+        Aplica varios movimientos en una sola transacción (group commit).
+        Cada movimiento se evalúa en orden y obtiene su propio resultado:
+        una SALIDA sin stock suficiente se rechaza sin afectar al resto del lote.
+        """
+        logger.info(f"Aplicando lote de {len(movimientos)} movimientos de stock")
+        productos_ids = {m.producto_id for m in movimientos}
+        # Solo se bloquean los productos con SALIDAs; para el resto basta comprobar que existen
+        con_salidas = {m.producto_id for m in movimientos if m.tipo_movimiento == "SALIDA"}
+        existentes = set(await self._bloquear_productos(con_salidas)) if con_salidas else set()
+        if productos_ids - con_salidas:
+            existentes |= set((await self.db.execute(
+                select(Inventario.producto_id).where(Inventario.producto_id.in_(productos_ids - con_salidas))
+            )).scalars().all())
+        # Movimientos reenviados (reintentos, reanudación tras una caída): ya aplicados, no se repiten
+        referencias = {m.referencia for m in movimientos if m.referencia}
+        aplicadas = set((await self.db.execute(
+            select(MovimientoStock.referencia).where(MovimientoStock.referencia.in_(referencias))
+        )).scalars().all()) if referencias else set()
+
+        resultados = []
+        try:
+            for movimiento in movimientos:
+                if movimiento.referencia and movimiento.referencia in aplicadas:
+                    resultados.append(ResultadoMovimiento(
+                        producto_id=movimiento.producto_id, status_code=200, detail="Movimiento ya aplicado",
+                    ))
+                elif movimiento.producto_id not in existentes:
+                    resultados.append(ResultadoMovimiento(
+                        producto_id=movimiento.producto_id, status_code=404,
+                        detail="Inventario no encontrado para este producto",
+                    ))
+                elif movimiento.tipo_movimiento == "SALIDA":
+                    registrado = await self._registrar_salida(movimiento.producto_id, movimiento)
+                    resultados.append(ResultadoMovimiento(
+                        producto_id=movimiento.producto_id,
+                        status_code=200 if registrado else 400,
+                        detail=None if registrado else "Stock insuficiente",
+                    ))
+                elif movimiento.tipo_movimiento == "ENTRADA":
+                    self.db.add(MovimientoStock(
+                        producto_id=movimiento.producto_id,
+                        tipo_movimiento="ENTRADA",
+                        cantidad=movimiento.cantidad,
+                        pedido_id=movimiento.pedido_id,
+                        referencia=movimiento.referencia,
+                    ))
+                    # El INSERT se envía ya para que las SALIDAs siguientes del lote lo vean
+                    await self.db.flush()
+                    resultados.append(ResultadoMovimiento(producto_id=movimiento.producto_id, status_code=200))
+                else:
+                    resultados.append(ResultadoMovimiento(
+                        producto_id=movimiento.producto_id, status_code=400, detail="Tipo de movimiento no válido",
+                    ))
+                # Una referencia repetida dentro del mismo lote tampoco se aplica dos veces
+                if movimiento.referencia and resultados[-1].status_code == 200:
+                    aplicadas.add(movimiento.referencia)
+
+            # Un único commit para todo el lote
+            await self.db.commit()
+        except Exception as e:
+            logger.error(f"Error crítico DB al aplicar lote de {len(movimientos)} movimientos: {str(e)}")
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Error interno al actualizar stock")
+
+        # Stock resultante de los productos afectados, en una sola consulta
+        afectados = {r.producto_id for r in resultados if r.status_code == 200}
+        if afectados:
+            stock = await self.stock_de_productos(afectados)
+            for resultado in resultados:
+                if resultado.status_code == 200:
+                    resultado.inventario = stock.get(resultado.producto_id)
+            for producto_id, inventario in stock.items():
+                notificador_stock.publicar(producto_id, inventario.cantidad)
+
+        logger.info(f"Lote aplicado. Aceptados: {sum(r.status_code == 200 for r in resultados)}/{len(resultados)}")
+        return resultados
+
+    async def _bloquear_productos(self, productos_ids: set[int]) -> dict[int, int]:
+        """
+        Serializa las SALIDAs de esos productos hasta el commit de la transacción (las ENTRADAs no bloquean).
+        Devuelve producto_id -> id del inventario de los que existen.
+        - PostgreSQL (y demás): SELECT ... FOR UPDATE de las filas de Inventario, en orden
+          de producto para que dos lotes no se bloqueen mutuamente. En READ COMMITTED las
+          lecturas del libro posteriores al bloqueo ven lo confirmado por quien lo tuvo antes.
+        - SQLite no tiene FOR UPDATE: una escritura inocua sobre las filas toma el bloqueo de
+          escritura de la base, que ya admite un único escritor a la vez.
+        """
+        if self.db.bind.dialect.name == "sqlite":
+            statement = (
+                update(Inventario)
+                .where(Inventario.producto_id.in_(productos_ids))
+                .values(producto_id=Inventario.producto_id)
+                .returning(Inventario.producto_id, Inventario.id)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            statement = (
+                select(Inventario.producto_id, Inventario.id)
+                .where(Inventario.producto_id.in_(productos_ids))
+                .order_by(Inventario.producto_id)
+                .with_for_update()
+            )
+        return dict((await self.db.execute(statement)).all())
+
+    async def _insertar_movimiento(self, producto_id: int, tipo: str, update_data: InventarioUpdate, *condiciones) -> bool:
+        """ INSERT ... SELECT desde la fila de Inventario: no inserta nada si no existe o no se cumplen las condiciones """
+        fila = (
+            select(
+                Inventario.producto_id,
+                literal(tipo),
+                literal(update_data.cantidad, Integer),
+                literal(update_data.pedido_id, Integer),
+                literal(getattr(update_data, "referencia", None), String),
+                literal(datetime.utcnow(), DateTime),
+            )
+            .where(Inventario.producto_id == producto_id, *condiciones)
+        )
+        statement = insert(MovimientoStock).from_select(
+            ["producto_id", "tipo_movimiento", "cantidad", "pedido_id", "referencia", "created_at"], fila
+        )
+        resultado = await self.db.execute(statement)
+        return resultado.rowcount > 0
+
+    async def _registrar_salida(self, producto_id: int, update_data: InventarioUpdate) -> bool:
+        """
+        Inserta la SALIDA solo si hay stock suficiente (INSERT ... SELECT ... WHERE stock >= cantidad).
+        Solo es segura frente a SALIDAs concurrentes con el producto ya bloqueado (_bloquear_productos):
+        en PostgreSQL con READ COMMITTED dos sentencias podrían leer el mismo libro e insertar ambas.
+        """
+        return await self._insertar_movimiento(producto_id, "SALIDA", update_data, expresion_stock() >= update_data.cantidad)
 
-    async def _obtener_inventario(self, producto_id: int) -> Inventario:
-        statement = select(Inventario).where(Inventario.producto_id == producto_id)
+    async def _registrar_entrada(self, producto_id: int, update_data: InventarioUpdate) -> bool:
+        """ Inserta la ENTRADA sin bloquear el producto: sumar stock nunca puede dejarlo en negativo """
+        return await self._insertar_movimiento(producto_id, "ENTRADA", update_data)
+
+    async def stock_de_productos(self, productos_ids: set[int]) -> dict[int, Inventario]:
+        """ Stock actual de varios productos en una sola consulta (los inexistentes se omiten) """
+        filas = (await self.db.execute(
+            select(Inventario.id, Inventario.producto_id, expresion_stock())
+            .where(Inventario.producto_id.in_(productos_ids))
+        )).all()
+        return {producto_id: Inventario(id=id_, producto_id=producto_id, cantidad=cantidad) for id_, producto_id, cantidad in filas}
+
+    async def verificar_stock(self, producto_id: int, fecha: Optional[datetime] = None) -> InventarioFila:
+        return await self._obtener_inventario(producto_id, fecha)
+
+    async def listar_inventario(self, campos: Optional[list[str]] = None) -> list[InventarioFila] | list[dict]:
+        if campos:
+            # El stock (subconsultas sobre el libro) solo se calcula si se pidió `cantidad`
+            columnas = {"id": Inventario.id, "producto_id": Inventario.producto_id, "cantidad": expresion_stock().label("cantidad")}
+            resultado = await self.db.execute(select(*(columnas[campo] for campo in campos)))
+            return [dict(fila._mapping) for fila in resultado.all()]
+        statement = select(expresion_stock(), Inventario.producto_id, Inventario.id)
+        return await leer_filas(self.db, statement, InventarioFila)
+
+    async def listar_movimientos(self, producto_id: int) -> list[MovimientoStock]:
+        await self._obtener_inventario(producto_id)
+        statement = (
+            select(MovimientoStock)
+            .where(MovimientoStock.producto_id == producto_id)
+            .order_by(MovimientoStock.id)
+        )
         resultado = await self.db.execute(statement)
-        inventario = resultado.scalars().first()
+        return resultado.scalars().all()
+
+    async def compactar_movimientos(self, gracia_segundos: int, min_movimientos: int) -> int:
+        """
+        Condensa los movimientos antiguos en un nuevo snapshot por producto.
+        Solo se pliegan movimientos hasta una marca confirmada (_marca_confirmada): las lecturas
+        posteriores empiezan en id > ultimo_movimiento_id y no deben saltarse ninguno.
+        `gracia_segundos` solo deja fuera los movimientos recientes (siguen visibles uno a uno).
+        """
+        marca = await self._marca_confirmada()
+        corte = datetime.utcnow() - timedelta(seconds=gracia_segundos)
+        ultimo_snapshot = (
+            select(func.max(SnapshotStock.ultimo_movimiento_id))
+            .where(SnapshotStock.producto_id == MovimientoStock.producto_id)
+            .scalar_subquery()
+        )
+        pendientes = (
+            select(MovimientoStock.producto_id, func.max(MovimientoStock.id))
+            .where(
+                MovimientoStock.id <= marca,
+                MovimientoStock.created_at <= corte,
+                MovimientoStock.id > func.coalesce(ultimo_snapshot, 0),
+            )
+            .group_by(MovimientoStock.producto_id)
+            .having(func.count() >= min_movimientos)
+        )
+        resultado = await self.db.execute(pendientes)
+        productos = resultado.all()
+
+        try:
+            for producto_id, ultimo_movimiento_id in productos:
+                cantidad = (await self.db.execute(
+                    select(expresion_stock(hasta_movimiento_id=ultimo_movimiento_id))
+                    .where(Inventario.producto_id == producto_id)
+                )).scalar_one_or_none()
+                if cantidad is None:
+                    continue
+                hasta = await self.db.scalar(
+                    select(MovimientoStock.created_at).where(MovimientoStock.id == ultimo_movimiento_id)
+                )
+                self.db.add(SnapshotStock(
+                    producto_id=producto_id,
+                    cantidad=cantidad,
+                    ultimo_movimiento_id=ultimo_movimiento_id,
+                    hasta=hasta,
+                ))
+            await self.db.commit()
+        except Exception as e:
+            logger.error(f"Error al compactar movimientos de stock: {str(e)}")
+            await self.db.rollback()
+            raise
+
+        if productos:
+            logger.info(f"Compactación de stock completada. Productos compactados: {len(productos)}")
+        return len(productos)
+
+    async def _marca_confirmada(self) -> int:
+        """
+        Id de movimiento hasta el que todo el libro está confirmado.
+        - PostgreSQL: un id menor puede confirmarse después de uno mayor (la secuencia se asigna
+          al insertar). LOCK TABLE ... IN SHARE MODE espera a que terminen las transacciones que
+          están escribiendo en el libro e impide nuevas hasta el commit; el máximo leído entonces
+          no deja huecos por confirmar. El bloqueo dura solo esta transacción corta.
+        - SQLite: un único escritor a la vez, los ids se confirman en orden.
+        """
+        if self.db.bind.dialect.name == "postgresql":
+            await self.db.execute(text(f"LOCK TABLE {MovimientoStock.__tablename__} IN SHARE MODE"))
+        marca = await self.db.scalar(select(func.coalesce(func.max(MovimientoStock.id), 0)))
+        await self.db.commit()
+        return marca
 
-        if not inventario:
+    async def _obtener_inventario(self, producto_id: int, fecha: Optional[datetime] = None) -> InventarioFila:
+        statement = (
+            select(expresion_stock(fecha), Inventario.producto_id, Inventario.id)
+            .where(Inventario.producto_id == producto_id)
+        )
+        filas = await leer_filas(self.db, statement, InventarioFila)
+
+        if not filas:
             raise HTTPException(status_code=404, detail="Inventario no encontrado para este producto")
-        return inventario
+        # Registro de solo lectura (no queda asociado a la sesión) con el stock calculado
+        return filas[0]
@@ -0,0 +1,286 @@
+import asyncio
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+import httpx
+from dotenv import load_dotenv
+from aiobreaker import CircuitBreakerError
+from aiobreaker.state import CircuitBreakerState
+
+from pedidos.breaker_compartido import crear_breaker
+from pedidos.logger_config import configurar_logger
+
+load_dotenv()
+
+logger = configurar_logger("PEDIDOS-BALANCEADOR")
+
+# --- CONFIGURACIÓN ---
+# Fallos de conexión consecutivos que expulsan una réplica, y durante cuánto tiempo
+EXPULSION_FALLOS = int(os.getenv("REPLICAS_EXPULSION_FALLOS", "3"))
+EXPULSION_SEGUNDOS = float(os.getenv("REPLICAS_EXPULSION_SEGUNDOS", "30"))
+# Cada cuánto se comprueba si cambió el archivo de réplicas
+INTERVALO_ARCHIVO_SEGUNDOS = 2.0
+# Peticiones cubiertas (hedging): fracción máxima de carga extra y muestras mínimas para estimar el p95
+COBERTURA_PRESUPUESTO = float(os.getenv("HEDGING_PRESUPUESTO", "0.05"))
+COBERTURA_MIN_MUESTRAS = 20
+
+
+class LatenciasRecientes:
+    """ Ventana circular de latencias; el p95 se recalcula cada pocas muestras """
+
+    def __init__(self, tamano: int = 200, recalcular_cada: int = 20):
+        self._muestras = [0.0] * tamano
+        self._total = 0
+        self._recalcular_cada = recalcular_cada
+        self._p95: float | None = None
+
+    def registrar(self, latencia: float):
+        self._muestras[self._total % len(self._muestras)] = latencia
+        self._total += 1
+        if self._total >= COBERTURA_MIN_MUESTRAS and self._total % self._recalcular_cada == 0:
+            ventana = sorted(self._muestras[:min(self._total, len(self._muestras))])
+            self._p95 = ventana[int(len(ventana) * 0.95) - 1]
+
+    @property
+    def p95(self) -> float | None:
+        return self._p95
+
+
+class PresupuestoCobertura:
+    """ Cada petición suma `fraccion` de token; cada cobertura gasta uno entero """
+
+    def __init__(self, fraccion: float, maximo: float = 10.0):
+        self.fraccion = fraccion
+        self.maximo = maximo
+        self.tokens = 0.0
+
+    def sumar(self):
+        self.tokens = min(self.maximo, self.tokens + self.fraccion)
+
+    def consumir(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Replica:
+    def __init__(self, url: str, breaker):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        self.en_curso = 0
+        self.fallos_consecutivos = 0
+        self.expulsada_hasta = 0.0
+
+    def circuito_abierto(self) -> bool:
+        if self.breaker.current_state != CircuitBreakerState.OPEN:
+            return False
+        # No se usa breaker.opens_at: suma el timeout a opened_at (UTC) pero compara con datetime.now() local
+        abierto_desde = self.breaker._state_storage.opened_at
+        return abierto_desde is not None and datetime.utcnow() < abierto_desde + self.breaker.timeout_duration
+
+    def expulsada(self) -> bool:
+        return time.monotonic() < self.expulsada_hasta
+
+    def registrar_exito(self):
+        self.fallos_consecutivos = 0
+
+    def registrar_fallo(self):
+        self.fallos_consecutivos += 1
+        if self.fallos_consecutivos >= EXPULSION_FALLOS and not self.expulsada():
+            logger.warning(f"Réplica {self.url} expulsada durante {EXPULSION_SEGUNDOS:.0f}s tras {self.fallos_consecutivos} fallos")
+            self.expulsada_hasta = time.monotonic() + EXPULSION_SEGUNDOS
+
+
+class BalanceadorReplicas:
+    """
+    Reparte las llamadas entre las réplicas de un servicio con
+    "power of two choices" (de dos réplicas al azar, la de menos peticiones en curso).
+    Cada réplica tiene su propio circuit breaker y se expulsa de forma pasiva
+    tras varios fallos de conexión consecutivos.
+
+    Las réplicas se leen de la variable `<SERVICIO>_REPLICAS` (URLs separadas por comas)
+    o del archivo `<SERVICIO>_REPLICAS_ARCHIVO` (una URL por línea), que se relee si cambia.
+
+    Con `<SERVICIO>_HEDGING=true`, las peticiones idempotentes que no responden
+    antes del p95 observado se repiten en otra réplica y gana la primera respuesta.
+
+    En el modo de proceso único (`usar_app_local`) las llamadas van directamente
+    a la app ASGI del servicio, sin pasar por la red.
+    """
+
+    def __init__(self, nombre: str, servicio: str, url_por_defecto: str, **config_breaker):
+        self.nombre = nombre
+        self.config_breaker = config_breaker
+        self.archivo = os.getenv(f"{servicio}_REPLICAS_ARCHIVO")
+        self._archivo_mtime = None
+        self._proxima_revision = 0.0
+        self.replicas: list[Replica] = []
+        self._cliente: httpx.AsyncClient | None = None
+        self._loop = None
+        self._transporte: httpx.AsyncBaseTransport | None = None
+
+        self.cobertura = os.getenv(f"{servicio}_HEDGING", "false").lower() == "true"
+        self.latencias = LatenciasRecientes()
+        self.presupuesto = PresupuestoCobertura(COBERTURA_PRESUPUESTO)
+        self.estadisticas = {"peticiones": 0, "coberturas": 0, "coberturas_ganadoras": 0}
+
+        urls = os.getenv(f"{servicio}_REPLICAS") or os.getenv(f"{servicio}_SERVICE_URL", url_por_defecto)
+        self._actualizar_replicas([url for url in urls.split(",") if url.strip()])
+        if self.archivo:
+            self._revisar_archivo()
+
+    @property
+    def urls(self) -> list[str]:
+        return [replica.url for replica in self.replicas]
+
+    def usar_app_local(self, app):
+        """
+        Sustituye las réplicas por la app ASGI en memoria (httpx.ASGITransport):
+        sin sockets ni serialización por loopback. El breaker, los reintentos y
+        las métricas siguen aplicándose igual que con réplicas remotas.
+        """
+        self.archivo = None
+        # Un fallo no controlado de la app se recibe como 500, igual que por la red
+        self._transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        self.replicas = []
+        self._actualizar_replicas([f"http://{self.nombre}.local"])
+        self._cliente = None
+        logger.info(f"{self.nombre}: llamadas en proceso (ASGI), sin red")
+
+    def _actualizar_replicas(self, urls: list[str]):
+        actuales = {replica.url: replica for replica in self.replicas}
+        nuevas = []
+        for url in dict.fromkeys(url.strip().rstrip("/") for url in urls):
+            replica = actuales.get(url)
+            if replica is None:
+                nombre_breaker = f"{self.nombre}-{re.sub(r'[^A-Za-z0-9_.-]', '_', url)}"
+                replica = Replica(url, crear_breaker(nombre_breaker, **self.config_breaker))
+            nuevas.append(replica)
+        if nuevas:
+            self.replicas = nuevas
+
+    def _revisar_archivo(self):
+        ahora = time.monotonic()
+        if not self.archivo or ahora < self._proxima_revision:
+            return
+        self._proxima_revision = ahora + INTERVALO_ARCHIVO_SEGUNDOS
+        try:
+            mtime = os.stat(self.archivo).st_mtime
+            if mtime == self._archivo_mtime:
+                return
+            with open(self.archivo, encoding="utf-8") as f:
+                urls = [linea.strip() for linea in f if linea.strip() and not linea.startswith("#")]
+        except OSError as e:
+            logger.error(f"No se pudo leer el archivo de réplicas {self.archivo}: {e}")
+            return
+        self._archivo_mtime = mtime
+        self._actualizar_replicas(urls)
+        logger.info(f"Réplicas de {self.nombre} actualizadas: {self.urls}")
+
+    def elegir(self, excluir: Replica | None = None) -> Replica:
+        self._revisar_archivo()
+        sanas = [r for r in self.replicas if r is not excluir and not r.circuito_abierto()]
+        candidatas = [r for r in sanas if not r.expulsada()] or sanas  # si todas están expulsadas, se usan igual
+        if not candidatas:
+            raise CircuitBreakerError(
+                f"Todas las réplicas de {self.nombre} tienen el circuito abierto",
+                datetime.utcnow() + timedelta(seconds=1),
+            )
+        if len(candidatas) == 1:
+            return candidatas[0]
+        a, b = random.sample(candidatas, 2)
+        return a if a.en_curso <= b.en_curso else b
+
+    def cliente(self) -> httpx.AsyncClient:
+        """ Cliente HTTP compartido (conexiones keep-alive) ligado al event loop actual """
+        loop = asyncio.get_running_loop()
+        if self._cliente is None or self._loop is not loop:
+            # Tráfico interno: sin compresión, no compensa comprimir y descomprimir en la misma red
+            self._cliente = httpx.AsyncClient(transport=self._transporte, headers={"Accept-Encoding": "identity"})
+            self._loop = loop
+        return self._cliente
+
+    async def enviar(
+        self, metodo: str, ruta: str, replica: Replica | None = None, idempotente: bool = False, **kwargs
+    ) -> httpx.Response:
+        """ Envía la petición a una réplica. Solo las idempotentes pueden cubrirse (hedging) """
+        if idempotente and replica is None:
+            self.estadisticas["peticiones"] += 1
+            self.presupuesto.sumar()
+            if self.cobertura:
+                return await self._enviar_con_cobertura(metodo, ruta, **kwargs)
+        return await self._enviar_replica(replica or self.elegir(), metodo, ruta, idempotente, **kwargs)
+
+    async def _enviar_replica(self, replica: Replica, metodo: str, ruta: str, idempotente: bool = False, **kwargs) -> httpx.Response:
+        replica.en_curso += 1
+        inicio = time.perf_counter()
+        try:
+            resp = await replica.breaker.call_async(self.cliente().request, metodo, f"{replica.url}{ruta}", **kwargs)
+        except (httpx.RequestError, CircuitBreakerError):
+            replica.registrar_fallo()
+            raise
+        finally:
+            replica.en_curso -= 1
+        replica.registrar_exito()
+        if idempotente:
+            self.latencias.registrar(time.perf_counter() - inicio)
+        return resp
+
+    async def _enviar_con_cobertura(self, metodo: str, ruta: str, **kwargs) -> httpx.Response:
+        primera = self.elegir()
+        original = asyncio.create_task(self._enviar_replica(primera, metodo, ruta, True, **kwargs))
+        tareas = [original]
+        try:
+            retardo = self.latencias.p95
+            if retardo is None:
+                return await original
+
+            hechas, _ = await asyncio.wait(tareas, timeout=retardo)
+            if hechas or not self.presupuesto.consumir():
+                return await original
+
+            # La original tarda más que el p95: se lanza una segunda en otra réplica (o conexión)
+            try:
+                segunda = self.elegir(excluir=primera)
+            except CircuitBreakerError:
+                segunda = primera
+            self.estadisticas["coberturas"] += 1
+            cobertura = asyncio.create_task(self._enviar_replica(segunda, metodo, ruta, True, **kwargs))
+            tareas.append(cobertura)
+
+            pendientes = set(tareas)
+            while True:
+                hechas, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                # Gana la primera respuesta correcta; si una falla, se espera a la otra
+                exitosas = [tarea for tarea in hechas if tarea.exception() is None]
+                if exitosas:
+                    ganadora = original if original in exitosas else cobertura
+                    if ganadora is cobertura:
+                        self.estadisticas["coberturas_ganadoras"] += 1
+                    return ganadora.result()
+                if not pendientes:
+                    return await original
+        finally:
+            for tarea in tareas:
+                if not tarea.done():
+                    tarea.cancel()
+
+    def metricas(self) -> dict:
+        peticiones = self.estadisticas["peticiones"]
+        return {
+            **self.estadisticas,
+            "tasa_cobertura": self.estadisticas["coberturas"] / peticiones if peticiones else 0.0,
+            "p95_segundos": self.latencias.p95,
+            "replicas": [
+                {"url": r.url, "en_curso": r.en_curso, "expulsada": r.expulsada(), "circuito_abierto": r.circuito_abierto()}
+                for r in self.replicas
+            ],
+        }
+
+    async def cerrar(self):
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
@@ -0,0 +1,149 @@
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import aiobreaker
+from aiobreaker.state import CircuitBreakerError, CircuitBreakerState
+from aiobreaker.storage.base import CircuitBreakerStorage
+
+try:
+    import fcntl
+except ImportError:  # Windows: no hay flock, se usa el breaker en memoria
+    fcntl = None
+
+from pedidos.logger_config import configurar_logger
+
+load_dotenv()
+
+logger = configurar_logger("PEDIDOS-BREAKER")
+
+# Directorio para el estado compartido entre workers (ej: /dev/shm/microservicios).
+# Si no se define, cada proceso usa su propio breaker en memoria.
+DIRECTORIO_COMPARTIDO = os.getenv("BREAKER_DIRECTORIO_COMPARTIDO")
+
+# Estado, contador de fallos, abierto desde, pid que hace la prueba half-open, prueba desde
+_FORMATO = struct.Struct("<qqdqd")
+_ESTADOS = list(CircuitBreakerState)
+
+
+class CircuitMmapStorage(CircuitBreakerStorage):
+    """
+    Storage de aiobreaker en un archivo mapeado en memoria, compartido por
+    todos los procesos del host. Las lecturas son un unpack sobre el mmap
+    (sin syscalls); las escrituras se serializan con flock.
+    """
+
+    def __init__(self, nombre: str, directorio: str, timeout_prueba: float):
+        super().__init__(nombre)
+        self.timeout_prueba = timeout_prueba
+        os.makedirs(directorio, exist_ok=True)
+        self._fd = os.open(os.path.join(directorio, f"{nombre}.breaker"), os.O_RDWR | os.O_CREAT, 0o600)
+        with self._bloqueo():
+            if os.fstat(self._fd).st_size < _FORMATO.size:
+                os.ftruncate(self._fd, _FORMATO.size)
+                os.pwrite(self._fd, _FORMATO.pack(_ESTADOS.index(CircuitBreakerState.CLOSED), 0, 0.0, 0, 0.0), 0)
+        self._mmap = mmap.mmap(self._fd, _FORMATO.size)
+
+    def _bloqueo(self):
+        fd = self._fd
+
+        class _Flock:
+            def __enter__(self):
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+            def __exit__(self, *exc):
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+        return _Flock()
+
+    def _leer(self) -> tuple:
+        return _FORMATO.unpack_from(self._mmap, 0)
+
+    def _escribir(self, **cambios):
+        with self._bloqueo():
+            estado, contador, abierto_desde, pid, prueba_desde = self._leer()
+            valores = dict(estado=estado, contador=contador, abierto_desde=abierto_desde, pid=pid, prueba_desde=prueba_desde)
+            valores.update(cambios)
+            _FORMATO.pack_into(self._mmap, 0, *valores.values())
+
+    @property
+    def state(self) -> CircuitBreakerState:
+        estado, _, _, pid, _ = self._leer()
+        estado = _ESTADOS[estado]
+        # La prueba half-open la hace un único proceso: el resto lo ve abierto
+        if estado is CircuitBreakerState.HALF_OPEN and pid != os.getpid():
+            return CircuitBreakerState.OPEN
+        return estado
+
+    @state.setter
+    def state(self, state: CircuitBreakerState):
+        self._escribir(estado=_ESTADOS.index(state))
+
+    def reclamar_prueba(self) -> bool:
+        """ Pasa a half-open solo si ningún otro proceso está haciendo ya la prueba """
+        ahora = datetime.now(timezone.utc).timestamp()
+        with self._bloqueo():
+            estado, contador, abierto_desde, pid, prueba_desde = self._leer()
+            en_curso = (
+                _ESTADOS[estado] is CircuitBreakerState.HALF_OPEN
+                and pid != os.getpid()
+                and ahora - prueba_desde < self.timeout_prueba
+            )
+            if en_curso:
+                return False
+            _FORMATO.pack_into(
+                self._mmap, 0,
+                _ESTADOS.index(CircuitBreakerState.HALF_OPEN), contador, abierto_desde, os.getpid(), ahora,
+            )
+            return True
+
+    def increment_counter(self):
+        with self._bloqueo():
+            estado, contador, abierto_desde, pid, prueba_desde = self._leer()
+            _FORMATO.pack_into(self._mmap, 0, estado, contador + 1, abierto_desde, pid, prueba_desde)
+
+    def reset_counter(self):
+        if self.counter:
+            self._escribir(contador=0)
+
+    @property
+    def counter(self) -> int:
+        return self._leer()[1]
+
+    @property
+    def opened_at(self):
+        abierto_desde = self._leer()[2]
+        if not abierto_desde:
+            return None
+        # aiobreaker trabaja con datetimes UTC sin zona horaria
+        return datetime.fromtimestamp(abierto_desde, timezone.utc).replace(tzinfo=None)
+
+    @opened_at.setter
+    def opened_at(self, date_time: datetime):
+        self._escribir(abierto_desde=date_time.replace(tzinfo=timezone.utc).timestamp())
+
+
+class CircuitBreakerCompartido(aiobreaker.CircuitBreaker):
+    """ CircuitBreaker cuya transición a half-open se decide a nivel de host """
+
+    def half_open(self):
+        if not self._state_storage.reclamar_prueba():
+            raise CircuitBreakerError("Prueba half-open en curso en otro proceso", self.opens_at)
+        super().half_open()
+
+
+def crear_breaker(nombre: str, **kwargs) -> aiobreaker.CircuitBreaker:
+    """
+    Crea el circuit breaker `nombre`. Con BREAKER_DIRECTORIO_COMPARTIDO definido,
+    su estado es común a todos los workers del host.
+    """
+    if not DIRECTORIO_COMPARTIDO:
+        return aiobreaker.CircuitBreaker(name=nombre, **kwargs)
+    if fcntl is None:
+        logger.warning("Estado compartido de breakers no soportado en esta plataforma. Se usa memoria local")
+        return aiobreaker.CircuitBreaker(name=nombre, **kwargs)
+
+    timeout_prueba = kwargs["timeout_duration"].total_seconds()
+    storage = CircuitMmapStorage(nombre, DIRECTORIO_COMPARTIDO, timeout_prueba)
+    return CircuitBreakerCompartido(name=nombre, state_storage=storage, **kwargs)
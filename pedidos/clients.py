@@ -1,29 +1,134 @@
+import asyncio
 import os
+import uuid
 import httpx
 import jwt
-import aiobreaker
 from datetime import timedelta
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
 from fastapi import HTTPException
 from pedidos.logger_config import configurar_logger
+from pedidos.balanceador import BalanceadorReplicas
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 logger = configurar_logger("PEDIDOS-CLIENTS")
 
 # --- CONFIGURACIÓN DE RESILIENCIA ---
-# Los breakers excluyen HTTPException porque son errores de negocio (404, 400, etc.)
-# Solo los errores de conexión (httpx.RequestError) deberían abrir el circuito
-breaker_inventario = aiobreaker.CircuitBreaker(
+# Cada réplica tiene su propio circuit breaker. Solo envuelven la llamada HTTP,
+# así que únicamente los errores de conexión (httpx.RequestError) abren el circuito;
+# los errores de negocio (404, 400, etc.) se resuelven después en cada cliente.
+# Con BREAKER_DIRECTORIO_COMPARTIDO, el estado de los breakers es común a todos los workers del host
+CONFIG_BREAKER = dict(
     fail_max=5, 
     timeout_duration=timedelta(seconds=60),
-    exclude=[HTTPException]
 )
-breaker_productos = aiobreaker.CircuitBreaker(
-    fail_max=5, 
-    timeout_duration=timedelta(seconds=60),
-    exclude=[HTTPException]
+
+# Réplicas: PRODUCTOS_REPLICAS / INVENTARIO_REPLICAS (lista separada por comas) o *_REPLICAS_ARCHIVO
+balanceador_productos = BalanceadorReplicas(
+    "pedidos-productos", "PRODUCTOS", "http://127.0.0.1:8001", **CONFIG_BREAKER
+)
+balanceador_inventario = BalanceadorReplicas(
+    "pedidos-inventario", "INVENTARIO", "http://127.0.0.1:8002", **CONFIG_BREAKER
 )
 
+# --- AGRUPACIÓN DE MOVIMIENTOS DE STOCK (opt-in) ---
+# Con INVENTARIO_LOTES=true, los movimientos concurrentes se acumulan durante
+# INVENTARIO_LOTE_VENTANA_MS (o hasta INVENTARIO_LOTE_MAX) y se envían en un único
+# POST /inventario/movimientos/lote, que Inventario confirma con un solo commit
+LOTES_ACTIVADO = os.getenv("INVENTARIO_LOTES", "false").lower() == "true"
+LOTE_VENTANA_MS = float(os.getenv("INVENTARIO_LOTE_VENTANA_MS", "5"))
+LOTE_MAX = int(os.getenv("INVENTARIO_LOTE_MAX", "100"))
+
+
+class AgrupadorMovimientos:
+    """
+    Micro-batching de movimientos de stock. Cada llamador espera su propio
+    resultado (o su propio error, p. ej. "Stock insuficiente"); la latencia
+    añadida está acotada por la ventana.
+    """
+
+    def __init__(self, balanceador: BalanceadorReplicas, activo: bool = LOTES_ACTIVADO,
+                 ventana_ms: float = LOTE_VENTANA_MS, maximo: int = LOTE_MAX):
+        self.balanceador = balanceador
+        self.activo = activo
+        self.ventana = ventana_ms / 1000
+        self.maximo = maximo
+        self._pendientes: list[tuple[dict, asyncio.Future]] = []
+        self._cabeceras: dict | None = None
+        self._temporizador: asyncio.TimerHandle | None = None
+        self._envios: set[asyncio.Task] = set()
+        self.estadisticas = {"lotes": 0, "movimientos": 0}
+
+    async def encolar(self, movimiento: dict, cabeceras: dict) -> dict:
+        """
+        Espera el resultado del movimiento dentro del próximo lote. Cada movimiento lleva una
+        `referencia` única (la del llamador, si la trae): si un lote ya confirmado se reenvía
+        tras un timeout, Inventario no lo aplica dos veces.
+        """
+        movimiento.setdefault("referencia", f"pedidos:{uuid.uuid4().hex}")
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendientes.append((movimiento, futuro))
+        self._cabeceras = cabeceras
+        if len(self._pendientes) >= self.maximo:
+            self._despachar()
+        elif self._temporizador is None:
+            self._temporizador = asyncio.get_running_loop().call_later(self.ventana, self._despachar)
+        return await futuro
+
+    def _despachar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        if not self._pendientes:
+            return
+        lote, self._pendientes = self._pendientes, []
+        tarea = asyncio.create_task(self._enviar(lote, self._cabeceras))
+        self._envios.add(tarea)
+        tarea.add_done_callback(self._envios.discard)
+
+    async def _enviar(self, lote: list[tuple[dict, asyncio.Future]], cabeceras: dict):
+        self.estadisticas["lotes"] += 1
+        self.estadisticas["movimientos"] += len(lote)
+        logger.info(f"Conectando con Inventario -> POST /inventario/movimientos/lote ({len(lote)} movimientos)")
+        try:
+            resp = await self.balanceador.enviar(
+                "POST", "/inventario/movimientos/lote", json=[movimiento for movimiento, _ in lote], headers=cabeceras
+            )
+            if resp.status_code != 200:
+                raise HTTPException(status_code=resp.status_code, detail=resp.json().get("detail"))
+            resultados = resp.json()
+            # Un resultado por movimiento y en el mismo orden; si no, ningún llamador puede fiarse del suyo
+            if not isinstance(resultados, list) or len(resultados) != len(lote):
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Inventario devolvió {len(resultados) if isinstance(resultados, list) else 0} resultados para un lote de {len(lote)}",
+                )
+        except Exception as e:
+            # Fallo del lote completo (conexión, circuito abierto, 5xx): cada llamador recibe el error
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+        for (_, futuro), resultado in zip(lote, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+    def metricas(self) -> dict:
+        lotes = self.estadisticas["lotes"]
+        return {
+            "activo": self.activo,
+            **self.estadisticas,
+            "movimientos_por_lote": self.estadisticas["movimientos"] / lotes if lotes else 0.0,
+        }
+
+    async def cerrar(self):
+        """ Envía lo pendiente y espera a los lotes en curso """
+        self._despachar()
+        if self._envios:
+            await asyncio.gather(*self._envios, return_exceptions=True)
+
+
+agrupador_movimientos = AgrupadorMovimientos(balanceador_inventario)
+
 RETRY_POLICY = retry(
     stop=stop_after_attempt(3), 
     wait=wait_fixed(2), 
@@ -39,18 +144,17 @@ class BaseClient:
 
 
 class ProductoClient(BaseClient):
-    BASE_URL = "http://127.0.0.1:8001/productos"
+    balanceador = balanceador_productos
 
-    @breaker_productos
     @RETRY_POLICY
     async def get_producto(self, producto_id: int):
         """
         Obtiene un producto del servicio de Productos.
         Los errores se propagan al servicio para manejo centralizado.
         """
-        logger.info(f"Conectando con Productos -> GET {self.BASE_URL}/{producto_id}")
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.BASE_URL}/{producto_id}", headers=self.headers)
+        logger.info(f"Conectando con Productos -> GET /productos/{producto_id}")
+        # GET idempotente: con PRODUCTOS_HEDGING=true se cubre si tarda más que el p95
+        resp = await self.balanceador.enviar("GET", f"/productos/{producto_id}", idempotente=True, headers=self.headers)
         
         if resp.status_code == 404:
             raise HTTPException(status_code=404, detail="Producto no encontrado")
@@ -58,26 +162,52 @@ class ProductoClient(BaseClient):
 
 
 class InventarioClient(BaseClient):
-    BASE_URL = "http://127.0.0.1:8002/inventario"
+    balanceador = balanceador_inventario
+    agrupador = agrupador_movimientos
 
-    @breaker_inventario
-    @RETRY_POLICY
-    async def actualizar_stock(self, producto_id: int, cantidad: int, tipo_movimiento: str):
+    async def actualizar_stock(self, producto_id: int, cantidad: int, tipo_movimiento: str, pedido_id: int = None):
         """
         Actualiza el stock en el servicio de Inventario.
         Los errores se propagan al servicio para manejo centralizado.
         """
-        payload = {"cantidad": cantidad, "tipo_movimiento": tipo_movimiento}
-        logger.info(f"Conectando con Inventario -> PATCH {self.BASE_URL}/{producto_id}")
+        payload = {"cantidad": cantidad, "tipo_movimiento": tipo_movimiento, "pedido_id": pedido_id}
+        if self.agrupador.activo:
+            # La referencia se fija fuera de los reintentos: todos reenvían el mismo movimiento
+            movimiento = {"producto_id": producto_id, **payload, "referencia": f"pedidos:{uuid.uuid4().hex}"}
+            return await self._encolar_movimiento(movimiento)
+        return await self._actualizar_stock(producto_id, payload)
+
+    @RETRY_POLICY
+    async def _encolar_movimiento(self, movimiento: dict) -> dict:
+        resultado = await self.agrupador.encolar(dict(movimiento), self.headers)
+        if resultado["status_code"] != 200:
+            raise HTTPException(status_code=resultado["status_code"], detail=resultado["detail"])
+        return resultado
+
+    @RETRY_POLICY
+    async def _actualizar_stock(self, producto_id: int, payload: dict):
+        logger.info(f"Conectando con Inventario -> PATCH /inventario/{producto_id}")
         
-        async with httpx.AsyncClient() as client:
-            resp = await client.patch(
-                f"{self.BASE_URL}/{producto_id}", 
-                json=payload, 
-                headers=self.headers
-            )
+        resp = await self.balanceador.enviar(
+            "PATCH",
+            f"/inventario/{producto_id}", 
+            json=payload, 
+            headers=self.headers
+        )
         
         if resp.status_code != 200:
             raise HTTPException(status_code=resp.status_code, detail=resp.json().get("detail"))
         return resp
 
+    @RETRY_POLICY
+    async def aplicar_lote(self, movimientos: list[dict]) -> list[dict]:
+        """
+        Envía varios movimientos en una sola petición (un commit en Inventario).
+        Devuelve un resultado por movimiento, en el mismo orden.
+        """
+        logger.info(f"Conectando con Inventario -> POST /inventario/movimientos/lote ({len(movimientos)} movimientos)")
+        resp = await self.balanceador.enviar("POST", "/inventario/movimientos/lote", json=movimientos, headers=self.headers)
+
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail=resp.json().get("detail"))
+        return resp.json()
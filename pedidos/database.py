@@ -1,4 +1,5 @@
-from sqlmodel import SQLModel
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 import os
@@ -13,11 +14,38 @@ DATABASE_URL = os.getenv("PEDIDOS_DB_URL", "sqlite+aiosqlite:///pedidos.db")
 # El Motor. Es el coordinador de la conexión
 engine = create_async_engine(DATABASE_URL, future=True)
 
-# Función para inicializar la DB (Crear tablas)
-async def init_db():
-    async with engine.begin() as conn:
-    # Esto busca todos los modelos que hereden de SQLModel y crea las tablas
-        await conn.run_sync(SQLModel.metadata.create_all)
+# Motor de lectura (opcional) para listados y consultas, con su propio pool:
+# - PostgreSQL: PEDIDOS_DB_READ_URL apunta a una réplica de lectura.
+# - SQLite: PEDIDOS_DB_SOLO_LECTURA=true abre el mismo archivo en modo ro y pasa la base a WAL,
+#   así las lecturas no esperan al bloqueo de escritura (ni lo retienen).
+# Sin configurar, las lecturas usan el mismo engine.
+READ_DATABASE_URL = os.getenv("PEDIDOS_DB_READ_URL")
+SOLO_LECTURA_SQLITE = os.getenv("PEDIDOS_DB_SOLO_LECTURA", "false").lower() == "true"
+READ_POOL = int(os.getenv("PEDIDOS_DB_READ_POOL", "10"))
+
+def _url_solo_lectura(url: str) -> str:
+    """ Misma base SQLite abierta como URI de solo lectura (file:...?mode=ro) """
+    url = make_url(url)
+    return url.set(database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"}).render_as_string()
+
+if READ_DATABASE_URL:
+    read_engine = create_async_engine(READ_DATABASE_URL, pool_size=READ_POOL)
+elif SOLO_LECTURA_SQLITE and engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _activar_wal(conexion_dbapi, registro):
+        cursor = conexion_dbapi.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+    read_engine = create_async_engine(_url_solo_lectura(DATABASE_URL), pool_size=READ_POOL)
+else:
+    read_engine = engine
+
+# Arranque: el esquema se gestiona con migraciones versionadas (pedidos/migraciones.py).
+# En producción se ejecutan fuera de banda (python -m pedidos.migraciones) y se desactiva esta opción
+MIGRAR_AL_INICIAR = os.getenv("PEDIDOS_MIGRAR_AL_INICIAR", "true").lower() == "true"
+# Conexiones del pool que se abren al arrancar, antes de declararse listo
+DB_PREWARM = int(os.getenv("PEDIDOS_DB_PREWARM", "5"))
 
 # Dependencia para obtener la sesión
 # Esto se usara en cada endpoint para interactuar con la DB
@@ -26,4 +54,13 @@ async def get_session():
         engine, class_=AsyncSession, expire_on_commit=False
     )
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+# Dependencia de solo lectura para los listados y consultas (GET). Con réplica, puede ir
+# ligeramente por detrás de las escrituras: no usar para leer lo que se acaba de escribir
+async def get_read_session():
+    async_session = sessionmaker(
+        read_engine, class_=AsyncSession, expire_on_commit=False
+    )
+    async with async_session() as session:
+        yield session
@@ -0,0 +1,61 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pedidos.database import engine
+from pedidos.services import PedidoService
+from pedidos.logger_config import configurar_logger
+
+load_dotenv()
+
+logger = configurar_logger("PEDIDOS-EXPIRADOR")
+
+# --- CONFIGURACIÓN DE EXPIRACIÓN ---
+# Minutos tras los que un pedido PENDIENTE se cancela y devuelve su stock (0 = desactivado)
+EXPIRACION_MINUTOS = int(os.getenv("PEDIDOS_EXPIRACION_MINUTOS", "0"))
+# Cada cuántos segundos se buscan pedidos vencidos
+INTERVALO_SEGUNDOS = int(os.getenv("PEDIDOS_EXPIRACION_INTERVALO", "60"))
+# Pedidos máximos por lote de cancelación
+TAMANO_LOTE = int(os.getenv("PEDIDOS_EXPIRACION_LOTE", "500"))
+
+
+async def expirar_una_vez() -> int:
+    """ Cancela lotes de pedidos vencidos hasta que no quede ninguno """
+    total = 0
+    while True:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            servicio = PedidoService(session)
+            resultado = await servicio.cancelar_en_lote(antiguedad_minutos=EXPIRACION_MINUTOS, limite=TAMANO_LOTE)
+        total += resultado.cancelados
+        if resultado.cancelados < TAMANO_LOTE:
+            return total
+
+
+async def reanudar_una_vez() -> int:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        return (await PedidoService(session).reanudar_cancelaciones()).cancelados
+
+
+async def ejecutar_expirador():
+    """
+    Tarea en segundo plano. Al arrancar completa los lotes de cancelación que
+    quedaron a medias; después, si la expiración está activada, cancela periódicamente los pedidos vencidos.
+    """
+    try:
+        await reanudar_una_vez()
+    except Exception as e:
+        logger.error(f"No se pudieron reanudar las cancelaciones pendientes: {getattr(e, 'detail', str(e))}")
+
+    if EXPIRACION_MINUTOS <= 0:
+        return
+    logger.info(f"Expiración de pedidos iniciada ({EXPIRACION_MINUTOS} min, cada {INTERVALO_SEGUNDOS}s)")
+    while True:
+        await asyncio.sleep(INTERVALO_SEGUNDOS)
+        try:
+            cancelados = await expirar_una_vez()
+            if cancelados:
+                logger.info(f"Pedidos vencidos cancelados: {cancelados}")
+        except Exception as e:
+            # Un fallo puntual (p. ej. Inventario caído) no debe detener el expirador; el lote se reanuda después
+            logger.error(f"Fallo en la expiración de pedidos: {getattr(e, 'detail', str(e))}")
@@ -0,0 +1,19 @@
+from dataclasses import fields
+from itertools import starmap
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def columnas(registro, modelo) -> list:
+    """ Columnas del modelo en el mismo orden que los campos del registro ligero """
+    return [getattr(modelo, campo.name) for campo in fields(registro)]
+
+
+async def leer_filas(session: AsyncSession, statement, registro) -> list:
+    """
+    Ruta de lectura sin ORM: ejecuta la consulta sobre la conexión de la sesión
+    (sin mapa de identidad, sin estado de instancia ni validación) y construye
+    un registro ligero (dataclass con __slots__) por fila.
+    """
+    conexion = await session.connection()
+    resultado = await conexion.execute(statement)
+    return list(starmap(registro, resultado))
@@ -1,26 +1,81 @@
+import asyncio
+from typing import Any, Optional
 from fastapi import FastAPI, Depends, HTTPException
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from starlette.responses import JSONResponse
 from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 
-from pedidos.database import init_db, get_session, engine
-from pedidos.models import Pedido, PedidoCreate, PedidoUpdate
+from pedidos.database import get_session, get_read_session, engine, read_engine, MIGRAR_AL_INICIAR, DB_PREWARM
+from pedidos.migraciones import aplicar_migraciones, migraciones_pendientes
+from pedidos.salud import VerificadorSalud
+from pedidos.perfilador import PerfiladorConsultas
+from pedidos.logger_config import configurar_logger
+from pedidos.models import Pedido, PedidoCreate, PedidoUpdate, PedidoFila, CancelacionMasiva, ResultadoCancelacion
 from pedidos.dependencies import validar_token
+from pedidos.limitador import LimitadorAdaptativo
+from pedidos.compresion import CompresionRespuestas
 from pedidos.services import PedidoService
+from pedidos.clients import balanceador_productos, balanceador_inventario, agrupador_movimientos
+from pedidos.responses import RespuestaRapida, campos_solicitados
+from pedidos.lectura import columnas, leer_filas
+from pedidos.expirador import ejecutar_expirador
+
+# Serializadores precompilados (se mantiene response_model para la documentación OpenAPI)
+PEDIDO_JSON = RespuestaRapida(Pedido)
+LISTA_PEDIDOS_JSON = RespuestaRapida(list[PedidoFila])  # registros ligeros, misma forma que Pedido
+LISTA_PARCIAL_JSON = RespuestaRapida(list[dict[str, Any]])
+RESULTADO_CANCELACION_JSON = RespuestaRapida(ResultadoCancelacion)
+
+logger = configurar_logger("PEDIDOS-MAIN")
+salud = VerificadorSalud(engine, dependencias={
+    **{f"productos {url}": f"{url}/healthz" for url in balanceador_productos.urls},
+    **{f"inventario {url}": f"{url}/healthz" for url in balanceador_inventario.urls},
+})
+perfilador = PerfiladorConsultas(engine, read_engine)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Inicializando base de datos de pedidos")
-    await init_db()
+    logger.info("Inicializando base de datos de pedidos")
+    if MIGRAR_AL_INICIAR:
+        await aplicar_migraciones()
+    pendientes = await migraciones_pendientes()
+    if pendientes:
+        logger.error(f"Esquema desactualizado, migraciones pendientes: {pendientes}. Ejecute: python -m pedidos.migraciones")
+    arranque_ms = await salud.precalentar(DB_PREWARM, esquema_al_dia=not pendientes)
+    logger.info(f"Servicio listo en {arranque_ms:.0f} ms")
+    expirador = asyncio.create_task(ejecutar_expirador())
     yield
-    print("Cerrando base de datos de pedidos")
+    expirador.cancel()
+    with suppress(asyncio.CancelledError):
+        await expirador
+    logger.info("Cerrando base de datos de pedidos")
+    await agrupador_movimientos.cerrar()
+    await balanceador_productos.cerrar()
+    await balanceador_inventario.cerrar()
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 app = FastAPI(
     title="Pedidos Service",
     dependencies=[Depends(validar_token)],
     lifespan=lifespan)
+salud.registrar(app)
+
+# Métricas internas: pasan por validar_token como el resto de endpoints
+@app.get("/metricas/clientes", include_in_schema=False)
+async def metricas_clientes():
+    """ Métricas de los clientes HTTP: tasa de hedging, coberturas ganadoras y estado de réplicas """
+    return JSONResponse({
+        "productos": balanceador_productos.metricas(),
+        "inventario": balanceador_inventario.metricas(),
+        "lotes_inventario": agrupador_movimientos.metricas(),
+    })
+app.add_middleware(LimitadorAdaptativo, router=app.router)
+app.add_middleware(CompresionRespuestas)
+perfilador.registrar(app)
 
 @app.post("/pedidos", response_model=Pedido)
 async def crear_pedido(
@@ -30,18 +85,36 @@ async def crear_pedido(
     """ Crea un nuevo pedido """
     # 1. Instanciamos el servicio pasándole la sesión de la DB
     servicio = PedidoService(session) 
-    return await servicio.crear_pedido(pedido_data)
+    return PEDIDO_JSON(await servicio.crear_pedido(pedido_data))
 
 @app.get("/pedidos", response_model=list[Pedido])
-async def listar_pedidos(session: AsyncSession = Depends(get_session)):
-    """ Lista todos los pedidos """
-    statement = select(Pedido)
-    resultado = await session.execute(statement)
-    
-    return resultado.scalars().all()
+async def listar_pedidos(fields: Optional[str] = None, session: AsyncSession = Depends(get_read_session)):
+    """ Lista todos los pedidos. Con ?fields=id,estado solo se leen y envían esas columnas """
+    campos = campos_solicitados(fields, Pedido)
+    if campos:
+        resultado = await session.execute(select(*(getattr(Pedido, campo) for campo in campos)))
+        return LISTA_PARCIAL_JSON([dict(fila._mapping) for fila in resultado.all()])
+
+    # Ruta de lectura sin ORM: tuplas de columnas a registros ligeros, sin mapa de identidad
+    statement = select(*columnas(PedidoFila, Pedido))
+    return LISTA_PEDIDOS_JSON(await leer_filas(session, statement, PedidoFila))
+
+@app.get("/pedidos/{pedido_id}", response_model=Pedido)
+async def leer_pedido(pedido_id: int, session: AsyncSession = Depends(get_read_session)):
+    """ Devuelve un pedido por su ID """
+    servicio = PedidoService(session)
+    return PEDIDO_JSON(await servicio.leer_pedido(pedido_id))
 
 @app.patch("/pedidos/{pedido_id}", response_model=Pedido)
 async def modificar_pedido(pedido_id: int, pedido_data: PedidoUpdate, session: AsyncSession = Depends(get_session)):
     """ Actualiza solamente el estado del pedido """
     servicio = PedidoService(session)
-    return await servicio.modificar_pedido(pedido_id, pedido_data)
+    return PEDIDO_JSON(await servicio.modificar_pedido(pedido_id, pedido_data))
+
+@app.post("/pedidos/cancel-bulk", response_model=ResultadoCancelacion)
+async def cancelar_pedidos(datos: CancelacionMasiva, session: AsyncSession = Depends(get_session)):
+    """ Cancela en bloque pedidos PENDIENTE (por IDs y/o antigüedad) y devuelve su stock en un solo lote """
+    servicio = PedidoService(session)
+    return RESULTADO_CANCELACION_JSON(
+        await servicio.cancelar_en_lote(datos.pedido_ids, datos.antiguedad_minutos, datos.limite)
+    )
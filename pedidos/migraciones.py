@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, inspect, select, text
+from sqlmodel import SQLModel
+
+from pedidos.database import engine
+from pedidos.models import Pedido
+from pedidos.logger_config import configurar_logger
+
+logger = configurar_logger("PEDIDOS-MIGRACIONES")
+
+# Tabla de control con las versiones de esquema aplicadas
+version_esquema = Table(
+    "version_esquema",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("descripcion", String, nullable=False),
+    Column("aplicada_en", DateTime, nullable=False),
+)
+
+
+# --- MIGRACIONES (versión, descripción, función síncrona que recibe la conexión) ---
+def _v1(conn):
+    SQLModel.metadata.create_all(conn, tables=[Pedido.__table__])
+
+
+def _v2(conn):
+    # En bases nuevas la v1 ya crea las columnas con el modelo actual
+    columnas = {columna["name"] for columna in inspect(conn).get_columns("pedido")}
+    # Tipos del modelo compilados para el dialecto (DATETIME en SQLite, TIMESTAMP en PostgreSQL)
+    tipos = {nombre: Pedido.__table__.c[nombre].type.compile(dialect=conn.dialect) for nombre in ("created_at", "lote_cancelacion")}
+    if "created_at" not in columnas:
+        conn.execute(text(f"ALTER TABLE pedido ADD COLUMN created_at {tipos['created_at']}"))
+        # Los pedidos existentes empiezan a contar su antigüedad desde la migración
+        conn.execute(text("UPDATE pedido SET created_at = :ahora WHERE created_at IS NULL"), {"ahora": datetime.utcnow()})
+    if "lote_cancelacion" not in columnas:
+        conn.execute(text(f"ALTER TABLE pedido ADD COLUMN lote_cancelacion {tipos['lote_cancelacion']}"))
+    indices = {indice["name"] for indice in inspect(conn).get_indexes("pedido")}
+    if "ix_pedido_estado_created_at" not in indices:
+        conn.execute(text("CREATE INDEX ix_pedido_estado_created_at ON pedido (estado, created_at)"))
+    if "ix_pedido_lote_cancelacion" not in indices:
+        conn.execute(text("CREATE INDEX ix_pedido_lote_cancelacion ON pedido (lote_cancelacion)"))
+
+
+MIGRACIONES = [
+    (1, "Esquema inicial: pedidos", _v1),
+    (2, "Antigüedad de pedidos y cancelación masiva", _v2),
+]
+
+
+def _version_actual(conn) -> int:
+    # Solo lectura: sin tabla de control, ninguna migración aplicada (no se ejecuta DDL al comprobar)
+    if not inspect(conn).has_table("version_esquema"):
+        return 0
+    return conn.execute(select(func.max(version_esquema.c.version))).scalar() or 0
+
+
+def _aplicar(conn) -> list[int]:
+    version_esquema.create(conn, checkfirst=True)
+    actual = _version_actual(conn)
+    aplicadas = []
+    for version, descripcion, migracion in MIGRACIONES:
+        if version <= actual:
+            continue
+        logger.info(f"Aplicando migración {version}: {descripcion}")
+        migracion(conn)
+        conn.execute(insert(version_esquema).values(
+            version=version, descripcion=descripcion, aplicada_en=datetime.utcnow()
+        ))
+        aplicadas.append(version)
+    return aplicadas
+
+
+async def aplicar_migraciones() -> list[int]:
+    async with engine.begin() as conn:
+        return await conn.run_sync(_aplicar)
+
+
+async def migraciones_pendientes() -> list[int]:
+    async with engine.connect() as conn:
+        actual = await conn.run_sync(_version_actual)
+    return [version for version, _, _ in MIGRACIONES if version > actual]
+
+
+if __name__ == "__main__":
+    # Ejecución fuera de banda: python -m pedidos.migraciones
+    aplicadas = asyncio.run(aplicar_migraciones())
+    logger.info(f"Migraciones aplicadas: {aplicadas or 'ninguna, el esquema está al día'}")
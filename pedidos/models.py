@@ -1,4 +1,7 @@
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from pydantic import BaseModel
 
@@ -9,9 +12,40 @@ class PedidoBase(SQLModel):
 
 class Pedido(PedidoBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Cancelación masiva en curso: identifica el lote mientras el pedido está en CANCELANDO
+    lote_cancelacion: Optional[str] = Field(default=None, index=True)
+
+    # Selección de pedidos vencidos (estado + antigüedad) sin recorrer la tabla
+    __table_args__ = (
+        Index("ix_pedido_estado_created_at", "estado", "created_at"),
+    )
+
+# Registro de solo lectura para los listados: mismos campos y orden que Pedido,
+# sin estado ORM ni validación (ver pedidos/lectura.py)
+@dataclass(slots=True)
+class PedidoFila:
+    producto_id: int
+    cantidad: int
+    estado: str
+    id: int
+    created_at: datetime
+    lote_cancelacion: Optional[str]
 
 class PedidoCreate(PedidoBase):
     pass
 
 class PedidoUpdate(BaseModel):
-    estado: str
\ No newline at end of file
+    estado: str
+
+# Cancelación masiva (POST /pedidos/cancel-bulk): por IDs, por antigüedad o ambos
+class CancelacionMasiva(BaseModel):
+    pedido_ids: Optional[list[int]] = None
+    antiguedad_minutos: Optional[int] = Field(default=None, gt=0)
+    limite: int = Field(default=1000, gt=0, le=10000)
+
+class ResultadoCancelacion(BaseModel):
+    cancelados: int
+    unidades_devueltas: dict[int, int]  # producto_id -> cantidad devuelta al inventario
+    lotes_reanudados: int = 0
+    pendientes: int = 0  # pedidos que siguen en CANCELANDO porque Inventario rechazó su devolución
@@ -0,0 +1,38 @@
+from typing import Any, Optional
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter
+
+
+class RespuestaRapida:
+    """
+    Serializador JSON precompilado para un tipo de respuesta.
+    Usa pydantic-core directamente (TypeAdapter.dump_json) sobre los objetos
+    ya cargados, sin la revalidación que FastAPI aplica con `response_model`.
+    """
+
+    def __init__(self, tipo: Any):
+        self.adapter = TypeAdapter(tipo)
+
+    def __call__(self, contenido: Any, status_code: int = 200) -> Response:
+        return Response(
+            content=self.adapter.dump_json(contenido),
+            status_code=status_code,
+            media_type="application/json",
+        )
+
+
+def campos_solicitados(fields: Optional[str], modelo) -> Optional[list[str]]:
+    """
+    Interpreta `?fields=a,b` (sparse fieldsets) contra los campos del modelo.
+    Devuelve None si no se pidió ninguno (respuesta completa).
+    """
+    if not fields:
+        return None
+    campos = list(dict.fromkeys(campo.strip() for campo in fields.split(",") if campo.strip()))
+    desconocidos = [campo for campo in campos if campo not in modelo.model_fields]
+    if not campos or desconocidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos no válidos: {', '.join(desconocidos) or fields}. Disponibles: {', '.join(modelo.model_fields)}",
+        )
+    return campos
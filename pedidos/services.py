@@ -1,9 +1,14 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
 from fastapi import HTTPException, status
+from sqlalchemy import delete, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
 import aiobreaker
 import httpx
 
-from pedidos.models import Pedido, PedidoCreate, PedidoUpdate
+from pedidos.models import Pedido, PedidoCreate, PedidoUpdate, ResultadoCancelacion
 from pedidos.logger_config import configurar_logger
 from pedidos.clients import ProductoClient, InventarioClient
 
@@ -25,11 +30,18 @@ class PedidoService:
             # 1. Validar que el producto exista en el catálogo
             await self.producto_client.get_producto(pedido_data.producto_id)
             
-            # 2. Restar Stock en Inventario
-            await self.inventario_client.actualizar_stock(pedido_data.producto_id, pedido_data.cantidad, "SALIDA")
-            
-            # 3. Guardar pedido en DB local con manejo de errores (Compensación)
-            resultado = await self._guardar_pedido_con_compensacion(pedido_data)
+            # 2. Registrar el pedido (RESERVANDO) para que el movimiento de stock lleve su ID
+            pedido = await self._reservar_pedido(pedido_data)
+
+            # 3. Restar Stock en Inventario; si no se puede, el pedido se descarta
+            try:
+                await self.inventario_client.actualizar_stock(pedido.producto_id, pedido.cantidad, "SALIDA", pedido.id)
+            except Exception:
+                await self._descartar_pedido(pedido)
+                raise
+
+            # 4. Confirmar el pedido (PENDIENTE) con manejo de errores (Compensación)
+            resultado = await self._confirmar_pedido_con_compensacion(pedido)
             logger.info(f"Pedido {resultado.id} creado exitosamente.")
             return resultado
         except aiobreaker.CircuitBreakerError as e:
@@ -52,25 +64,45 @@ class PedidoService:
             logger.error(f"Error inesperado al crear pedido: {str(e)}")
             raise HTTPException(status_code=500, detail="Error interno al procesar el pedido")
     
-    async def _guardar_pedido_con_compensacion(self, pedido_data: PedidoCreate):
+    async def _reservar_pedido(self, pedido_data: PedidoCreate) -> Pedido:
+        """ Guarda el pedido en RESERVANDO: aún sin stock, ni el expirador ni un PATCH lo tocan """
         nuevo_pedido = Pedido.model_validate(pedido_data)
-        nuevo_pedido.estado = "PENDIENTE"
+        nuevo_pedido.estado = "RESERVANDO"
         self.db.add(nuevo_pedido)
-
         try:
             await self.db.commit()
             await self.db.refresh(nuevo_pedido)
             return nuevo_pedido
-        except Exception:
+        except Exception as e:
+            logger.error(f"Error crítico DB al registrar el pedido: {str(e)}")
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Error interno al procesar el pedido")
+
+    async def _descartar_pedido(self, pedido: Pedido):
+        try:
+            await self.db.execute(
+                delete(Pedido)
+                .where(Pedido.id == pedido.id, Pedido.estado == "RESERVANDO")
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+        except Exception as e:
             await self.db.rollback()
+            logger.critical(f"CRITICO: No se pudo descartar el pedido {pedido.id} en RESERVANDO: {str(e)}")
+
+    async def _confirmar_pedido_con_compensacion(self, pedido: Pedido) -> Pedido:
+        try:
+            return await self._actualizar_estado_pedido(pedido, "PENDIENTE")
+        except HTTPException:
             # Si falla la BD, debemos devolver el stock que ya restamos
-            await self._compensar_stock(pedido_data.producto_id, pedido_data.cantidad)
+            await self._compensar_stock(pedido.producto_id, pedido.cantidad, pedido.id)
+            await self._descartar_pedido(pedido)
             raise HTTPException(status_code=500, detail="Error interno. Pedido revertido.")
 
-    async def _compensar_stock(self, producto_id: int, cantidad: int):
+    async def _compensar_stock(self, producto_id: int, cantidad: int, pedido_id: int):
         try:
             # Reutilizamos la lógica de actualizar stock pero ignoramos errores HTTP
-            await self.inventario_client.actualizar_stock(producto_id, cantidad, "ENTRADA")
+            await self.inventario_client.actualizar_stock(producto_id, cantidad, "ENTRADA", pedido_id)
         except HTTPException:            
             logger.critical(f"CRITICO: Falló compensación de stock para producto {producto_id} con cantidad: {cantidad}")
 
@@ -86,13 +118,12 @@ class PedidoService:
             # 2. Validar transición
             self._validar_transicion_estado(pedido_db, pedido_data.estado)
 
-            # 3. Gestionar SAGA (Devolución de stock si se cancela)
+            # 3. Actualizar estado solo si nadie lo cambió desde la lectura (409 si no).
+            # SAGA: la cancelación reclama el pedido (PENDIENTE -> CANCELANDO) antes de devolver el stock
             if self._es_cancelacion(pedido_db, pedido_data.estado):
-                # Reutilizamos _actualizar_stock para devolver ("ENTRADA")
-                await self.inventario_client.actualizar_stock(pedido_db.producto_id, pedido_db.cantidad, "ENTRADA")
-
-            # 4. Actualizar estado
-            pedido_actualizado = await self._actualizar_estado_pedido(pedido_db, pedido_data.estado)
+                pedido_actualizado = await self._cancelar_pedido(pedido_db)
+            else:
+                pedido_actualizado = await self._actualizar_estado_pedido(pedido_db, pedido_data.estado)
             logger.info(f"Pedido {pedido_id} actualizado correctamente a {pedido_data.estado}")
             return pedido_actualizado
 
@@ -114,6 +145,140 @@ class PedidoService:
             logger.error(f"Error inesperado al modificar pedido {pedido_id}: {str(e)}")
             raise HTTPException(status_code=500, detail="Error interno al modificar el pedido")
 
+    # LOGICA DE NEGOCIO - CANCELACIÓN MASIVA / EXPIRACIÓN
+    async def cancelar_en_lote(
+        self, pedido_ids: Optional[list[int]] = None, antiguedad_minutos: Optional[int] = None, limite: int = 1000
+    ) -> ResultadoCancelacion:
+        """
+        Cancela pedidos PENDIENTE en bloque:
+        1. Los reclama con un UPDATE (PENDIENTE -> CANCELANDO) marcado con un ID de lote.
+        2. Agrupa las unidades a devolver por producto.
+        3. Devuelve el stock a Inventario en un único lote idempotente.
+        4. Pasa todo el lote a CANCELADO con otro UPDATE.
+        Si el proceso se interrumpe, los lotes en CANCELANDO se reanudan en la siguiente ejecución.
+        """
+        if not pedido_ids and antiguedad_minutos is None:
+            raise HTTPException(status_code=400, detail="Indique pedido_ids, antiguedad_minutos o ambos")
+
+        resultado = await self.reanudar_cancelaciones()
+
+        # 1. Reclamar (set-based). El estado se vuelve a comprobar en el UPDATE por si otro proceso se adelantó
+        candidatos = select(Pedido.id).where(Pedido.estado == "PENDIENTE")
+        if pedido_ids:
+            candidatos = candidatos.where(Pedido.id.in_(pedido_ids))
+        if antiguedad_minutos is not None:
+            candidatos = candidatos.where(Pedido.created_at < datetime.utcnow() - timedelta(minutes=antiguedad_minutos))
+        candidatos = candidatos.order_by(Pedido.created_at).limit(limite)
+
+        lote = uuid.uuid4().hex
+        try:
+            reclamados = (await self.db.execute(
+                update(Pedido)
+                .where(Pedido.id.in_(candidatos.scalar_subquery()), Pedido.estado == "PENDIENTE")
+                .values(estado="CANCELANDO", lote_cancelacion=lote)
+                .execution_options(synchronize_session=False)
+            )).rowcount
+            await self.db.commit()
+        except Exception as e:
+            logger.error(f"Error crítico DB al reclamar pedidos para cancelar: {str(e)}")
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Error interno al cancelar pedidos")
+
+        if reclamados:
+            logger.info(f"Lote de cancelación {lote}: {reclamados} pedidos reclamados")
+            parcial = await self._completar_cancelacion(lote)
+            resultado.cancelados += parcial.cancelados
+            resultado.pendientes += parcial.pendientes
+            for producto_id, cantidad in parcial.unidades_devueltas.items():
+                resultado.unidades_devueltas[producto_id] = resultado.unidades_devueltas.get(producto_id, 0) + cantidad
+        return resultado
+
+    async def reanudar_cancelaciones(self) -> ResultadoCancelacion:
+        """ Completa los lotes que quedaron en CANCELANDO (p. ej. tras una caída del proceso) """
+        lotes = (await self.db.execute(
+            select(Pedido.lote_cancelacion).where(Pedido.estado == "CANCELANDO").distinct()
+        )).scalars().all()
+        resultado = ResultadoCancelacion(cancelados=0, unidades_devueltas={})
+        for lote in lotes:
+            logger.warning(f"Reanudando lote de cancelación interrumpido {lote}")
+            parcial = await self._completar_cancelacion(lote)
+            resultado.cancelados += parcial.cancelados
+            resultado.pendientes += parcial.pendientes
+            resultado.lotes_reanudados += 1
+            for producto_id, cantidad in parcial.unidades_devueltas.items():
+                resultado.unidades_devueltas[producto_id] = resultado.unidades_devueltas.get(producto_id, 0) + cantidad
+        return resultado
+
+    async def _completar_cancelacion(self, lote: str) -> ResultadoCancelacion:
+        # 2. Unidades a devolver por producto
+        devoluciones = dict((await self.db.execute(
+            select(Pedido.producto_id, func.sum(Pedido.cantidad))
+            .where(Pedido.lote_cancelacion == lote, Pedido.estado == "CANCELANDO")
+            .group_by(Pedido.producto_id)
+        )).all())
+
+        # 3. Un único lote a Inventario. La referencia hace que reenviarlo (reanudación) no duplique stock.
+        # Si Inventario no responde, los pedidos siguen en CANCELANDO y se reanudan más tarde
+        if devoluciones:
+            try:
+                resultados = await self.inventario_client.aplicar_lote([
+                    {
+                        "producto_id": producto_id,
+                        "cantidad": cantidad,
+                        "tipo_movimiento": "ENTRADA",
+                        "referencia": f"cancelacion:{lote}:{producto_id}",
+                    }
+                    for producto_id, cantidad in devoluciones.items()
+                ])
+            except aiobreaker.CircuitBreakerError as e:
+                logger.warning(f"Circuit Breaker abierto al devolver stock del lote {lote}: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="El servicio de Inventario no responde temporalmente (Circuit Open). La cancelación se completará más tarde.",
+                )
+            except httpx.RequestError as e:
+                logger.error(f"Error de conexión con Inventario al devolver stock del lote {lote}: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Error de conexión con el servicio de Inventario. La cancelación se completará más tarde.",
+                )
+            for resultado in resultados:
+                if resultado["status_code"] != 200:
+                    logger.critical(
+                        f"CRITICO: No se pudo devolver stock del producto {resultado['producto_id']} "
+                        f"(lote {lote}): {resultado['detail']}. Sus pedidos siguen en CANCELANDO"
+                    )
+            devueltos = {resultado["producto_id"] for resultado in resultados if resultado["status_code"] == 200}
+        else:
+            devueltos = set()
+
+        # 4. Cerrar el lote (set-based), solo los pedidos cuyo stock volvió a Inventario.
+        # Los demás siguen en CANCELANDO y se reintentan al reanudar el lote
+        try:
+            cancelados = (await self.db.execute(
+                update(Pedido)
+                .where(Pedido.lote_cancelacion == lote, Pedido.estado == "CANCELANDO", Pedido.producto_id.in_(devueltos))
+                .values(estado="CANCELADO")
+                .execution_options(synchronize_session=False)
+            )).rowcount
+            pendientes = (await self.db.execute(
+                select(func.count()).where(Pedido.lote_cancelacion == lote, Pedido.estado == "CANCELANDO")
+            )).scalar_one()
+            await self.db.commit()
+        except Exception as e:
+            logger.error(f"Error crítico DB al cerrar el lote de cancelación {lote}: {str(e)}")
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Error interno al cancelar pedidos")
+
+        devoluciones = {producto_id: cantidad for producto_id, cantidad in devoluciones.items() if producto_id in devueltos}
+        logger.info(
+            f"Lote de cancelación {lote}: {cancelados} pedidos cancelados, {len(devoluciones)} productos, {pendientes} pendientes"
+        )
+        return ResultadoCancelacion(cancelados=cancelados, unidades_devueltas=devoluciones, pendientes=pendientes)
+
+    async def leer_pedido(self, pedido_id: int) -> Pedido:
+        return await self._obtener_pedido(pedido_id)
+
     async def _obtener_pedido(self, pedido_id: int) -> Pedido:
         pedido = await self.db.get(Pedido, pedido_id)
         if not pedido:
@@ -124,6 +289,12 @@ class PedidoService:
         if nuevo_estado not in ["PENDIENTE", "COMPLETADO", "CANCELADO"]:
             raise HTTPException(status_code=400, detail="Estado inválido. Estados permitidos: PENDIENTE, COMPLETADO, CANCELADO")
 
+        if pedido.estado == "RESERVANDO":
+            raise HTTPException(status_code=409, detail="El pedido se está creando")
+
+        if pedido.estado == "CANCELANDO":
+            raise HTTPException(status_code=409, detail="El pedido se está cancelando en un proceso masivo")
+
         if nuevo_estado == "COMPLETADO" and pedido.estado == "CANCELADO":
             raise HTTPException(status_code=400, detail="No se puede completar un pedido que ya está cancelado")
 
@@ -133,14 +304,47 @@ class PedidoService:
     def _es_cancelacion(self, pedido: Pedido, nuevo_estado: str) -> bool:
         return nuevo_estado == "CANCELADO" and pedido.estado != "CANCELADO"
 
-    async def _actualizar_estado_pedido(self, pedido: Pedido, nuevo_estado: str):
-        pedido.estado = nuevo_estado
-        self.db.add(pedido)
+    async def _cambiar_estado_si_no_cambio(self, pedido: Pedido, **valores):
+        """
+        UPDATE condicionado al estado leído: si otra petición (o la cancelación masiva) cambió
+        el pedido entre la lectura y la escritura, no se aplica y se responde 409.
+        """
+        estado_leido = pedido.estado
         try:
+            actualizados = (await self.db.execute(
+                update(Pedido)
+                .where(Pedido.id == pedido.id, Pedido.estado == estado_leido)
+                .values(**valores)
+                .execution_options(synchronize_session=False)
+            )).rowcount
             await self.db.commit()
-            await self.db.refresh(pedido)
-            return pedido
         except Exception as e:
-            logger.error(f"Error crítico DB al actualizar estado del pedido {pedido.id} a '{nuevo_estado}': {str(e)}")
+            logger.error(f"Error crítico DB al actualizar estado del pedido {pedido.id} a '{valores['estado']}': {str(e)}")
             await self.db.rollback()
-            raise HTTPException(status_code=500, detail="Error interno al actualizar estado del pedido")
\ No newline at end of file
+            raise HTTPException(status_code=500, detail="Error interno al actualizar estado del pedido")
+        if not actualizados:
+            raise HTTPException(
+                status_code=409, detail=f"El pedido dejó de estar en {estado_leido} mientras se modificaba. Vuelva a consultarlo."
+            )
+
+    async def _actualizar_estado_pedido(self, pedido: Pedido, nuevo_estado: str):
+        await self._cambiar_estado_si_no_cambio(pedido, estado=nuevo_estado)
+        await self.db.refresh(pedido)
+        return pedido
+
+    async def _cancelar_pedido(self, pedido: Pedido):
+        """
+        Cancela un pedido como un lote de uno: lo reclama (CANCELANDO) y completa la cancelación.
+        La devolución lleva la referencia del lote, así que si el expirador reanuda el lote a la vez
+        el stock no se devuelve dos veces; si Inventario no responde o rechaza la devolución,
+        el pedido sigue en CANCELANDO y se completa más tarde.
+        """
+        lote = uuid.uuid4().hex
+        await self._cambiar_estado_si_no_cambio(pedido, estado="CANCELANDO", lote_cancelacion=lote)
+        if (await self._completar_cancelacion(lote)).pendientes:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Inventario rechazó la devolución del stock. El pedido queda en CANCELANDO y se reintentará.",
+            )
+        await self.db.refresh(pedido)
+        return pedido
\ No newline at end of file
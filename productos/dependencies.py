@@ -1,6 +1,7 @@
+import hmac
 import os
 from dotenv import load_dotenv
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 
@@ -12,14 +13,21 @@ SECRET_KEY = os.getenv(
     "SECRET_KEY", "secreto_super_seguro"
 )  # Fallback inseguro si no hay env
 ALGORITHM = "HS256"
+# Secreto compartido con el gateway: si la petición lo trae, el token ya se validó en el borde
+GATEWAY_SECRET = os.getenv("GATEWAY_SECRET")
 
 
-async def validar_token(credenciales: HTTPAuthorizationCredentials = Depends(security)):
+async def validar_token(request: Request, credenciales: HTTPAuthorizationCredentials = Depends(security)):
     """
     Dependencia de seguridad.
-    Decodifica y valida el token JWT.
+    Decodifica y valida el token JWT, salvo que la petición venga del gateway.
     """
     token_recibido = credenciales.credentials
+    secreto_gateway = request.headers.get("x-gateway-secret")
+    # En bytes: compare_digest rechaza (TypeError) un str con caracteres no ASCII
+    if GATEWAY_SECRET and secreto_gateway and hmac.compare_digest(secreto_gateway.encode("latin-1"), GATEWAY_SECRET.encode()):
+        return token_recibido
+
     exception_auth = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciales inválidas. Token no válido.",
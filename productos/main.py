@@ -1,21 +1,46 @@
+from typing import Any, Optional
 from fastapi import FastAPI, Depends, HTTPException
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Importaciones de dependencias y modelos 
-from productos.database import init_db, get_session, engine
-from productos.models import Producto, ProductoCreate, ProductoUpdate
+from productos.database import get_session, get_read_session, engine, read_engine, MIGRAR_AL_INICIAR, DB_PREWARM
+from productos.migraciones import aplicar_migraciones, migraciones_pendientes
+from productos.salud import VerificadorSalud
+from productos.perfilador import PerfiladorConsultas
+from productos.logger_config import configurar_logger
+from productos.models import Producto, ProductoCreate, ProductoUpdate, ProductoFila
 from productos.dependencies import validar_token
+from productos.limitador import LimitadorAdaptativo
+from productos.compresion import CompresionRespuestas
 from productos.services import ProductoService
+from productos.responses import RespuestaRapida, campos_solicitados
+
+# Serializadores precompilados (se mantiene response_model para la documentación OpenAPI)
+PRODUCTO_JSON = RespuestaRapida(Producto)
+LISTA_PRODUCTOS_JSON = RespuestaRapida(list[ProductoFila])  # registros ligeros, misma forma que Producto
+LISTA_PARCIAL_JSON = RespuestaRapida(list[dict[str, Any]])
+
+logger = configurar_logger("PRODUCTOS-MAIN")
+salud = VerificadorSalud(engine)
+perfilador = PerfiladorConsultas(engine, read_engine)
 
 #Lifespan (Ciclo de vida): Código que corre antes de que la app empiece a recibir peticiones
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Inicializando la base de datos")
-    await init_db() # Se crean las tablas
+    logger.info("Inicializando la base de datos")
+    if MIGRAR_AL_INICIAR:
+        await aplicar_migraciones()
+    pendientes = await migraciones_pendientes()
+    if pendientes:
+        logger.error(f"Esquema desactualizado, migraciones pendientes: {pendientes}. Ejecute: python -m productos.migraciones")
+    arranque_ms = await salud.precalentar(DB_PREWARM, esquema_al_dia=not pendientes)
+    logger.info(f"Servicio listo en {arranque_ms:.0f} ms")
     yield
-    print("Cerrando la base de datos")
+    logger.info("Cerrando la base de datos")
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
     
 # Instanciamos la app
 app = FastAPI(
@@ -23,6 +48,10 @@ app = FastAPI(
     dependencies=[Depends(validar_token)],
     lifespan=lifespan
 )
+salud.registrar(app)
+app.add_middleware(LimitadorAdaptativo, router=app.router)
+app.add_middleware(CompresionRespuestas)
+perfilador.registrar(app)
 
 # --- ENDPOINTS ---
 
@@ -30,20 +59,23 @@ app = FastAPI(
 @app.post("/productos", response_model=Producto)
 async def crear_producto(producto_data: ProductoCreate, session: AsyncSession = Depends(get_session)):
     service = ProductoService(session)
-    return await service.crear_producto(producto_data)
+    return PRODUCTO_JSON(await service.crear_producto(producto_data))
 
-# 2. Listar productos
+# 2. Listar productos. Con ?fields=id,nombre,precio solo se leen y envían esas columnas
 @app.get("/productos", response_model=list[Producto])
-async def listar_productos(session: AsyncSession = Depends(get_session)):
+async def listar_productos(fields: Optional[str] = None, session: AsyncSession = Depends(get_read_session)):
+    campos = campos_solicitados(fields, Producto)
     service = ProductoService(session)
-    return await service.listar_productos()
+    if campos:
+        return LISTA_PARCIAL_JSON(await service.listar_productos(campos))
+    return LISTA_PRODUCTOS_JSON(await service.listar_productos())
 
 @app.get("/productos/{producto_id}", response_model=Producto)
-async def leer_producto(producto_id: int, session: AsyncSession = Depends(get_session)):
+async def leer_producto(producto_id: int, session: AsyncSession = Depends(get_read_session)):
     service = ProductoService(session)
-    return await service.leer_producto(producto_id)
+    return PRODUCTO_JSON(await service.leer_producto(producto_id))
 
 @app.patch("/productos/{producto_id}", response_model=Producto)
 async def actualizar_producto(producto_id: int, producto_data: ProductoUpdate, session: AsyncSession = Depends(get_session)):
     service = ProductoService(session)
-    return await service.actualizar_producto(producto_id, producto_data)
+    return PRODUCTO_JSON(await service.actualizar_producto(producto_id, producto_data))
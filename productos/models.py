@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Optional
 from sqlmodel import Field, SQLModel
 
@@ -10,6 +11,15 @@ class ProductoBase(SQLModel):
 class Producto(ProductoBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
 
+# Registro de solo lectura para los listados: mismos campos y orden que Producto,
+# sin estado ORM ni validación (ver productos/lectura.py)
+@dataclass(slots=True)
+class ProductoFila:
+    nombre: str
+    descripcion: str
+    precio: float
+    id: int
+
 class ProductoCreate(ProductoBase):
     pass
 
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from productos.logger_config import configurar_logger
+
+load_dotenv()
+
+logger = configurar_logger("PRODUCTOS-PERFILADOR")
+
+# Instrumentación opcional (desactivada por defecto): cuenta y cronometra las consultas de cada petición
+ACTIVADO = os.getenv("PERFILADOR_ACTIVADO", "false").lower() == "true"
+# Las consultas más lentas que el umbral se guardan (sentencia, forma de los parámetros y plan) en el archivo
+UMBRAL_MS = float(os.getenv("PERFILADOR_UMBRAL_MS", "100"))
+ARCHIVO = os.getenv("PERFILADOR_ARCHIVO", "logs/consultas_lentas_productos.jsonl")
+
+# Solo se pide el plan de las sentencias DML/consultas (EXPLAIN no admite DDL ni PRAGMA)
+_EXPLICABLES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+# Consultas lentas a la espera de plan y escritura; con la cola llena (ráfaga de lentas) se descartan
+MAX_PENDIENTES = 100
+# Las peticiones que no coinciden con ninguna ruta (404, escaneos) se acumulan en un único endpoint
+RUTA_DESCONOCIDA = "<desconocida>"
+
+# Medición de la petición en curso (None fuera de una petición: tareas de fondo, arranque)
+_medicion_actual: ContextVar["Medicion | None"] = ContextVar("medicion_consultas", default=None)
+
+
+class Medicion:
+    __slots__ = ("consultas", "ms")
+
+    def __init__(self):
+        self.consultas = 0
+        self.ms = 0.0
+
+
+def _forma_parametros(parametros, executemany: bool):
+    """ Tipos de los parámetros, nunca sus valores (pueden contener contraseñas o datos personales) """
+    if executemany:
+        filas = list(parametros)
+        return {"filas": len(filas), "fila": _forma_parametros(filas[0], False) if filas else None}
+    if isinstance(parametros, dict):
+        return {clave: type(valor).__name__ for clave, valor in parametros.items()}
+    return [type(valor).__name__ for valor in parametros or ()]
+
+
+class PerfiladorConsultas:
+    """
+    Cuenta y cronometra las consultas de cada petición con los eventos del engine
+    (before/after_cursor_execute) y acumula las cifras por endpoint en /metricas/consultas.
+    Las consultas que superan el umbral se escriben, con su plan (EXPLAIN), en un archivo JSON Lines;
+    plan y escritura van en una tarea de fondo, no dentro de la consulta lenta.
+    """
+
+    def __init__(self, *engines, umbral_ms: float = UMBRAL_MS, archivo: str = ARCHIVO):
+        # Engine de escritura y, si existe, el de lectura (sin duplicados cuando son el mismo)
+        self.engines = list(dict.fromkeys(engines))
+        self.umbral_ms = umbral_ms
+        self.archivo = archivo
+        self.lentas = 0
+        self.descartadas = 0
+        self._endpoints: dict[str, dict] = {}
+        # Los eventos reciben el engine síncrono; el EXPLAIN diferido usa su AsyncEngine
+        self._engines_async = {engine.sync_engine: engine for engine in self.engines}
+        self._pendientes: deque[tuple] = deque()
+        self._procesador: asyncio.Task | None = None
+
+    # --- EVENTOS DEL ENGINE ---
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        context._perfilador_inicio = time.perf_counter()
+
+    def _despues(self, conn, cursor, statement, parameters, context, executemany):
+        if context.execution_options.get("perfilador_plan"):
+            return  # EXPLAIN del propio perfilador
+        ms = (time.perf_counter() - context._perfilador_inicio) * 1000
+        medicion = _medicion_actual.get()
+        if medicion is not None:
+            medicion.consultas += 1
+            medicion.ms += ms
+        if ms >= self.umbral_ms:
+            self._registrar_lenta(conn, statement, parameters, executemany, ms)
+
+    def _registrar_lenta(self, conn, statement, parameters, executemany, ms):
+        """
+        Solo encola la consulta: el EXPLAIN (en otra conexión) y la escritura en el archivo
+        se hacen en una tarea aparte, fuera de la petición que ya va lenta.
+        """
+        self.lentas += 1
+        logger.warning(f"Consulta lenta ({ms:.0f} ms): {statement[:200]}")
+        if len(self._pendientes) >= MAX_PENDIENTES:
+            self.descartadas += 1
+            return
+        registro = {
+            "fecha": datetime.utcnow().isoformat(),
+            "ms": round(ms, 2),
+            "sentencia": statement,
+            "parametros": _forma_parametros(parameters, executemany),
+            "plan": None,
+        }
+        explicable = not executemany and statement.lstrip().upper().startswith(_EXPLICABLES)
+        self._pendientes.append((self._engines_async.get(conn.engine) if explicable else None, registro, parameters))
+        if self._procesador is None or self._procesador.done():
+            try:
+                bucle = asyncio.get_running_loop()
+            except RuntimeError:
+                return  # uso síncrono, sin bucle: se procesa con la siguiente consulta lenta
+            # Contexto vacío: las consultas del EXPLAIN no cuentan en la medición de ninguna petición
+            self._procesador = bucle.create_task(self._procesar_lentas(), context=Context())
+
+    async def _procesar_lentas(self):
+        while self._pendientes:
+            engine, registro, parameters = self._pendientes.popleft()
+            if engine is not None:
+                registro["plan"] = await self._plan(engine, registro["sentencia"], parameters)
+            await asyncio.to_thread(self._escribir, registro)
+
+    async def _plan(self, engine, statement, parameters) -> list[str]:
+        prefijo = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(perfilador_plan=True)
+                filas = (await conn.exec_driver_sql(prefijo + statement, parameters or ())).all()
+            return [" | ".join(str(columna) for columna in fila) for fila in filas]
+        except Exception as e:
+            return [f"EXPLAIN no disponible: {e}"]
+
+    def _escribir(self, registro: dict):
+        try:
+            with open(self.archivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"No se pudo escribir la consulta lenta en {self.archivo}: {e}")
+
+    # --- MEDICIÓN POR PETICIÓN ---
+    def acumular(self, endpoint: str, medicion: Medicion):
+        datos = self._endpoints.get(endpoint)
+        if datos is None:
+            datos = self._endpoints[endpoint] = {"peticiones": 0, "consultas": 0, "consultas_max": 0, "ms": 0.0, "ms_max": 0.0}
+        datos["peticiones"] += 1
+        datos["consultas"] += medicion.consultas
+        datos["consultas_max"] = max(datos["consultas_max"], medicion.consultas)
+        datos["ms"] += medicion.ms
+        datos["ms_max"] = max(datos["ms_max"], medicion.ms)
+
+    def metricas(self) -> dict:
+        return {
+            "umbral_ms": self.umbral_ms,
+            "consultas_lentas": self.lentas,
+            "consultas_lentas_descartadas": self.descartadas,
+            "endpoints": {
+                endpoint: {
+                    "peticiones": datos["peticiones"],
+                    "consultas_media": round(datos["consultas"] / datos["peticiones"], 2),
+                    "consultas_max": datos["consultas_max"],
+                    "ms_medio": round(datos["ms"] / datos["peticiones"], 2),
+                    "ms_max": round(datos["ms_max"], 2),
+                }
+                for endpoint, datos in sorted(self._endpoints.items())
+            },
+        }
+
+    async def metricas_consultas(self, request: Request) -> JSONResponse:
+        return JSONResponse(self.metricas())
+
+    def registrar(self, app, dependencies=None):
+        """
+        Engancha los eventos del engine, el middleware y /metricas/consultas (solo si está activado).
+        La ruta se declara en la app para que pase por sus dependencias (validar_token) y las indicadas.
+        """
+        if not ACTIVADO:
+            return
+        for engine in self.engines:
+            event.listen(engine.sync_engine, "before_cursor_execute", self._antes)
+            event.listen(engine.sync_engine, "after_cursor_execute", self._despues)
+        app.add_middleware(MedicionConsultas, perfilador=self)
+        app.add_api_route(
+            "/metricas/consultas", self.metricas_consultas, methods=["GET"], dependencies=dependencies, include_in_schema=False
+        )
+        logger.info(f"Perfilador de consultas activado (umbral {self.umbral_ms:.0f} ms, archivo {self.archivo})")
+
+
+class MedicionConsultas:
+    """ Middleware ASGI: abre una medición por petición y la acumula en el endpoint (plantilla de ruta) """
+
+    def __init__(self, app, perfilador: PerfiladorConsultas):
+        self.app = app
+        self.perfilador = perfilador
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _medicion_actual.reset(token)
+            # El router deja la ruta resuelta en el scope: se agrupa por plantilla (/productos/{producto_id})
+            ruta = scope.get("route")
+            plantilla = getattr(ruta, "path", None) or RUTA_DESCONOCIDA
+            self.perfilador.acumular(f"{scope['method']} {plantilla}", medicion)
+
+
+@contextmanager
+def limite_consultas(engine, maximo: int, *otros_engines):
+    """
+    Ayuda para tests: falla si el bloque ejecuta más de `maximo` consultas
+    (detecta regresiones N+1). No depende de PERFILADOR_ACTIVADO.
+    Con motor de lectura separado, pasarlo también en `otros_engines`.
+
+        with limite_consultas(engine, 2):
+            client.post("/productos", json=...)
+    """
+    sentencias: list[str] = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    engines = list(dict.fromkeys((engine, *otros_engines)))
+    for motor in engines:
+        event.listen(motor.sync_engine, "before_cursor_execute", contar)
+    try:
+        yield sentencias
+    finally:
+        for motor in engines:
+            event.remove(motor.sync_engine, "before_cursor_execute", contar)
+    if len(sentencias) > maximo:
+        detalle = "\n".join(f"  {i}. {sentencia}" for i, sentencia in enumerate(sentencias, 1))
+        raise AssertionError(f"Se ejecutaron {len(sentencias)} consultas (máximo {maximo}):\n{detalle}")
@@ -1,10 +1,12 @@
+from typing import Optional
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
 
-from productos.models import Producto, ProductoCreate, ProductoUpdate
+from productos.models import Producto, ProductoCreate, ProductoUpdate, ProductoFila
+from productos.lectura import columnas, leer_filas
 from productos.logger_config import configurar_logger
 
 logger = configurar_logger("PRODUCTOS-SERVICE")
@@ -31,11 +33,17 @@ class ProductoService:
             logger.error(f"Error al crear producto: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error al crear producto: {str(e)}")
 
-    async def listar_productos(self) -> list[Producto]:
-        """ Devuelve todos los productos ordenados por ID """
-        statement = select(Producto).order_by(Producto.id).limit(100)
-        resultado = await self.db.execute(statement)
-        return resultado.scalars().all()
+    async def listar_productos(self, campos: Optional[list[str]] = None) -> list[ProductoFila] | list[dict]:
+        """
+        Devuelve todos los productos ordenados por ID como registros de solo lectura.
+        Con `campos`, solo se leen esas columnas y se devuelven como diccionarios
+        """
+        if campos:
+            statement = select(*(getattr(Producto, campo) for campo in campos)).order_by(Producto.id).limit(100)
+            resultado = await self.db.execute(statement)
+            return [dict(fila._mapping) for fila in resultado.all()]
+        statement = select(*columnas(ProductoFila, Producto)).order_by(Producto.id).limit(100)
+        return await leer_filas(self.db, statement, ProductoFila)
 
     async def leer_producto(self, producto_id: int) -> Producto:
         """ Devuelve un producto por su ID """
@@ -0,0 +1,30 @@
+"""
+Configuración común de los tests.
+Cada servicio lee su entorno al importarse: las bases temporales y los secretos
+se fijan aquí, antes de que los módulos de test importen ninguna app.
+"""
+import os
+import tempfile
+
+import jwt
+import pytest
+
+_directorio = tempfile.mkdtemp(prefix="microservicios-tests-")
+for _servicio in ("auth", "productos", "inventario", "pedidos"):
+    os.environ[f"{_servicio.upper()}_DB_URL"] = f"sqlite+aiosqlite:///{_directorio}/{_servicio}.db"
+    os.environ[f"{_servicio.upper()}_DB_PREWARM"] = "0"
+os.environ.update({
+    "SECRET_KEY": "secreto-de-tests",
+    "GATEWAY_SECRET": "",
+    "LIMITE_ACTIVADO": "false",
+    "COMPRESION_ACTIVADA": "false",
+    "PERFILADOR_ACTIVADO": "false",
+    "PEDIDOS_EXPIRACION_MINUTOS": "0",
+    "AUTH_HASH_WORKERS": "1",
+})
+
+
+@pytest.fixture(scope="session")
+def cabeceras() -> dict:
+    token = jwt.encode({"sub": "tests"}, os.environ["SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
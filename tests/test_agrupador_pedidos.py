@@ -0,0 +1,116 @@
+"""
+Agrupación de movimientos de stock de pedidos hacia Inventario (AgrupadorMovimientos).
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from tenacity import wait_none
+
+from pedidos.clients import AgrupadorMovimientos, InventarioClient
+
+
+class RespuestaLote:
+    def __init__(self, resultados: list[dict]):
+        self.status_code = 200
+        self._resultados = resultados
+
+    def json(self):
+        return self._resultados
+
+
+class InventarioSimulado:
+    """ Balanceador falso: 10 unidades por producto; aplica cada referencia una sola vez """
+
+    def __init__(self, fallos_de_red: int = 0):
+        self.lotes: list[list[dict]] = []
+        self.stock: dict[int, int] = {}
+        self.aplicadas: set[str] = set()
+        self.fallos_de_red = fallos_de_red
+
+    async def enviar(self, metodo, ruta, json, headers):
+        self.lotes.append(json)
+        resultados = []
+        for movimiento in json:
+            stock = self.stock.setdefault(movimiento["producto_id"], 10)
+            if movimiento["referencia"] in self.aplicadas:
+                resultados.append({"producto_id": movimiento["producto_id"], "status_code": 200, "detail": "Movimiento ya aplicado"})
+            elif movimiento["tipo_movimiento"] == "SALIDA" and movimiento["cantidad"] > stock:
+                resultados.append({"producto_id": movimiento["producto_id"], "status_code": 400, "detail": "Stock insuficiente"})
+            else:
+                signo = -1 if movimiento["tipo_movimiento"] == "SALIDA" else 1
+                self.stock[movimiento["producto_id"]] = stock + signo * movimiento["cantidad"]
+                self.aplicadas.add(movimiento["referencia"])
+                resultados.append({"producto_id": movimiento["producto_id"], "status_code": 200, "detail": None})
+        if self.fallos_de_red:
+            # El lote se confirmó, pero la respuesta no llega al llamador
+            self.fallos_de_red -= 1
+            raise httpx.ReadTimeout("timeout simulado")
+        return RespuestaLote(resultados)
+
+
+def salida(producto_id: int, cantidad: int) -> dict:
+    return {"producto_id": producto_id, "cantidad": cantidad, "tipo_movimiento": "SALIDA", "pedido_id": None}
+
+
+def test_lote_lleno_se_envia_sin_esperar_la_ventana():
+    async def escenario():
+        inventario = InventarioSimulado()
+        agrupador = AgrupadorMovimientos(inventario, activo=True, ventana_ms=10_000, maximo=3)
+        resultados = await asyncio.wait_for(
+            asyncio.gather(*(agrupador.encolar(salida(i, 1), {}) for i in range(3))), timeout=1
+        )
+        return inventario, resultados
+
+    inventario, resultados = asyncio.run(escenario())
+    assert len(inventario.lotes) == 1
+    assert [r["status_code"] for r in resultados] == [200, 200, 200]
+
+
+def test_ventana_agrupa_y_cada_llamador_recibe_su_resultado():
+    async def escenario():
+        inventario = InventarioSimulado()
+        agrupador = AgrupadorMovimientos(inventario, activo=True, ventana_ms=20, maximo=100)
+        resultados = await asyncio.gather(
+            agrupador.encolar(salida(1, 4), {}),
+            agrupador.encolar(salida(1, 50), {}),
+            agrupador.encolar(salida(2, 1), {}),
+        )
+        return inventario, agrupador, resultados
+
+    inventario, agrupador, resultados = asyncio.run(escenario())
+    assert len(inventario.lotes) == 1
+    assert [(r["producto_id"], r["status_code"]) for r in resultados] == [(1, 200), (1, 400), (2, 200)]
+    assert inventario.stock == {1: 6, 2: 9}
+    assert agrupador.metricas()["movimientos_por_lote"] == 3
+    referencias = [movimiento["referencia"] for movimiento in inventario.lotes[0]]
+    assert len(set(referencias)) == 3
+
+
+def test_reintento_tras_timeout_no_duplica_el_movimiento(monkeypatch):
+    monkeypatch.setattr(InventarioClient._encolar_movimiento.retry, "wait", wait_none())
+
+    async def escenario():
+        inventario = InventarioSimulado(fallos_de_red=1)
+        cliente = InventarioClient()
+        cliente.agrupador = AgrupadorMovimientos(inventario, activo=True, ventana_ms=1, maximo=100)
+        resultado = await cliente.actualizar_stock(1, 3, "SALIDA", pedido_id=42)
+        return inventario, resultado
+
+    inventario, resultado = asyncio.run(escenario())
+    assert resultado["status_code"] == 200
+    assert len(inventario.lotes) == 2
+    assert inventario.lotes[0][0]["referencia"] == inventario.lotes[1][0]["referencia"]
+    assert inventario.stock == {1: 7}
+
+
+def test_error_de_negocio_llega_al_llamador():
+    async def escenario():
+        cliente = InventarioClient()
+        cliente.agrupador = AgrupadorMovimientos(InventarioSimulado(), activo=True, ventana_ms=1, maximo=100)
+        await cliente.actualizar_stock(1, 50, "SALIDA")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(escenario())
+    assert error.value.status_code == 400
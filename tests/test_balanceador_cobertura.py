@@ -0,0 +1,78 @@
+"""
+Peticiones cubiertas (hedging) del balanceador: la carga extra queda limitada por el presupuesto.
+"""
+import asyncio
+from datetime import timedelta
+
+import httpx
+import pytest
+
+from pedidos.balanceador import BalanceadorReplicas, PresupuestoCobertura
+
+LENTA, RAPIDA = "http://lenta", "http://rapida"
+
+
+@pytest.fixture
+def balanceador(monkeypatch):
+    monkeypatch.setenv("PRUEBA_REPLICAS", f"{LENTA},{RAPIDA}")
+    balanceador = BalanceadorReplicas("prueba", "PRUEBA", LENTA, fail_max=5, timeout_duration=timedelta(seconds=30))
+    balanceador.cobertura = True
+    balanceador.latencias._p95 = 0.005
+
+    async def responder(request: httpx.Request) -> httpx.Response:
+        if f"http://{request.url.host}" == LENTA:
+            await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"replica": request.url.host})
+
+    balanceador._transporte = httpx.MockTransport(responder)
+    # La original siempre va a la réplica lenta y la cobertura a la rápida
+    lenta, rapida = balanceador.replicas
+    balanceador.elegir = lambda excluir=None: rapida if excluir is lenta else lenta
+    return balanceador
+
+
+def enviar(balanceador, veces: int) -> list[str]:
+    async def escenario():
+        try:
+            return [
+                (await balanceador.enviar("GET", "/inventario/1", idempotente=True)).json()["replica"]
+                for _ in range(veces)
+            ]
+        finally:
+            await balanceador.cerrar()
+
+    return asyncio.run(escenario())
+
+
+def test_sin_presupuesto_no_se_cubre(balanceador):
+    balanceador.presupuesto = PresupuestoCobertura(0.0)
+    assert enviar(balanceador, 3) == ["lenta"] * 3
+    assert balanceador.estadisticas["coberturas"] == 0
+
+
+def test_coberturas_limitadas_por_el_presupuesto(balanceador):
+    # Cada petición suma medio token: como mucho se cubre una de cada dos
+    balanceador.presupuesto = PresupuestoCobertura(0.5)
+    respuestas = enviar(balanceador, 10)
+
+    assert balanceador.estadisticas["peticiones"] == 10
+    assert balanceador.estadisticas["coberturas"] == 5
+    assert balanceador.estadisticas["coberturas_ganadoras"] == 5
+    assert respuestas.count("rapida") == 5
+    assert balanceador.metricas()["tasa_cobertura"] == 0.5
+
+
+def test_sin_p95_no_se_cubre(balanceador):
+    # Sin muestras suficientes no hay p95 con el que decidir el retardo
+    balanceador.latencias._p95 = None
+    balanceador.presupuesto = PresupuestoCobertura(1.0)
+    assert enviar(balanceador, 2) == ["lenta"] * 2
+    assert balanceador.estadisticas["coberturas"] == 0
+
+
+def test_presupuesto_acotado():
+    presupuesto = PresupuestoCobertura(1.0, maximo=2)
+    for _ in range(10):
+        presupuesto.sumar()
+    assert presupuesto.consumir() and presupuesto.consumir()
+    assert not presupuesto.consumir()
@@ -0,0 +1,69 @@
+"""
+Breaker compartido entre workers (CircuitMmapStorage): la prueba half-open la hace un único proceso.
+"""
+import multiprocessing
+
+import pytest
+from aiobreaker.state import CircuitBreakerState
+
+from pedidos.breaker_compartido import CircuitMmapStorage, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="flock no disponible en esta plataforma")
+
+# Estado que ve el proceso hijo, devuelto como código de salida
+_ESTADOS_SALIDA = {CircuitBreakerState.CLOSED: 10, CircuitBreakerState.OPEN: 11, CircuitBreakerState.HALF_OPEN: 12}
+
+
+def _en_otro_proceso(funcion, *args) -> int:
+    """ Ejecuta `funcion` en un proceso hijo (otro pid) y devuelve su código de salida """
+    proceso = multiprocessing.get_context("fork").Process(target=funcion, args=args)
+    proceso.start()
+    proceso.join(timeout=10)
+    return proceso.exitcode
+
+
+def _reclamar(directorio: str, timeout_prueba: float):
+    storage = CircuitMmapStorage("inventario", directorio, timeout_prueba)
+    reclamada = storage.reclamar_prueba()
+    raise SystemExit(0 if reclamada else 1)
+
+
+def _estado(directorio: str):
+    storage = CircuitMmapStorage("inventario", directorio, 30)
+    raise SystemExit(_ESTADOS_SALIDA[storage.state])
+
+
+def test_un_solo_proceso_hace_la_prueba(tmp_path):
+    storage = CircuitMmapStorage("inventario", str(tmp_path), 30)
+    storage.state = CircuitBreakerState.OPEN
+
+    assert storage.reclamar_prueba()
+    assert storage.state is CircuitBreakerState.HALF_OPEN
+    # Otro worker no puede reclamarla y sigue viendo el circuito abierto
+    assert _en_otro_proceso(_reclamar, str(tmp_path), 30) == 1
+    assert _en_otro_proceso(_estado, str(tmp_path)) == _ESTADOS_SALIDA[CircuitBreakerState.OPEN]
+    # El propio dueño puede volver a reclamarla
+    assert storage.reclamar_prueba()
+
+
+def test_prueba_abandonada_la_reclama_otro_proceso(tmp_path):
+    # timeout_prueba=0: la prueba en curso se da por abandonada (el worker murió o se colgó)
+    storage = CircuitMmapStorage("inventario", str(tmp_path), 0)
+    storage.state = CircuitBreakerState.OPEN
+    assert storage.reclamar_prueba()
+
+    assert _en_otro_proceso(_reclamar, str(tmp_path), 0) == 0
+    # Ahora la prueba es del otro proceso: este lo ve abierto
+    assert storage.state is CircuitBreakerState.OPEN
+
+
+def test_estado_y_contador_compartidos(tmp_path):
+    storage = CircuitMmapStorage("inventario", str(tmp_path), 30)
+    otro = CircuitMmapStorage("inventario", str(tmp_path), 30)
+    storage.increment_counter()
+    storage.increment_counter()
+    assert otro.counter == 2
+
+    otro.state = CircuitBreakerState.OPEN
+    assert storage.state is CircuitBreakerState.OPEN
+    assert _en_otro_proceso(_estado, str(tmp_path)) == _ESTADOS_SALIDA[CircuitBreakerState.OPEN]
@@ -0,0 +1,90 @@
+"""
+Cancelación de pedidos cuando Inventario rechaza parte de las devoluciones de stock.
+"""
+import sqlite3
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pedidos.clients import InventarioClient
+from pedidos.database import engine
+from pedidos.main import app
+
+PRODUCTO_OK = 1
+PRODUCTO_RECHAZADO = 2
+
+
+@pytest.fixture
+def client(cabeceras):
+    with TestClient(app, headers=cabeceras) as client:
+        with sqlite3.connect(engine.url.database) as conn:
+            conn.execute("DELETE FROM pedido")
+        yield client
+
+
+@pytest.fixture
+def inventario(monkeypatch):
+    """ Inventario simulado: devuelve el stock de todos los productos salvo los de `rechazados` (404) """
+    rechazados = {PRODUCTO_RECHAZADO}
+    lotes = []
+
+    async def aplicar_lote(self, movimientos):
+        lotes.append(movimientos)
+        return [
+            {"producto_id": m["producto_id"], "status_code": 404, "detail": "Inventario no encontrado para este producto"}
+            if m["producto_id"] in rechazados
+            else {"producto_id": m["producto_id"], "status_code": 200, "detail": None}
+            for m in movimientos
+        ]
+
+    monkeypatch.setattr(InventarioClient, "aplicar_lote", aplicar_lote)
+    return rechazados, lotes
+
+
+def crear_pedidos(*productos: int) -> list[int]:
+    with sqlite3.connect(engine.url.database) as conn:
+        return [
+            conn.execute(
+                "INSERT INTO pedido (producto_id, cantidad, estado, created_at) VALUES (?, 2, 'PENDIENTE', ?)",
+                (producto_id, datetime.utcnow().isoformat()),
+            ).lastrowid
+            for producto_id in productos
+        ]
+
+
+def test_cancelacion_masiva_no_cierra_los_pedidos_rechazados(client, inventario):
+    rechazados, _ = inventario
+    ok, rechazado = crear_pedidos(PRODUCTO_OK, PRODUCTO_RECHAZADO)
+
+    resp = client.post("/pedidos/cancel-bulk", json={"pedido_ids": [ok, rechazado]})
+    assert resp.status_code == 200
+    assert resp.json()["cancelados"] == 1
+    assert resp.json()["pendientes"] == 1
+    assert resp.json()["unidades_devueltas"] == {str(PRODUCTO_OK): 2}
+    assert client.get(f"/pedidos/{ok}").json()["estado"] == "CANCELADO"
+    assert client.get(f"/pedidos/{rechazado}").json()["estado"] == "CANCELANDO"
+
+    # Cuando Inventario acepta la devolución, la reanudación cierra el pedido pendiente
+    rechazados.clear()
+    resp = client.post("/pedidos/cancel-bulk", json={"pedido_ids": [rechazado]})
+    assert resp.json()["lotes_reanudados"] == 1
+    assert resp.json()["unidades_devueltas"] == {str(PRODUCTO_RECHAZADO): 2}
+    assert client.get(f"/pedidos/{rechazado}").json()["estado"] == "CANCELADO"
+
+
+def test_cancelar_un_pedido_rechazado_responde_502_y_se_reintenta(client, inventario):
+    rechazados, lotes = inventario
+    (pedido_id,) = crear_pedidos(PRODUCTO_RECHAZADO)
+
+    resp = client.patch(f"/pedidos/{pedido_id}", json={"estado": "CANCELADO"})
+    assert resp.status_code == 502
+    assert client.get(f"/pedidos/{pedido_id}").json()["estado"] == "CANCELANDO"
+    # Mientras siga en CANCELANDO no admite otra transición
+    assert client.patch(f"/pedidos/{pedido_id}", json={"estado": "COMPLETADO"}).status_code == 409
+
+    rechazados.clear()
+    resp = client.post("/pedidos/cancel-bulk", json={"pedido_ids": [pedido_id]})
+    assert resp.json()["cancelados"] == 1
+    # El reintento reutiliza la referencia del lote: Inventario no lo aplica dos veces
+    assert lotes[0][0]["referencia"] == lotes[-1][0]["referencia"]
@@ -0,0 +1,34 @@
+"""
+Consultas por petición de los endpoints de autenticación (regresiones N+1).
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from auth.database import engine
+from auth.main import app
+from auth.perfilador import limite_consultas
+
+USUARIO = {"username": "consultas", "email": "consultas@example.com", "password": "clave-de-tests"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        resp = client.post("/register", json=USUARIO)
+        assert resp.status_code == 200
+        yield client
+
+
+def test_registro_tres_consultas(client):
+    # Usuario existente + INSERT + refresh
+    with limite_consultas(engine, 3):
+        resp = client.post("/register", json={**USUARIO, "username": "consultas-2", "email": "consultas2@example.com"})
+    assert resp.status_code == 200
+
+
+def test_login_dos_consultas(client):
+    # Búsqueda del usuario + INSERT del refresh token
+    with limite_consultas(engine, 2):
+        resp = client.post("/login", json={"username": USUARIO["username"], "password": USUARIO["password"]})
+    assert resp.status_code == 200
+    assert resp.json()["refresh_token"]
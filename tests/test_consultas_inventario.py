@@ -0,0 +1,49 @@
+"""
+Consultas por petición de los endpoints de lectura de inventario (regresiones N+1).
+"""
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from inventario.database import engine, read_engine
+from inventario.main import app
+from inventario.perfilador import limite_consultas
+
+
+@pytest.fixture(scope="module")
+def client(cabeceras):
+    with TestClient(app, headers=cabeceras) as client:
+        # El inventario se crea directamente en la base: POST /inventario valida el producto contra Productos
+        with sqlite3.connect(engine.url.database) as conn:
+            conn.executescript("DELETE FROM movimientostock; DELETE FROM snapshotstock; DELETE FROM inventario;")
+            conn.executemany(
+                "INSERT INTO inventario (producto_id, cantidad) VALUES (?, 10)", [(producto_id,) for producto_id in range(1, 11)]
+            )
+        for _ in range(5):
+            resp = client.patch("/inventario/1", json={"cantidad": 1, "tipo_movimiento": "SALIDA"})
+            assert resp.status_code == 200
+        yield client
+
+
+def test_verificar_stock_una_consulta(client):
+    # El stock se calcula (snapshot + movimientos) en la misma consulta
+    with limite_consultas(engine, 1, read_engine):
+        resp = client.get("/inventario/1")
+    assert resp.status_code == 200
+    assert resp.json()["cantidad"] == 5
+
+
+def test_listar_inventario_una_consulta(client):
+    with limite_consultas(engine, 1, read_engine):
+        resp = client.get("/inventario")
+    assert resp.status_code == 200
+    assert len(resp.json()) == 10
+
+
+def test_listar_movimientos_dos_consultas(client):
+    # Comprobación de existencia (404) + historial; nunca una consulta por movimiento
+    with limite_consultas(engine, 2, read_engine):
+        resp = client.get("/inventario/1/movimientos")
+    assert resp.status_code == 200
+    assert len(resp.json()) == 5
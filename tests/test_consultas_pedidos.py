@@ -0,0 +1,46 @@
+"""
+Consultas por petición de los endpoints de lectura de pedidos (regresiones N+1).
+"""
+import sqlite3
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pedidos.database import engine, read_engine
+from pedidos.main import app
+from pedidos.perfilador import limite_consultas
+
+
+@pytest.fixture(scope="module")
+def client(cabeceras):
+    with TestClient(app, headers=cabeceras) as client:
+        # Los pedidos se crean directamente en la base: POST /pedidos llama a Productos e Inventario
+        with sqlite3.connect(engine.url.database) as conn:
+            conn.execute("DELETE FROM pedido")
+            conn.executemany(
+                "INSERT INTO pedido (producto_id, cantidad, estado, created_at) VALUES (?, ?, 'PENDIENTE', ?)",
+                [(producto_id, 1, datetime.utcnow().isoformat()) for producto_id in range(1, 21)],
+            )
+        yield client
+
+
+def test_listar_pedidos_una_consulta(client):
+    with limite_consultas(engine, 1, read_engine):
+        resp = client.get("/pedidos")
+    assert resp.status_code == 200
+    assert len(resp.json()) == 20
+
+
+def test_listar_pedidos_parcial_una_consulta(client):
+    with limite_consultas(engine, 1, read_engine):
+        resp = client.get("/pedidos", params={"fields": "id,estado"})
+    assert resp.status_code == 200
+    assert set(resp.json()[0]) == {"id", "estado"}
+
+
+def test_leer_pedido_una_consulta(client):
+    pedido_id = client.get("/pedidos").json()[0]["id"]
+    with limite_consultas(engine, 1, read_engine):
+        resp = client.get(f"/pedidos/{pedido_id}")
+    assert resp.status_code == 200
@@ -0,0 +1,56 @@
+"""
+Consultas por petición de los endpoints de productos (regresiones N+1).
+"""
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+
+from productos.database import engine, read_engine
+from productos.main import app
+from productos.perfilador import MedicionConsultas, PerfiladorConsultas, RUTA_DESCONOCIDA, limite_consultas
+
+
+@pytest.fixture(scope="module")
+def client(cabeceras):
+    with TestClient(app, headers=cabeceras) as client:
+        for i in range(10):
+            resp = client.post("/productos", json={"nombre": f"Producto {i}", "descripcion": "Test", "precio": 10.0 + i})
+            assert resp.status_code == 200
+        yield client
+
+
+def test_crear_producto_insert_y_refresh(client):
+    with limite_consultas(engine, 2, read_engine):
+        resp = client.post("/productos", json={"nombre": "Otro", "descripcion": "Test", "precio": 1.0})
+    assert resp.status_code == 200
+
+
+def test_listar_productos_una_consulta(client):
+    with limite_consultas(engine, 1, read_engine):
+        resp = client.get("/productos")
+    assert resp.status_code == 200
+    assert len(resp.json()) >= 10
+
+
+def test_leer_producto_una_consulta(client):
+    with limite_consultas(engine, 1, read_engine):
+        resp = client.get("/productos/1")
+    assert resp.status_code == 200
+    assert resp.json()["nombre"] == "Producto 0"
+
+
+def test_limite_consultas_falla_con_la_lista_de_sentencias(client):
+    with pytest.raises(AssertionError, match="Se ejecutaron 1 consultas"):
+        with limite_consultas(engine, 0, read_engine):
+            client.get("/productos/1")
+
+
+def test_rutas_desconocidas_comparten_endpoint():
+    # Sin ruta resuelta (404, escaneos) no se crea un endpoint por URL
+    perfilador = PerfiladorConsultas(engine)
+    with TestClient(MedicionConsultas(Starlette(), perfilador)) as client:
+        for ruta in ("/a", "/b/1", "/wp-login.php"):
+            assert client.get(ruta).status_code == 404
+    endpoints = perfilador.metricas()["endpoints"]
+    assert list(endpoints) == [f"GET {RUTA_DESCONOCIDA}"]
+    assert endpoints[f"GET {RUTA_DESCONOCIDA}"]["peticiones"] == 3
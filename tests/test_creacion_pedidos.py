@@ -0,0 +1,52 @@
+"""
+Creación de pedidos: el movimiento de stock lleva el ID del pedido y un pedido sin stock se descarta.
+"""
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from pedidos.clients import InventarioClient, ProductoClient
+from pedidos.database import engine
+from pedidos.main import app
+
+
+@pytest.fixture
+def client(cabeceras):
+    with TestClient(app, headers=cabeceras) as client:
+        with sqlite3.connect(engine.url.database) as conn:
+            conn.execute("DELETE FROM pedido")
+        yield client
+
+
+@pytest.fixture
+def movimientos(monkeypatch):
+    """ Productos e Inventario simulados: Inventario tiene 5 unidades de cada producto """
+    registrados = []
+
+    async def get_producto(self, producto_id):
+        return True
+
+    async def actualizar_stock(self, producto_id, cantidad, tipo_movimiento, pedido_id=None):
+        if tipo_movimiento == "SALIDA" and cantidad > 5:
+            raise HTTPException(status_code=400, detail="Stock insuficiente")
+        registrados.append((producto_id, cantidad, tipo_movimiento, pedido_id))
+
+    monkeypatch.setattr(ProductoClient, "get_producto", get_producto)
+    monkeypatch.setattr(InventarioClient, "actualizar_stock", actualizar_stock)
+    return registrados
+
+
+def test_la_salida_lleva_el_id_del_pedido(client, movimientos):
+    resp = client.post("/pedidos", json={"producto_id": 1, "cantidad": 2})
+    assert resp.status_code == 200
+    assert resp.json()["estado"] == "PENDIENTE"
+    assert movimientos == [(1, 2, "SALIDA", resp.json()["id"])]
+
+
+def test_pedido_sin_stock_se_descarta(client, movimientos):
+    resp = client.post("/pedidos", json={"producto_id": 1, "cantidad": 50})
+    assert resp.status_code == 400
+    assert client.get("/pedidos").json() == []
+    assert movimientos == []
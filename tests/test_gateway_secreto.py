@@ -0,0 +1,41 @@
+"""
+Cabecera X-Gateway-Secret: un valor con caracteres no ASCII se rechaza como cualquier otro, sin 500.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import auth.limite_peticiones
+import productos.dependencies
+import productos.limitador
+from productos.main import app
+
+SECRETO = "secreto-del-gateway"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(productos.dependencies, "GATEWAY_SECRET", SECRETO)
+    monkeypatch.setattr(productos.limitador, "GATEWAY_SECRET", SECRETO)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_secreto_valido_evita_decodificar_el_token(client):
+    resp = client.get("/productos", headers={"Authorization": "Bearer no-es-un-jwt", "X-Gateway-Secret": SECRETO})
+    assert resp.status_code == 200
+
+
+def test_secreto_no_ascii_responde_401(client):
+    cabeceras = {"Authorization": "Bearer no-es-un-jwt", "X-Gateway-Secret": "señuelo-ñ".encode("latin-1")}
+    assert client.get("/productos", headers=cabeceras).status_code == 401
+
+
+def test_ip_cliente_ignora_un_secreto_no_ascii(monkeypatch):
+    monkeypatch.setattr(auth.limite_peticiones, "GATEWAY_SECRET", SECRETO)
+    request = Request({
+        "type": "http",
+        "client": ("10.0.0.1", 1234),
+        "headers": [(b"x-gateway-secret", "ñ".encode("latin-1")), (b"x-forwarded-for", b"1.2.3.4")],
+    })
+    assert auth.limite_peticiones.ip_cliente(request) == "10.0.0.1"
@@ -0,0 +1,51 @@
+"""
+Clasificación y agrupación de peticiones del limitador adaptativo (LimitadorAdaptativo).
+"""
+import jwt
+import pytest
+
+import pedidos.limitador
+from pedidos.limitador import RUTA_DESCONOCIDA, LimitadorAdaptativo
+from pedidos.main import app
+
+SECRETO = "secreto-del-gateway"
+
+
+@pytest.fixture
+def limitador(monkeypatch):
+    monkeypatch.setattr(pedidos.limitador, "GATEWAY_SECRET", SECRETO)
+    return LimitadorAdaptativo(None, router=app.router)
+
+
+def scope(ruta: str = "/pedidos", metodo: str = "GET", **cabeceras) -> dict:
+    return {
+        "type": "http",
+        "method": metodo,
+        "path": ruta,
+        "root_path": "",
+        "headers": [(nombre.replace("_", "-").encode(), valor.encode("latin-1")) for nombre, valor in cabeceras.items()],
+    }
+
+
+def token(sub: str, clave: str = "cualquier-clave") -> str:
+    return f"Bearer {jwt.encode({'sub': sub}, clave, algorithm='HS256')}"
+
+
+def test_clasifica_por_sub_sin_verificar_la_firma(limitador):
+    # La firma la verifica validar_token en el endpoint; aquí solo se reparte el límite
+    assert limitador._es_interno(scope(authorization=token("sistema-pedidos")))
+    assert not limitador._es_interno(scope(authorization=token("usuario")))
+    assert not limitador._es_interno(scope(authorization="Bearer no-es-un-jwt"))
+    assert not limitador._es_interno(scope())
+
+
+def test_trafico_del_gateway_es_externo(limitador):
+    cabeceras = {"authorization": token("sistema-pedidos"), "x_gateway_secret": SECRETO}
+    assert not limitador._es_interno(scope(**cabeceras))
+    # Un secreto no ASCII tampoco rompe la comparación
+    assert limitador._es_interno(scope(authorization=token("sistema-pedidos"), x_gateway_secret="ñ"))
+
+
+def test_rutas_se_agrupan_por_plantilla(limitador):
+    assert limitador._plantilla(scope("/pedidos/1")) == limitador._plantilla(scope("/pedidos/2")) == "/pedidos/{pedido_id}"
+    assert limitador._plantilla(scope("/wp-login.php")) == limitador._plantilla(scope("/x/y")) == RUTA_DESCONOCIDA
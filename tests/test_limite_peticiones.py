@@ -0,0 +1,44 @@
+"""
+Token bucket de /login y /register (LimitadorTokenBucket): ráfaga, recarga y descarte LRU de claves.
+"""
+import pytest
+
+import auth.limite_peticiones
+from auth.limite_peticiones import LimitadorTokenBucket
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    instante = [1000.0]
+    monkeypatch.setattr(auth.limite_peticiones.time, "monotonic", lambda: instante[0])
+    return instante
+
+
+def test_agota_la_rafaga_y_recarga(reloj):
+    limitador = LimitadorTokenBucket(capacidad=2, por_minuto=60, max_claves=10)
+    assert limitador.consumir("ip:1") == 0
+    assert limitador.consumir("ip:1") == 0
+    assert limitador.consumir("ip:1") == pytest.approx(1.0)
+
+    reloj[0] += 1
+    assert limitador.consumir("ip:1") == 0
+
+
+def test_descarta_la_clave_menos_reciente(reloj):
+    limitador = LimitadorTokenBucket(capacidad=1, por_minuto=60, max_claves=2)
+    limitador.consumir("a")
+    limitador.consumir("b")
+    limitador.consumir("a")  # "a" pasa a ser la más reciente
+    limitador.consumir("c")
+
+    assert list(limitador._buckets) == ["a", "c"]
+
+
+def test_clave_descartada_vuelve_con_la_rafaga_completa(reloj):
+    limitador = LimitadorTokenBucket(capacidad=1, por_minuto=60, max_claves=1)
+    assert limitador.consumir("a") == 0
+    assert limitador.consumir("a") > 0
+    limitador.consumir("b")  # desaloja a "a"
+
+    assert len(limitador._buckets) == 1
+    assert limitador.consumir("a") == 0
@@ -0,0 +1,45 @@
+"""
+Consultas lentas del perfilador: el EXPLAIN y la escritura del archivo van fuera de la petición.
+"""
+import asyncio
+import json
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from productos.perfilador import Medicion, PerfiladorConsultas, _medicion_actual
+
+
+def test_consulta_lenta_se_registra_fuera_de_la_peticion(tmp_path):
+    archivo = tmp_path / "lentas.jsonl"
+
+    async def escenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'perfilador.db'}")
+        perfilador = PerfiladorConsultas(engine, umbral_ms=0, archivo=str(archivo))
+        event.listen(engine.sync_engine, "before_cursor_execute", perfilador._antes)
+        event.listen(engine.sync_engine, "after_cursor_execute", perfilador._despues)
+        try:
+            medicion = Medicion()
+            token = _medicion_actual.set(medicion)
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT :valor AS valor"), {"valor": 1})
+                # Al volver la consulta, solo está encolada: ni plan ni archivo todavía
+                assert not archivo.exists()
+            finally:
+                _medicion_actual.reset(token)
+            await perfilador._procesador
+            return perfilador, medicion
+        finally:
+            await engine.dispose()
+
+    perfilador, medicion = asyncio.run(escenario())
+
+    # El EXPLAIN no cuenta en la medición de la petición ni como consulta lenta
+    assert medicion.consultas == 1
+    assert perfilador.lentas == 1
+    registros = [json.loads(linea) for linea in archivo.read_text(encoding="utf-8").splitlines()]
+    assert len(registros) == 1
+    assert registros[0]["sentencia"].startswith("SELECT")
+    assert registros[0]["parametros"] == ["int"]
+    assert registros[0]["plan"] and not registros[0]["plan"][0].startswith("EXPLAIN no disponible")
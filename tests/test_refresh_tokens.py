@@ -0,0 +1,65 @@
+"""
+Rotación de refresh tokens: reutilizar uno ya canjeado revoca toda su familia.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import auth.main
+from auth.limite_peticiones import LimitadorTokenBucket
+from auth.main import app
+
+USUARIO = {"username": "refresh", "email": "refresh@example.com", "password": "clave-de-tests"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        resp = client.post("/register", json=USUARIO)
+        assert resp.status_code == 200
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def sin_limite_de_login(monkeypatch):
+    # Cada test inicia varias sesiones desde la misma IP: el límite de /login no es lo que se prueba
+    monkeypatch.setattr(auth.main, "limitador_login", LimitadorTokenBucket(capacidad=100))
+
+
+def login(client) -> str:
+    resp = client.post("/login", json={"username": USUARIO["username"], "password": USUARIO["password"]})
+    assert resp.status_code == 200
+    return resp.json()["refresh_token"]
+
+
+def test_rotacion_emite_un_refresh_token_nuevo(client):
+    original = login(client)
+    resp = client.post("/token/refresh", json={"refresh_token": original})
+    assert resp.status_code == 200
+    assert resp.json()["access_token"]
+    assert resp.json()["refresh_token"] != original
+
+
+def test_reutilizacion_revoca_la_familia(client):
+    original = login(client)
+    rotado = client.post("/token/refresh", json={"refresh_token": original}).json()["refresh_token"]
+
+    # Reutilizar el token ya canjeado (p. ej. robado) se rechaza...
+    resp = client.post("/token/refresh", json={"refresh_token": original})
+    assert resp.status_code == 401
+    # ...y revoca también el rotado que tenía el usuario legítimo
+    assert client.post("/token/refresh", json={"refresh_token": rotado}).status_code == 401
+
+
+def test_reutilizacion_no_afecta_a_otras_familias(client):
+    otra_sesion = login(client)
+    original = login(client)
+    client.post("/token/refresh", json={"refresh_token": original})
+    assert client.post("/token/refresh", json={"refresh_token": original}).status_code == 401
+
+    assert client.post("/token/refresh", json={"refresh_token": otra_sesion}).status_code == 200
+
+
+def test_revocacion_invalida_el_token(client):
+    refresh_token = login(client)
+    assert client.post("/token/revoke", json={"refresh_token": refresh_token}).status_code == 204
+    assert client.post("/token/refresh", json={"refresh_token": refresh_token}).status_code == 401
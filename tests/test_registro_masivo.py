@@ -0,0 +1,57 @@
+"""
+Alta masiva de usuarios (POST /register/bulk): autorización y conflictos de unicidad concurrentes.
+"""
+import os
+import sqlite3
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+import auth.main
+from auth.database import engine
+from auth.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def administrador() -> dict:
+    token = jwt.encode({"sub": "sistema-admin"}, os.environ["SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def usuario(nombre: str) -> dict:
+    return {"username": nombre, "email": f"{nombre}@example.com", "password": "clave-de-tests"}
+
+
+def test_requiere_subject_administrador(client, cabeceras):
+    resp = client.post("/register/bulk", headers=cabeceras, json={"usuarios": [usuario("masivo-sin-permiso")]})
+    assert resp.status_code == 403
+
+
+def test_conflicto_concurrente_solo_falla_el_usuario_en_conflicto(client, administrador, monkeypatch):
+    hashear = auth.main.get_password_hashes_en_paralelo
+
+    async def hashear_con_alta_concurrente(passwords):
+        # Otra petición da de alta uno de los usuarios entre la comprobación de unicidad y el INSERT
+        with sqlite3.connect(engine.url.database) as conn:
+            conn.execute(
+                "INSERT INTO usuario (username, email, hashed_password) VALUES (?, ?, ?)",
+                ("masivo-2", "otro-masivo-2@example.com", "x"),
+            )
+        return await hashear(passwords)
+
+    monkeypatch.setattr(auth.main, "get_password_hashes_en_paralelo", hashear_con_alta_concurrente)
+    resp = client.post(
+        "/register/bulk", headers=administrador, json={"usuarios": [usuario(f"masivo-{n}") for n in range(1, 4)]}
+    )
+    assert resp.status_code == 200
+    resultados = {r["username"]: r for r in resp.json()}
+    assert resultados["masivo-1"]["creado"] and resultados["masivo-3"]["creado"]
+    assert not resultados["masivo-2"]["creado"]
+    assert resultados["masivo-2"]["detalle"] == "El nombre de usuario ya existe"
@@ -0,0 +1,63 @@
+"""
+Libro de movimientos de inventario: ENTRADAs sin bloqueo, SALIDAs condicionadas al stock
+y compactación sin saltarse movimientos.
+"""
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from inventario.database import engine
+from inventario.main import app
+from inventario.services import InventarioService
+
+PRODUCTO = 1
+
+
+@pytest.fixture
+def client(cabeceras):
+    with TestClient(app, headers=cabeceras) as client:
+        with sqlite3.connect(engine.url.database) as conn:
+            conn.executescript("DELETE FROM movimientostock; DELETE FROM snapshotstock; DELETE FROM inventario;")
+            conn.execute("INSERT INTO inventario (producto_id, cantidad) VALUES (?, 10)", (PRODUCTO,))
+        yield client
+
+
+def mover(client, cantidad: int, tipo: str, pedido_id: int | None = None, producto_id: int = PRODUCTO):
+    return client.patch(
+        f"/inventario/{producto_id}", json={"cantidad": cantidad, "tipo_movimiento": tipo, "pedido_id": pedido_id}
+    )
+
+
+def test_entrada_y_salida_devuelven_el_stock_confirmado(client):
+    assert mover(client, 5, "ENTRADA").json()["cantidad"] == 15
+    assert mover(client, 12, "SALIDA", pedido_id=7).json()["cantidad"] == 3
+    resp = mover(client, 4, "SALIDA")
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Stock insuficiente"
+
+    movimientos = client.get(f"/inventario/{PRODUCTO}/movimientos").json()
+    assert [(m["tipo_movimiento"], m["cantidad"], m["pedido_id"]) for m in movimientos] == [
+        ("ENTRADA", 5, None), ("SALIDA", 12, 7),
+    ]
+
+
+def test_movimiento_de_producto_sin_inventario_responde_404(client):
+    assert mover(client, 1, "ENTRADA", producto_id=999).status_code == 404
+    assert mover(client, 1, "SALIDA", producto_id=999).status_code == 404
+    assert client.get("/inventario/999/movimientos").status_code == 404
+
+
+def test_compactacion_conserva_el_stock_y_los_movimientos_posteriores(client):
+    for _ in range(3):
+        mover(client, 1, "SALIDA")
+
+    async def compactar() -> int:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            return await InventarioService(session).compactar_movimientos(gracia_segundos=0, min_movimientos=1)
+
+    # En el bucle de la app: el pool del engine es el mismo que usan las peticiones
+    assert client.portal.call(compactar) == 1
+    mover(client, 2, "ENTRADA")
+    assert client.get(f"/inventario/{PRODUCTO}").json()["cantidad"] == 9